@@ -0,0 +1,157 @@
+"""
+Python overhead per draw call of the first pass: walking Model -> Node -> RenderCompound with instant draw events
+and Material.use()/mesh.use()/mesh.draw() for every item (as it was before) compared to executing
+the compiled DrawList of the group, with model matrices uploaded for every node by a NodeDrawEvent handler
+(as MVPMatrices does for shaders reading `model` from it) and taken from ModelMatrices SSBO by base instance.
+Binds go through GLState in both cases, `skip %` is the part of them skipped as redundant.
+GL functions are replaced by a call counter, so only Python time is measured and no GL context is needed.
+Run from the repository root: python -m benchmarks.draw_list
+"""
+import sys
+from time import perf_counter
+
+import numpy as np
+from OpenGL.GL import GL_TRIANGLES
+
+import engine.gl.base
+import engine.gl.mesh
+import engine.gl.state
+import engine.gl.texture
+import engine.renderer.draw_list
+from engine.event.base import EventManager, BaseEventReceiver
+from engine.gl.mesh import VAO, EBO, VAOMesh
+from engine.gl.state import GLState
+from engine.gl.texture import Texture2D
+from engine.model.model import Model, Node, RenderCompound, Material, NodeDrawEvent
+from engine.renderer.draw_list import DrawList
+
+MODEL_COUNTS = (10, 100, 1000)
+NODES_PER_MODEL = 4
+COMPOUNDS_PER_NODE = 4
+MATERIAL_COUNT = 8
+FRAMES = 20
+
+gl_calls = [0]
+
+
+def gl_call(*_args):
+    gl_calls[0] += 1
+
+
+def patch_gl():
+    for module, names in ((engine.gl.base, ('glGenBuffers', 'glBufferData', 'glDeleteBuffers')),
+                          (engine.gl.mesh, ('glDrawElements', 'glDeleteVertexArrays')),
+                          (engine.gl.texture, ('glDeleteTextures', )),
+                          (engine.gl.state, ('glActiveTexture', 'glBindTexture', 'glBindVertexArray', 'glBindBuffer')),
+                          (engine.renderer.draw_list, ('glDrawElementsBaseVertex',
+                                                       'glDrawElementsInstancedBaseVertexBaseInstance',
+                                                       'glMultiDrawElementsIndirect'))):
+        for name in names:
+            setattr(module, name, gl_call)
+
+
+def make_texture(sampler_id):
+    texture = Texture2D.__new__(Texture2D)
+    texture.sampler_id = sampler_id
+    texture.set_bind_index(0)
+    return texture
+
+
+def make_mesh(buffer_id):
+    # VAOMesh with GL objects, but without creating them
+    mesh = VAOMesh.__new__(VAOMesh)
+    mesh.render_mode = GL_TRIANGLES
+    mesh.vao = VAO.__new__(VAO)
+    mesh.vao.buffer_id = buffer_id
+    mesh.ebo = EBO.__new__(EBO)
+    mesh.ebo.buffer_id = buffer_id
+    mesh.ebo._buffer_data = np.zeros(36, 'uint32')  # a box
+    return mesh
+
+
+def make_model(materials, event_manager):
+    root = Node()
+    for i in range(NODES_PER_MODEL):
+        # parts of a node usually share the material
+        meshes = [RenderCompound(make_mesh(i * COMPOUNDS_PER_NODE + j + 1), materials[i % len(materials)])
+                  for j in range(COMPOUNDS_PER_NODE)]
+        root.child_nodes.append(Node(root, meshes=meshes))
+    model = Model(root_node=root).finished()
+    model.event_manager = event_manager
+    return model
+
+
+class MatrixReceiver(BaseEventReceiver):
+    # stands for MVPMatrices, which uploads model matrix of every drawn node
+    _event_subscriptions_ = (NodeDrawEvent, )
+
+    def __init__(self, event_manager):
+        super(MatrixReceiver, self).__init__(event_manager)
+        self.nodes = 0
+        self.view_projection = np.identity(4, 'float32')
+        self.model_view_projection = np.identity(4, 'float32')
+
+    def on_node_draw(self, event):
+        self.nodes += 1
+        self.model_view_projection[:] = event.node.result_matrix @ self.view_projection
+        gl_call()  # buffer upload
+
+
+def run(draw, frames):
+    gl_calls[0] = 0
+    GLState.reset_stats()
+    start = perf_counter()
+    for _ in range(frames):
+        GLState.invalidate()  # other stages of the frame change bindings
+        draw()
+    return (perf_counter() - start) / frames, gl_calls[0] / frames
+
+
+def skipped_percent():
+    stats = GLState.stats
+    return stats['skipped'] / max(stats['issued'] + stats['skipped'], 1) * 100
+
+
+def main(frames=FRAMES):
+    patch_gl()
+    materials = [Material([(make_texture(i * 2 + 1), 0), (make_texture(i * 2 + 2), 1)])
+                 for i in range(MATERIAL_COUNT)]
+    print(f'{"items":>7} {"tree ms":>8} {"list ms":>8} {"ssbo ms":>8} {"tree us/draw":>13} {"list us/draw":>13} '
+          f'{"ssbo us/draw":>13} {"tree gl/draw":>13} {"list gl/draw":>13} {"ssbo gl/draw":>13} {"tree skip %":>12} '
+          f'{"compile ms":>11}')
+    for count in MODEL_COUNTS:
+        event_manager = EventManager()
+        receiver = MatrixReceiver(event_manager)
+        models = [make_model(materials, event_manager) for _ in range(count)]
+        for model in models[::3]:
+            model.visible[::2] = False  # partly culled
+        draw_count = sum(int(model.visible.sum()) for model in models)
+
+        def draw_tree():
+            for model in models:
+                model.draw()
+
+        draw_list = DrawList(lambda: models)
+        start = perf_counter()
+        draw_list.compile()
+        compile_ms = (perf_counter() - start) * 1000
+        draw_list.select(models)
+        tree_time, tree_calls = run(draw_tree, frames)
+        tree_skipped = skipped_percent()
+        tree_nodes = receiver.nodes // frames
+        list_time, list_calls = run(draw_list.execute, frames)
+        receiver.nodes = 0
+        assert draw_list.execute() == draw_count and receiver.nodes == tree_nodes  # same draws and matrices
+        receiver.unsubscribe()
+        for i, model in enumerate(models):
+            model.matrix_slot = i * NODES_PER_MODEL
+        ssbo_time, ssbo_calls = run(draw_list.execute, frames)
+        print(f'{draw_count:>7} {tree_time * 1000:>8.2f} {list_time * 1000:>8.2f} {ssbo_time * 1000:>8.2f} '
+              f'{tree_time / draw_count * 1e6:>13.2f} {list_time / draw_count * 1e6:>13.2f} '
+              f'{ssbo_time / draw_count * 1e6:>13.2f} '
+              f'{tree_calls / draw_count:>13.2f} {list_calls / draw_count:>13.2f} '
+              f'{ssbo_calls / draw_count:>13.2f} {tree_skipped:>12.1f} {compile_ms:>11.2f}')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
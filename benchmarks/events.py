@@ -0,0 +1,100 @@
+"""
+Event dispatch benchmark of the tick path: TickEvent posted and polled every frame by a scene
+with a number of receivers (sound sources, renderers, etc.) subscribed to it.
+Compares exact-class dispatch with isinstance chains in on_event (as it was before)
+to cached per-class dispatch tables with per-type handler methods.
+Run from the repository root: python -m benchmarks.events
+"""
+import sys
+from time import perf_counter
+
+from engine.event.base import EventManager, BaseEventReceiver
+from engine.event.tick import TickEvent
+from engine.scene.component import ComponentAddEvent, ComponentRemoveEvent
+from engine.scene.components.light import LightDataUpdateEvent
+
+RECEIVER_COUNTS = (1, 10, 100, 1000)
+TICKS = 20000
+
+
+class LegacyEventManager:
+    # dispatch on exact event class only
+    def __init__(self):
+        self.handlers = {}
+        self.events = []
+
+    def poll_events(self):
+        for evt in self.events:
+            self._poll_event(evt)
+        self.events.clear()
+
+    def _poll_event(self, evt):
+        try:
+            handlers = self.handlers[evt.__class__]
+        except KeyError:
+            pass
+        else:
+            for handler in handlers:
+                handler.on_event(evt)
+
+    def add_event(self, event):
+        if event.instant:
+            self._poll_event(event)
+        else:
+            self.events.append(event)
+
+    def add_handler(self, obj, event_type, method=None):
+        self.handlers.setdefault(event_type, []).append(obj)
+
+
+class LegacyReceiver(BaseEventReceiver):
+    _event_subscriptions_ = (ComponentAddEvent, ComponentRemoveEvent, LightDataUpdateEvent, TickEvent)
+
+    def __init__(self, event_manager):
+        super(LegacyReceiver, self).__init__(event_manager)
+        self.ticks = 0
+
+    def on_event(self, evt):
+        if isinstance(evt, ComponentAddEvent):
+            pass
+        elif isinstance(evt, ComponentRemoveEvent):
+            pass
+        elif isinstance(evt, LightDataUpdateEvent):
+            pass
+        elif isinstance(evt, TickEvent):
+            self.ticks += 1
+
+
+class Receiver(BaseEventReceiver):
+    _event_subscriptions_ = (ComponentAddEvent, ComponentRemoveEvent, LightDataUpdateEvent, TickEvent)
+
+    def __init__(self, event_manager):
+        super(Receiver, self).__init__(event_manager)
+        self.ticks = 0
+
+    def on_tick(self, _evt):
+        self.ticks += 1
+
+
+def run(manager, receiver_class, receiver_count, ticks):
+    receivers = [receiver_class(manager) for _ in range(receiver_count)]
+    ticks = max(ticks // receiver_count, 10)
+    start = perf_counter()
+    for _ in range(ticks):
+        manager.add_event(TickEvent(0.016))
+        manager.poll_events()
+    elapsed = perf_counter() - start
+    assert all(receiver.ticks == ticks for receiver in receivers)
+    return ticks * receiver_count / elapsed  # delivered events per second
+
+
+def main(ticks=TICKS):
+    print(f'{"receivers":>9} {"legacy ev/s":>13} {"cached ev/s":>13} {"speedup":>8}')
+    for count in RECEIVER_COUNTS:
+        legacy = run(LegacyEventManager(), LegacyReceiver, count, ticks)
+        cached = run(EventManager(), Receiver, count, ticks)
+        print(f'{count:>9} {legacy:>13.0f} {cached:>13.0f} {cached / legacy:>8.2f}')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,98 @@
+"""
+First pass of Sponza-like models (100 meshes, 25 materials) with meshes in their own buffers (VAOMesh) and packed
+into a GeometryStore (SharedMesh). Both are drawn sorted by RenderQueue, shared meshes by glMultiDrawElementsIndirect.
+GL functions are replaced by a call counter, so only Python time is measured and no GL context is needed.
+Run from the repository root: python -m benchmarks.geometry_store
+"""
+import sys
+from itertools import count
+from time import perf_counter
+
+import numpy as np
+
+import engine.gl.base
+import engine.gl.mesh
+from benchmarks.draw_list import gl_call, gl_calls, patch_gl, make_texture
+from engine.gl.geometry import GeometryStore, SharedMesh
+from engine.gl.mesh import VAOMesh
+from engine.gl.state import GLState
+from engine.model.model import Model, Node, RenderCompound, Material
+from engine.renderer.draw_list import DrawList
+from engine.renderer.render_queue import RenderQueue
+
+MODEL_COUNTS = (1, 10, 50)
+MESH_COUNT = 100
+MATERIAL_COUNT = 25
+ATTRIBUTES = (3, 3, 2)
+FRAMES = 20
+
+
+def patch_gl_objects():
+    # GL object creation, returning unique names
+    names = count(1)
+    engine.gl.base.glGenBuffers = lambda _count: next(names)
+    engine.gl.mesh.glGenVertexArrays = lambda _count: next(names)
+    engine.gl.base.glBufferSubData = gl_call
+    for name in ('glVertexAttribPointer', 'glVertexAttribIPointer', 'glVertexAttribDivisor',
+                 'glEnableVertexAttribArray'):
+        setattr(engine.gl.mesh, name, gl_call)
+
+
+def make_meshes(mesh_class, rng):
+    meshes = []
+    for _ in range(MESH_COUNT):
+        vertex_count = int(rng.integers(24, 500))
+        vertices = rng.random(vertex_count * sum(ATTRIBUTES), 'float32')
+        indices = rng.integers(0, vertex_count, vertex_count * 3).astype('uint32')
+        meshes.append(mesh_class(vertices, indices, ATTRIBUTES))
+    return meshes
+
+
+def make_model(meshes, materials):
+    root = Node()
+    for i, mesh in enumerate(meshes):
+        root.child_nodes.append(Node(root, meshes=[RenderCompound(mesh, materials[i % len(materials)])]))
+    return Model(root_node=root).finished()
+
+
+def run(draw, frames):
+    gl_calls[0] = 0
+    start = perf_counter()
+    for _ in range(frames):
+        GLState.invalidate()
+        draw()
+    return (perf_counter() - start) / frames, gl_calls[0] / frames
+
+
+def main(frames=FRAMES):
+    patch_gl()
+    patch_gl_objects()
+    rng = np.random.default_rng(0)
+    materials = [Material([(make_texture(i * 2 + 1), 0), (make_texture(i * 2 + 2), 1)])
+                 for i in range(MATERIAL_COUNT)]
+    own_meshes = make_meshes(VAOMesh, rng)
+    shared_meshes = make_meshes(SharedMesh, rng)
+    store = GeometryStore.get(ATTRIBUTES)
+    print(f'store: {store.vertex_ranges.end} vertices, {store.index_ranges.end} indices, '
+          f'{store.vbo.size} / {store.ebo.size} allocated')
+
+    print(f'{"draws":>7} {"own ms":>7} {"shared ms":>10} {"own calls":>10} {"shared calls":>13} '
+          f'{"own vao":>8} {"shared vao":>11} {"own gl":>7} {"shared gl":>10}')
+    for model_count in MODEL_COUNTS:
+        results = []
+        for meshes in (own_meshes, shared_meshes):
+            models = [make_model(meshes, materials) for _ in range(model_count)]
+            for i, model in enumerate(models):
+                model.matrix_slot = i * len(model.nodes)
+            queue = RenderQueue(DrawList(lambda: models)).select(models)
+            time, calls = run(queue.execute, frames)
+            results.append((time, calls, dict(queue.stats)))
+        (own_time, own_calls, own), (shared_time, shared_calls, shared) = results
+        assert own['draws'] == shared['draws']
+        print(f'{own["draws"]:>7} {own_time * 1000:>7.2f} {shared_time * 1000:>10.2f} '
+              f'{own["draw_calls"]:>10} {shared["draw_calls"]:>13} '
+              f'{own["vao_changes"]:>8} {shared["vao_changes"]:>11} {own_calls:>7.0f} {shared_calls:>10.0f}')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
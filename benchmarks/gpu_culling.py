@@ -0,0 +1,127 @@
+"""
+CPU time per frame of the first pass of a static scene with 1k-100k instances of a few assets (one mesh each,
+packed into a GeometryStore), culled on CPU (FrustumCuller.cull_model for every model, then sorted by RenderQueue)
+and on GPU (GPUCullingQueue: one compute dispatch and a multi-draw per batch). Instances are spread around
+the camera, about a twentieth of them is in its frustum.
+`rebuild ms` is the one-time upload of the GPU queue items, done when models change.
+GL functions (and the compute program) are replaced by a call counter, so only Python time is measured
+and no GL context is needed.
+Run from the repository root: python -m benchmarks.gpu_culling
+"""
+import sys
+from time import perf_counter
+from types import SimpleNamespace
+
+import glm
+import numpy as np
+
+import engine.gl.state
+import engine.renderer.gpu_culling
+from benchmarks.draw_list import gl_call, gl_calls, patch_gl, make_texture
+from benchmarks.geometry_store import patch_gl_objects
+from engine.gl.geometry import SharedMesh
+from engine.gl.state import GLState
+from engine.lib.np_helper import mat2array
+from engine.model.model import Model, Node, RenderCompound, Material
+from engine.renderer.dependencies.base import UniformBufferBindingPointManager
+from engine.renderer.draw_list import DrawList
+from engine.renderer.gpu_culling import GPUCullingQueue
+from engine.renderer.render_queue import RenderQueue
+from engine.scene.culling import FrustumCuller
+
+INSTANCE_COUNTS = (1000, 10000, 100000)
+ASSET_COUNT = 8
+MATERIAL_COUNT = 4
+FRAMES = 10
+BOUNDS = (np.full(3, -1, 'float32'), np.ones(3, 'float32'))
+
+
+class CountedComputeProgram:
+    # compute program without GL objects, dispatch is counted as a GL call
+    def __init__(self, _source):
+        self.gl_program = 0
+
+    def get_uniform_setter(self, *_args):
+        return gl_call
+
+    def get_ssbo_block_indices(self):
+        return {'ModelMatrices': 0, 'CullItems': 1, 'CullCommands': 2, 'CullCounters': 3}
+
+    def use(self):
+        GLState.use_program(self.gl_program)
+
+    def dispatch(self, *_args, **_kwargs):
+        gl_call()
+
+
+def patch_gpu_culling():
+    module = engine.renderer.gpu_culling
+    for name in ('glClearBufferData', 'glShaderStorageBlockBinding', 'glMultiDrawElementsIndirect',
+                 'glMultiDrawElementsIndirectCount'):
+        setattr(module, name, gl_call)
+    module.ComputeProgram = CountedComputeProgram
+    engine.gl.state.glUseProgram = gl_call
+    UniformBufferBindingPointManager.max_count = 64
+    UniformBufferBindingPointManager.points = [None] * 64
+
+
+def make_model(mesh, material, position):
+    root = Node(meshes=[RenderCompound(mesh, material, BOUNDS)])
+    model = Model(root_node=root).finished()
+    world_matrix = np.identity(4, 'float32')
+    world_matrix[3, :3] = position
+    model.set_world_matrix(world_matrix)
+    return model
+
+
+def run(draw, frames):
+    gl_calls[0] = 0
+    start = perf_counter()
+    for _ in range(frames):
+        GLState.invalidate()
+        draw()
+    return (perf_counter() - start) / frames, gl_calls[0] / frames
+
+
+def main(frames=FRAMES):
+    patch_gl()
+    patch_gl_objects()
+    patch_gpu_culling()
+    rng = np.random.default_rng(0)
+    materials = [Material([(make_texture(i * 2 + 1), 0), (make_texture(i * 2 + 2), 1)])
+                 for i in range(MATERIAL_COUNT)]
+    meshes = [SharedMesh(rng.random(24 * 8, 'float32'), rng.integers(0, 24, 36).astype('uint32'), (3, 3, 2))
+              for _ in range(ASSET_COUNT)]
+    culler = FrustumCuller()
+    view_projection = mat2array(glm.perspective(glm.radians(60), 1, 0.1, 1000))  # camera looking along -z
+    culler.set_view_projection(view_projection)
+    model_matrices = SimpleNamespace(layout_version=0, binding_point=0)  # stands for ModelMatrices dependency
+
+    print(f'{"instances":>10} {"visible":>8} {"cpu ms":>8} {"gpu ms":>8} {"rebuild ms":>11} '
+          f'{"cpu gl":>7} {"gpu gl":>7} {"batches":>8}')
+    for count in INSTANCE_COUNTS:
+        assets = rng.integers(ASSET_COUNT, size=count)
+        models = [make_model(meshes[asset], materials[asset % MATERIAL_COUNT], position)
+                  for asset, position in zip(assets, rng.uniform(-1, 1, (count, 3)) * 500)]
+        for i, model in enumerate(models):
+            model.matrix_slot = i
+        draw_list = DrawList(lambda: models)
+        queue = RenderQueue(draw_list)
+        gpu_queue = GPUCullingQueue(draw_list, lambda: models).select(culler.get_planes(), model_matrices)
+
+        def draw_cpu():
+            visible = [model for model in models if culler.cull_model(model)]
+            return queue.select(visible, view_projection).execute()
+
+        visible = draw_cpu()
+        cpu_time, cpu_calls = run(draw_cpu, frames)
+        start = perf_counter()
+        gpu_queue.rebuild()
+        rebuild_time = perf_counter() - start
+        gpu_time, gpu_calls = run(gpu_queue.execute, frames)
+        print(f'{count:>10} {visible:>8} {cpu_time * 1000:>8.2f} {gpu_time * 1000:>8.3f} {rebuild_time * 1000:>11.2f} '
+              f'{cpu_calls:>7.0f} {gpu_calls:>7.0f} {len(gpu_queue.batches):>8}')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
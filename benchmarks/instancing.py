@@ -0,0 +1,78 @@
+"""
+CPU time per frame of the first pass of N placements of the same 4-node model: N Model copies
+(culled by FrustumCuller.cull_model and sorted by RenderQueue, every item a separate indirect command)
+and one InstancedModel (every item drawn once for all instances). All placements are in the camera frustum.
+GL functions are replaced by a call counter, so only Python time is measured and no GL context is needed.
+Run from the repository root: python -m benchmarks.instancing
+"""
+import sys
+from time import perf_counter
+
+import numpy as np
+
+from benchmarks.draw_list import gl_calls, patch_gl, make_texture, make_mesh
+from engine.gl.state import GLState
+from engine.model.model import Model, Node, RenderCompound, Material, InstancedModel
+from engine.renderer.draw_list import DrawList
+from engine.renderer.render_queue import RenderQueue
+from engine.scene.culling import FrustumCuller
+
+INSTANCE_COUNTS = (100, 1000, 10000)
+NODES_PER_MODEL = 4
+FRAMES = 20
+BOUNDS = (np.full(3, -1, 'float32'), np.ones(3, 'float32'))
+
+
+def make_model(meshes, materials):
+    root = Node()
+    for i, mesh in enumerate(meshes):
+        root.child_nodes.append(Node(root, meshes=[RenderCompound(mesh, materials[i % len(materials)], BOUNDS)]))
+    return Model(root_node=root).finished()
+
+
+def run(draw, frames):
+    gl_calls[0] = 0
+    start = perf_counter()
+    for _ in range(frames):
+        GLState.invalidate()
+        draw()
+    return (perf_counter() - start) / frames, gl_calls[0] / frames
+
+
+def main(frames=FRAMES):
+    patch_gl()
+    rng = np.random.default_rng(0)
+    materials = [Material([(make_texture(i * 2 + 1), 0), (make_texture(i * 2 + 2), 1)]) for i in range(2)]
+    meshes = [make_mesh(i + 1) for i in range(NODES_PER_MODEL)]
+    culler = FrustumCuller()
+    culler.enabled = False  # everything is visible, only the cost of testing is measured
+
+    print(f'{"instances":>10} {"copies ms":>10} {"instanced ms":>13} {"copies items":>13} {"instanced items":>16} '
+          f'{"copies gl":>10} {"instanced gl":>13}')
+    for count in INSTANCE_COUNTS:
+        placements = np.repeat(np.identity(4, 'float32')[None], count, 0)
+        placements[:, 3, :3] = rng.uniform(-100, 100, (count, 3))
+        copies = [make_model(meshes, materials) for _ in range(count)]
+        for i, (model, placement) in enumerate(zip(copies, placements)):
+            model.set_world_matrix(placement)
+            model.matrix_slot = i * NODES_PER_MODEL
+        instanced = [InstancedModel(copies[0], placements)]
+        instanced[0].matrix_slot = 0
+
+        results = []
+        for models in (copies, instanced):
+            queue = RenderQueue(DrawList(lambda: models))
+
+            def draw():
+                visible = [model for model in models if culler.cull_model(model)]
+                return queue.select(visible).execute()
+
+            time, calls = run(draw, frames)
+            results.append((time, calls, queue.stats['draws']))
+        (copies_time, copies_calls, copies_items), (instanced_time, instanced_calls, instanced_items) = results
+        print(f'{count:>10} {copies_time * 1000:>10.2f} {instanced_time * 1000:>13.3f} {copies_items:>13} '
+              f'{instanced_items:>16} {copies_calls:>10.0f} {instanced_calls:>13.0f}')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
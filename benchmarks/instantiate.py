@@ -0,0 +1,51 @@
+"""
+Time to place a loaded model once more: Model.instantiate() (shares meshes and materials, copies nodes
+and matrices) compared to building the same hierarchy again with Model.finished(), which is done by every
+load_model() + format() on top of importing the file and uploading meshes and textures.
+No GL objects are created, so no GL context is needed.
+Run from the repository root: python -m benchmarks.instantiate
+"""
+import sys
+from time import perf_counter
+
+import numpy as np
+
+from benchmarks.draw_list import make_texture, make_mesh
+from engine.model.model import Model, Node, RenderCompound, Material
+
+NODE_COUNTS = (1, 10, 100, 1000)
+COMPOUNDS_PER_NODE = 2
+REPEATS = 100
+BOUNDS = (np.full(3, -1, 'float32'), np.ones(3, 'float32'))
+
+
+def make_model(node_count, materials):
+    # 100 nodes and 25 materials is roughly Sponza
+    root = Node()
+    for i in range(node_count - 1):
+        meshes = [RenderCompound(make_mesh(i * COMPOUNDS_PER_NODE + j + 1), materials[i % len(materials)], BOUNDS)
+                  for j in range(COMPOUNDS_PER_NODE)]
+        root.child_nodes.append(Node(root, meshes=meshes))
+    return Model(materials, root_node=root).finished()
+
+
+def measure(func, repeats):
+    start = perf_counter()
+    for _ in range(repeats):
+        func()
+    return (perf_counter() - start) / repeats
+
+
+def main(repeats=REPEATS):
+    materials = [Material([(make_texture(i * 2 + 1), 0), (make_texture(i * 2 + 2), 1)]) for i in range(25)]
+    print(f'{"nodes":>6} {"instantiate us":>15} {"finished() us":>14}')
+    for node_count in NODE_COUNTS:
+        model = make_model(node_count, materials)
+        instantiate_time = measure(model.instantiate, repeats)
+        finished_time = measure(lambda: Model(model.materials, model.meshes, model.root_node.copy()).finished(),
+                                repeats)
+        print(f'{node_count:>6} {instantiate_time * 1e6:>15.1f} {finished_time * 1e6:>14.1f}')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
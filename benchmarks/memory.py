@@ -0,0 +1,143 @@
+"""
+Memory benchmark of slotted scene, model and event objects.
+Every class is compared to a copy of itself built without __slots__ (as they were before),
+reporting bytes per object and allocated memory blocks of a frame worth of draw events.
+Dispatch of instant draw events is compared for the generic setattr constructor, generated positional
+constructor and pooled events reused from the free list.
+Run from the repository root: python -m benchmarks.memory
+"""
+import gc
+import sys
+import tracemalloc
+from time import perf_counter
+
+from engine.event.base import BaseEvent, BaseEventReceiver, EventManager
+from engine.model.model import Node, RenderCompound, RenderCompoundDrawEvent, NodeDrawEvent
+from engine.scene.component import Component, ComponentAddEvent
+from engine.scene.game_object import GameObject
+
+OBJECT_COUNT = 20000
+FRAME_COMPOUNDS = 10000  # RenderCompounds drawn in a frame, every node has 4 of them
+FRAMES = 20
+
+_unslotted_cache = {}
+
+
+def unslotted(cls):
+    # same class hierarchy with the same methods, but without __slots__
+    if cls is object:
+        return object
+    if cls not in _unslotted_cache:
+        slots = set(cls.__dict__.get('__slots__', ()))
+        namespace = {key: value for key, value in cls.__dict__.items()
+                     if key not in slots and key not in ('__slots__', '__dict__', '__weakref__')}
+        _unslotted_cache[cls] = type(cls.__name__, tuple(unslotted(base) for base in cls.__bases__), namespace)
+    return _unslotted_cache[cls]
+
+
+def measure(factory, count):
+    # bytes and memory blocks allocated per object kept alive
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    objects = [factory() for _ in range(count)]
+    stats = tracemalloc.take_snapshot().compare_to(before, 'filename')
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in stats) - sys.getsizeof(objects)
+    blocks = sum(stat.count_diff for stat in stats) - 1
+    return size / count, blocks / count
+
+
+def draw_frame(node_event, compound_event, nodes, compounds):
+    # events posted by Model.draw(), kept alive to count allocations of the whole frame
+    events = []
+    for node, node_compounds in zip(nodes, compounds):
+        events.append(node_event(node, instant=True))
+        for compound in node_compounds:
+            events.append(compound_event(compound, instant=True))
+    return events
+
+
+def run_frames(node_event, compound_event):
+    nodes = [object() for _ in range(FRAME_COMPOUNDS // 4)]
+    compounds = [[object()] * 4 for _ in nodes]
+    start = perf_counter()
+    for _ in range(FRAMES):
+        draw_frame(node_event, compound_event, nodes, compounds)
+    frame_ms = (perf_counter() - start) / FRAMES * 1000
+    _, blocks = measure(lambda: draw_frame(node_event, compound_event, nodes, compounds), 1)
+    return frame_ms, blocks
+
+
+class DrawReceiver(BaseEventReceiver):
+    _event_subscriptions_ = (NodeDrawEvent, RenderCompoundDrawEvent)
+
+    def on_node_draw(self, event):
+        pass
+
+    def on_render_compound_draw(self, event):
+        pass
+
+
+def with_constructor(cls, init):
+    # same event type without free list, using the given constructor
+    return type(cls.__name__, (cls, ), {'__slots__': (), '_free_': None, '__init__': init})
+
+
+def run_dispatch(make_node_event, make_compound_event):
+    manager = EventManager()
+    DrawReceiver(manager)
+    nodes = [object() for _ in range(FRAME_COMPOUNDS // 4)]
+    collections = []
+    gc.callbacks.append(lambda phase, info: collections.append(info) if phase == 'start' else None)
+    for cls in (NodeDrawEvent, RenderCompoundDrawEvent):
+        cls._free_.clear()
+    start = perf_counter()
+    for _ in range(FRAMES):
+        for node in nodes:
+            manager.add_event(make_node_event(node, instant=True))
+            for _ in range(4):
+                manager.add_event(make_compound_event(node, instant=True))
+    frame_ms = (perf_counter() - start) / FRAMES * 1000
+    gc.callbacks.pop()
+    pooled = len(NodeDrawEvent._free_) + len(RenderCompoundDrawEvent._free_)
+    created = pooled / FRAMES if pooled else len(nodes) * 5  # every pooled instance ends in the free list
+    return frame_ms, created, len(collections)
+
+
+def main(count=OBJECT_COUNT):
+    cases = (
+        ('GameObject', GameObject, lambda cls: cls()),
+        ('Component', Component, lambda cls: cls()),
+        ('Node', Node, lambda cls: cls()),
+        ('RenderCompound', RenderCompound, lambda cls: cls(None, None)),
+        ('RenderCompoundDrawEvent', RenderCompoundDrawEvent, lambda cls: cls(None, instant=True)),
+        ('ComponentAddEvent', ComponentAddEvent, lambda cls: cls(None)),
+    )
+    print(f'{"bytes per object":<26} {"dict":>8} {"slots":>8} {"blocks":>7} {"slot bl":>7}')
+    for name, cls, factory in cases:
+        dict_size, dict_blocks = measure(lambda: factory(unslotted(cls)), count)
+        slot_size, slot_blocks = measure(lambda: factory(cls), count)
+        print(f'{name:<26} {dict_size:>8.1f} {slot_size:>8.1f} {dict_blocks:>7.2f} {slot_blocks:>7.2f}')
+
+    print(f'\ndraw events of {FRAME_COMPOUNDS} RenderCompounds per frame')
+    print(f'{"":<26} {"ms":>8} {"blocks":>8}')
+    for name, node_event, compound_event in (
+            ('dict', unslotted(NodeDrawEvent), unslotted(RenderCompoundDrawEvent)),
+            ('slots', NodeDrawEvent, RenderCompoundDrawEvent)):
+        frame_ms, blocks = run_frames(node_event, compound_event)
+        print(f'{name:<26} {frame_ms:>8.2f} {blocks:>8.0f}')
+
+    print(f'\ndispatch of instant draw events of {FRAME_COMPOUNDS} RenderCompounds per frame')
+    print(f'{"":<26} {"ms":>8} {"created":>8} {"gc runs":>8}')
+    for name, node_event, compound_event in (
+            ('setattr constructor', with_constructor(NodeDrawEvent, BaseEvent.__init__),
+             with_constructor(RenderCompoundDrawEvent, BaseEvent.__init__)),
+            ('positional constructor', with_constructor(NodeDrawEvent, NodeDrawEvent.__init__),
+             with_constructor(RenderCompoundDrawEvent, RenderCompoundDrawEvent.__init__)),
+            ('pooled create()', NodeDrawEvent.create, RenderCompoundDrawEvent.create)):
+        frame_ms, created, collections = run_dispatch(node_event, compound_event)
+        print(f'{name:<26} {frame_ms:>8.2f} {created:>8.1f} {collections:>8}')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
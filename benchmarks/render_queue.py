@@ -0,0 +1,92 @@
+"""
+State changes per frame of the first pass drawn in model order (DrawList) and sorted by material, mesh and depth
+(RenderQueue). Models are instances of a few assets placed in random order, as scenes are usually built,
+their node matrices are taken from ModelMatrices SSBO. GL functions are replaced by a call counter.
+Run from the repository root: python -m benchmarks.render_queue
+"""
+import sys
+from time import perf_counter
+
+import numpy as np
+
+from benchmarks.draw_list import gl_calls, patch_gl, make_texture, make_mesh
+from engine.gl.state import GLState
+from engine.model.model import Model, Node, RenderCompound, Material
+from engine.renderer.draw_list import DrawList
+from engine.renderer.render_queue import RenderQueue, radix_argsort
+
+MODEL_COUNTS = (100, 1000, 5000)
+ASSET_COUNT = 16
+MATERIAL_COUNT = 8
+NODES_PER_MODEL = 4
+FRAMES = 20
+BOUNDS = (np.full(3, -1, 'float32'), np.ones(3, 'float32'))
+
+
+def make_asset(asset, materials):
+    # (mesh, material) of every node, shared by all instances of the asset
+    return [(make_mesh(asset * NODES_PER_MODEL + i + 1), materials[(asset + i) % len(materials)])
+            for i in range(NODES_PER_MODEL)]
+
+
+def make_model(asset, position):
+    root = Node()
+    for mesh, material in asset:
+        root.child_nodes.append(Node(root, meshes=[RenderCompound(mesh, material, BOUNDS)]))
+    model = Model(root_node=root).finished()
+    world_matrix = np.identity(4, 'float32')
+    world_matrix[3, :3] = position
+    model.set_world_matrix(world_matrix)
+    return model
+
+
+def run(draw, frames):
+    gl_calls[0] = 0
+    start = perf_counter()
+    for _ in range(frames):
+        GLState.invalidate()
+        draw()
+    return (perf_counter() - start) / frames, gl_calls[0] / frames
+
+
+def main(frames=FRAMES):
+    patch_gl()
+    rng = np.random.default_rng(0)
+    materials = [Material([(make_texture(i * 2 + 1), 0), (make_texture(i * 2 + 2), 1)])
+                 for i in range(MATERIAL_COUNT)]
+    assets = [make_asset(i, materials) for i in range(ASSET_COUNT)]
+    view_projection = np.identity(4, 'float32')
+    view_projection[2, 3] = -1  # w = -z, camera looking along -z
+
+    keys = rng.integers(0, 1 << 48, 100000, dtype='uint64')
+    start = perf_counter()
+    order = radix_argsort(keys, 48)
+    radix_ms = (perf_counter() - start) * 1000
+    start = perf_counter()
+    assert (np.argsort(keys, kind='stable') == order).all()
+    print(f'100000 keys: radix sort {radix_ms:.2f} ms, numpy stable sort {(perf_counter() - start) * 1000:.2f} ms')
+
+    print(f'{"draws":>7} {"list ms":>8} {"queue ms":>9} {"list mat":>9} {"queue mat":>10} '
+          f'{"list vao":>9} {"queue vao":>10} {"list gl":>8} {"queue gl":>9}')
+    for count in MODEL_COUNTS:
+        models = [make_model(assets[rng.integers(ASSET_COUNT)], rng.uniform(-100, 100, 3) - (0, 0, 150))
+                  for _ in range(count)]
+        for i, model in enumerate(models):
+            model.matrix_slot = i * NODES_PER_MODEL
+        draw_list = DrawList(lambda: models)
+        queue = RenderQueue(draw_list).select(models, view_projection)
+        draw_list.select(models)
+
+        list_time, list_calls = run(draw_list.execute, frames)
+        list_stats = dict(draw_list.stats)
+        queue_time, queue_calls = run(queue.execute, frames)
+        queue_stats = queue.stats
+        assert list_stats['draws'] == queue_stats['draws']
+        print(f'{list_stats["draws"]:>7} {list_time * 1000:>8.2f} {queue_time * 1000:>9.2f} '
+              f'{list_stats["material_changes"]:>9} {queue_stats["material_changes"]:>10} '
+              f'{list_stats["vao_changes"]:>9} {queue_stats["vao_changes"]:>10} '
+              f'{list_calls:>8.0f} {queue_calls:>9.0f}')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,77 @@
+"""
+Spatial index benchmark: cost of building, refitting and querying DynamicAABBTree
+compared to a brute-force vectorized scan, for growing object counts.
+Run from the repository root: python -m benchmarks.spatial_index
+"""
+import sys
+import random
+from time import perf_counter
+
+import glm
+import numpy as np
+
+from engine.lib.np_helper import mat2array
+from engine.scene.culling import FrustumCuller
+from engine.scene.spatial import DynamicAABBTree
+
+COUNTS = (1000, 10000, 30000, 100000)
+WORLD_SIZE = 2000.
+QUERY_REPEATS = 20
+
+
+def timed(func, repeats=1):
+    start = perf_counter()
+    for _ in range(repeats):
+        result = func()
+    return (perf_counter() - start) / repeats * 1000, result
+
+
+def make_culler():
+    culler = FrustumCuller()
+    view = glm.lookAt(glm.vec3(0, 0, 0), glm.vec3(1, 0, 0), glm.vec3(0, 1, 0))
+    projection = glm.perspective(glm.radians(60), 16 / 9, 0.1, 300)
+    culler.set_view_projection(mat2array(projection * view))
+    return culler
+
+
+def run(count, rng):
+    lower = np.array([[rng.uniform(-WORLD_SIZE, WORLD_SIZE) for _ in range(3)] for _ in range(count)])
+    upper = lower + np.array([[rng.uniform(0.5, 5) for _ in range(3)] for _ in range(count)])
+    centers, extents = (lower + upper) / 2, (upper - lower) / 2
+    lower_list, upper_list = lower.tolist(), upper.tolist()
+    culler = make_culler()
+
+    tree = DynamicAABBTree()
+    build_ms, proxies = timed(lambda: [tree.insert(i, lo, hi)
+                                       for i, (lo, hi) in enumerate(zip(lower_list, upper_list))])
+
+    # 1% of objects move a bit every frame
+    moved = rng.sample(range(count), max(1, count // 100))
+
+    def refit():
+        for i in moved:
+            offset = rng.uniform(-2, 2)
+            tree.move(proxies[i], [c + offset for c in lower_list[i]], [c + offset for c in upper_list[i]])
+    refit_ms, _ = timed(refit)
+
+    frustum_ms, visible = timed(lambda: tree.query_frustum(culler), QUERY_REPEATS)
+    scan_ms, mask = timed(lambda: culler.test(centers, extents), QUERY_REPEATS)
+    sphere_ms, _ = timed(lambda: tree.query_sphere((0, 0, 0), 100), QUERY_REPEATS)
+    nearest_ms, _ = timed(lambda: tree.nearest((0, 0, 0), 8), QUERY_REPEATS)
+    scan_nearest_ms, _ = timed(lambda: np.argpartition(
+        (np.maximum(np.maximum(lower, 0), -upper) ** 2).sum(axis=1), 8)[:8], QUERY_REPEATS)
+
+    print(f'{count:>7} {build_ms:>9.1f} {refit_ms:>9.2f} {tree.get_height():>6} '
+          f'{frustum_ms:>9.3f} {scan_ms:>9.3f} {len(visible):>7} {int(mask.sum()):>7} '
+          f'{sphere_ms:>9.3f} {nearest_ms:>9.3f} {scan_nearest_ms:>9.3f}')
+
+
+def main(counts=COUNTS):
+    rng = random.Random(0)
+    print('   objs  build,ms  refit,ms height  frust,ms   scan,ms  tree_n  scan_n  spher,ms   near,ms  scanN,ms')
+    for count in counts:
+        run(count, rng)
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or COUNTS)
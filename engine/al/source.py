@@ -75,3 +75,6 @@ class SoundSource:
 
     def play(self):
         alSourcePlay(self.al_id)
+
+    def stop(self):
+        alSourceStop(self.al_id)
@@ -1,9 +1,78 @@
+from collections import deque
+from json import dumps
+from re import sub
+from timeit import default_timer as timer
+
+MAX_FREE_EVENTS = 64  # free list size of every pooled event type, enough for nested instant events
+
+# queued events are polled by priority
+PRIORITY_CRITICAL = 0  # always polled first (ticks, camera)
+PRIORITY_NORMAL = 1
+PRIORITY_BULK = 2  # polled within the time budget, may be spread across frames (objects entering scene)
+
+
+def get_handler_name(event_name):
+    # 'ComponentAddEvent' -> 'on_component_add'
+    if event_name.endswith('Event'):
+        event_name = event_name[:-len('Event')]
+    return 'on_' + sub(r'(?<!^)(?=[A-Z])', '_', event_name).lower()
+
+
+def _make_event_methods(fields):
+    # positional constructor assigning every field directly (missing fields are set to None)
+    # and create() taking instances from the free list of pooled types
+    args = ''.join(', %s=None' % field for field in fields)
+    assignments = ''.join('    self.%s = %s\n' % (field, field) for field in fields)
+    source = ('def __init__(self%s, *, instant=False):\n'
+              '    self.instant = instant\n%s\n'
+              'def create(cls%s, *, instant=False):\n'
+              '    free = cls._free_\n'
+              '    self = free.pop() if free else new(cls)\n'
+              '    self.instant = instant\n%s'
+              '    return self\n') % (args, assignments, args, assignments)
+    namespace = {'new': object.__new__}
+    exec(source, namespace)
+    return namespace['__init__'], classmethod(namespace['create'])
+
+
 class BaseEvent:
+    __slots__ = ('instant', 'posted_at')
     _fields_ = ()
+    _handler_name_ = 'on_event'  # receiver method called for subscriptions to this type
+    _coalesce_by_ = None  # field with event target, queued events of same type and target are merged
+    _free_ = None  # recycled instances of pooled types
+    _priority_ = PRIORITY_NORMAL
 
     @classmethod
-    def create_meta(cls, name, attributes=()):
-        return type(name, (cls, ), {'_fields_': cls._fields_ + attributes})
+    def create_meta(cls, name, attributes=(), coalesce_by=None, pooled=False, priority=None):
+        """
+        :param coalesce_by: name of the field with event target. Only the last queued event of this type
+          is kept for every target until events are polled. Inherited by subtypes
+        :param pooled: instant events of this type are reused by create() after dispatch,
+          so handlers must not keep them
+        :param priority: one of PRIORITY_* constants, inherited by subtypes if not set
+        """
+        # event types are slotted, so events of frequent types (e.g. draw events) are small and fast to create
+        fields = cls._fields_ + tuple(attr for attr in attributes if attr not in cls._fields_)
+        init, create = _make_event_methods(fields)
+        return type(name, (cls, ), {'_fields_': fields,
+                                    '_handler_name_': get_handler_name(name),
+                                    '_coalesce_by_': cls._coalesce_by_ if coalesce_by is None else coalesce_by,
+                                    '_free_': [] if pooled else None,
+                                    '_priority_': cls._priority_ if priority is None else priority,
+                                    '__slots__': fields[len(cls._fields_):],
+                                    '__init__': init,
+                                    'create': create})
+
+    @classmethod
+    def create(cls, *args, instant=False):
+        # same as constructor, but takes an instance from the free list of pooled types
+        free = cls._free_
+        if free:
+            event = free.pop()
+            event.__init__(*args, instant=instant)
+            return event
+        return cls(*args, instant=instant)
 
     def __init__(self, *args, instant=False):
         self.instant = instant
@@ -12,51 +81,287 @@ class BaseEvent:
 
 
 class BaseEventReceiver:
+    """
+    Subscribes to every type in `_event_subscriptions_` and its subclasses.
+    Events are passed to the method named by event type (`on_tick` for TickEvent, `on_component_add`
+    for ComponentAddEvent, etc.), or to `on_event` if receiver has no such method
+    """
     _event_subscriptions_ = ()
 
-    def __init__(self):
+    def __init__(self, event_manager=None):
+        self.event_manager = None
+        self.subscribe(MainEventManager if event_manager is None else event_manager)
+
+    def subscribe(self, event_manager):
+        self.event_manager = event_manager
         for evt_type in self._event_subscriptions_:
-            MainEventManager.add_handler(self, evt_type)
+            event_manager.add_handler(self, evt_type, getattr(self, evt_type._handler_name_, self.on_event))
 
     def on_event(self, evt: BaseEvent):
         pass
 
-    def __del__(self):
-        pass  # todo unsubscribe from events and move it from __del__
-              # (it will not be called because object stored in event manager
+    def unsubscribe(self):
+        if self.event_manager is None:
+            return
+        for evt_type in self._event_subscriptions_:
+            self.event_manager.remove_handler(self, evt_type)
+        self.event_manager = None
+
+
+def get_handler_label(handler):
+    # 'MVPMatrices.CurrentDependence.on_node_draw' for bound methods
+    module = getattr(handler, '__module__', None) or ''
+    return '%s.%s' % (module.rsplit('.', 1)[-1], getattr(handler, '__qualname__', repr(handler)))
+
+
+class EventProfiler:
+    """
+    Call count and cumulative time of every (event type, handler) pair per frame.
+    Handler time includes handlers of events posted instantly from it.
+    Enabled by EventManager.enable_profiling(), frames are finished by Scene.draw()
+    """
+
+    def __init__(self, history=120):
+        self.history = deque(maxlen=history)  # records of last finished frames
+        self.current = {}  # (event type name, handler label): [calls, seconds] of the current frame
+
+    def wrap(self, event_class, handler):
+        key = (event_class.__name__, get_handler_label(handler))
+        current = self.current
+
+        def timed_handler(evt):
+            start = timer()
+            handler(evt)
+            elapsed = timer() - start
+            try:
+                record = current[key]
+            except KeyError:
+                record = current[key] = [0, 0.]
+            record[0] += 1
+            record[1] += elapsed
+        return timed_handler
+
+    def end_frame(self):
+        self.history.append(dict((key, tuple(value)) for key, value in self.current.items()))
+        self.current.clear()
+
+    def get_summary(self):
+        """
+        :return:
+          list of dicts (event, handler, calls and ms per frame averaged over history), slowest first
+        """
+        frame_count = max(len(self.history), 1)
+        totals = {}
+        for frame in self.history:
+            for key, (calls, seconds) in frame.items():
+                total = totals.setdefault(key, [0, 0.])
+                total[0] += calls
+                total[1] += seconds
+        summary = [{'event': event, 'handler': handler, 'calls': calls / frame_count,
+                    'ms': seconds * 1000 / frame_count} for (event, handler), (calls, seconds) in totals.items()]
+        summary.sort(key=lambda item: item['ms'], reverse=True)
+        return summary
+
+    def dump(self, count=20, file=None):
+        # prints the slowest handlers
+        print('%10s %10s  %-30s %s' % ('ms/frame', 'calls', 'event', 'handler'), file=file)
+        for item in self.get_summary()[:count]:
+            print('%10.3f %10.1f  %-30s %s' % (item['ms'], item['calls'], item['event'], item['handler']), file=file)
+
+    def to_json(self):
+        return dumps({'frames': len(self.history), 'handlers': self.get_summary()}, indent=2)
 
 
 class EventManager:
-    def __init__(self):
-        self.handlers = {}
-        self.events = []
+    """
+    Queued events are polled by priority, FIFO within a priority. Critical and normal events are always polled,
+    bulk events only while `time_budget` of the poll is not exceeded (at least one per poll), the rest stay
+    in the queue for the next polls
+    """
+
+    def __init__(self, time_budget=None, collect_stats=False):
+        """
+        :param collect_stats: count events in `stats` and timestamp queued ones to measure their latency,
+          reset_stats() after enabling it later
+        """
+        self.handlers = {}  # event type: [(receiver, handler method)]
+        self.queues = tuple(deque() for _ in range(PRIORITY_BULK + 1))  # queue of every priority
+        self.time_budget = time_budget  # seconds per poll_events() call, None for no limit
+        # event class: handler methods of the class and all its bases, rebuilt when subscriptions change
+        self._dispatch = {}
+        self._pending = {}  # (event class, id(target)): queued coalescable event
+        self.profiler = None  # EventProfiler, handlers are wrapped into timers only while it is set
+        self.collect_stats = collect_stats
+        # totals since creation or reset_stats() while collect_stats is set,
+        # latency is time in seconds between posting and polling
+        self.stats = {'queued': 0, 'coalesced': 0, 'polled': 0, 'deferred_polls': 0,
+                      'latency_total': 0., 'latency_max': 0.}
+
+    def reset_stats(self):
+        for key in self.stats:
+            self.stats[key] = 0
+
+    def clear(self):
+        # drops all queued events
+        for queue in self.queues:
+            queue.clear()
+        self._pending.clear()
 
-    def poll_events(self):
-        for evt in self.events:
-            self._poll_event(evt)
-        self.events.clear()
+    def get_queue_depth(self):
+        return sum(len(queue) for queue in self.queues)
+
+    def get_mean_latency(self):
+        return self.stats['latency_total'] / self.stats['polled'] if self.stats['polled'] else 0.
+
+    def poll_events(self, time_budget=None):
+        """
+        :param time_budget: overrides `self.time_budget` for this call
+        """
+        critical, normal, bulk = self.queues
+        if bulk or self.collect_stats:
+            return self._poll_timed(self.time_budget if time_budget is None else time_budget)
+        # critical and normal events are drained without timestamps and counting
+        pending = self._pending
+        dispatch = self._dispatch
+        queue = critical or normal
+        while queue:  # including events posted by handlers
+            evt = queue.popleft()
+            if evt._coalesce_by_ is not None:
+                pending.pop((evt.__class__, id(getattr(evt, evt._coalesce_by_))), None)
+            try:
+                handlers = dispatch[evt.__class__]
+            except KeyError:
+                handlers = self._build_dispatch(evt.__class__)
+            for handler in handlers:
+                handler(evt)
+            queue = critical or normal
+        if bulk:
+            # posted by handlers of this poll
+            self._poll_timed(self.time_budget if time_budget is None else time_budget)
+
+    def _poll_timed(self, time_budget):
+        # poll with bulk events or stats, timestamps are taken only for the time budget and latency
+        stats = self.stats
+        collect_stats = self.collect_stats
+        timed = time_budget is not None or collect_stats
+        start = timer() if timed else 0.
+        critical, normal, bulk = self.queues
+        pending = self._pending
+        dispatch = self._dispatch
+        bulk_polled = False
+        polled = 0
+        latency_total = 0.
+        latency_max = stats['latency_max']
+        try:
+            while True:
+                # events posted by handlers are polled too, higher priorities go first
+                queue = critical or normal or bulk
+                if not queue:
+                    break
+                now = start
+                if queue is bulk and timed:
+                    now = timer()
+                    if bulk_polled and time_budget is not None and now - start >= time_budget:
+                        if collect_stats:
+                            stats['deferred_polls'] += 1
+                        break
+                    bulk_polled = True
+                evt = queue.popleft()
+                if evt._coalesce_by_ is not None:
+                    pending.pop((evt.__class__, id(getattr(evt, evt._coalesce_by_))), None)
+                if collect_stats:
+                    # waiting time before the poll (or, for bulk events, before their turn),
+                    # events posted before collect_stats was set have no timestamp
+                    latency = max(now - getattr(evt, 'posted_at', now), 0.)
+                    latency_total += latency
+                    if latency > latency_max:
+                        latency_max = latency
+                polled += 1
+                try:
+                    handlers = dispatch[evt.__class__]
+                except KeyError:
+                    handlers = self._build_dispatch(evt.__class__)
+                for handler in handlers:
+                    handler(evt)
+        finally:
+            if collect_stats:
+                stats['polled'] += polled
+                stats['latency_total'] += latency_total
+                stats['latency_max'] = latency_max
 
     def _poll_event(self, evt):
         try:
-            handlers = self.handlers[evt.__class__]
+            handlers = self._dispatch[evt.__class__]
         except KeyError:
-            pass
-        else:
-            for handler in handlers:
-                handler.on_event(evt)
+            handlers = self._build_dispatch(evt.__class__)
+        for handler in handlers:
+            handler(evt)
+
+    def get_handlers(self, event_class):
+        """
+        Handlers called for events of the class, for code delivering frequent instant events by itself
+        (e.g. DrawList). Valid until subscriptions or profiling change
+        :return:
+          tuple of handler methods, empty if nothing is subscribed
+        """
+        try:
+            return self._dispatch[event_class]
+        except KeyError:
+            return self._build_dispatch(event_class)
+
+    def _build_dispatch(self, event_class):
+        handlers = tuple(handler for base in event_class.__mro__ for _, handler in self.handlers.get(base, ()))
+        if self.profiler is not None:
+            handlers = tuple(self.profiler.wrap(event_class, handler) for handler in handlers)
+        self._dispatch[event_class] = handlers
+        return handlers
+
+    def enable_profiling(self, history=120):
+        if self.profiler is None:
+            self.profiler = EventProfiler(history)
+            self._dispatch.clear()
+        return self.profiler
+
+    def disable_profiling(self):
+        self.profiler = None
+        self._dispatch.clear()
 
     def add_event(self, event: BaseEvent):
         if event.instant:
             self._poll_event(event)
-        else:
-            self.events.append(event)
+            free = event._free_
+            if free is not None and len(free) < MAX_FREE_EVENTS:
+                free.append(event)
+            return
+        coalesce_by = event._coalesce_by_
+        if coalesce_by is not None:
+            key = (event.__class__, id(getattr(event, coalesce_by)))
+            queued = self._pending.get(key)
+            if queued is not None:
+                # updating not yet polled event, so handlers get the latest data
+                for field in event._fields_:
+                    setattr(queued, field, getattr(event, field))
+                if self.collect_stats:
+                    self.stats['coalesced'] += 1
+                return
+            self._pending[key] = event
+        if self.collect_stats:
+            event.posted_at = timer()
+            self.stats['queued'] += 1
+        self.queues[event._priority_].append(event)
 
-    def add_handler(self, obj: BaseEventReceiver, event_type: BaseEvent):
-        try:
-            self.handlers[event_type].append(obj)
-        except KeyError:
-            self.handlers[event_type] = [obj]
+    def add_handler(self, obj: BaseEventReceiver, event_type: BaseEvent, method=None):
+        """
+        :param method: callable accepting the event, obj.on_event by default
+        """
+        self.handlers.setdefault(event_type, []).append((obj, obj.on_event if method is None else method))
+        self._dispatch.clear()
+
+    def remove_handler(self, obj: BaseEventReceiver, event_type: BaseEvent):
+        handlers = self.handlers.get(event_type, [])
+        handlers[:] = [item for item in handlers if item[0] is not obj]
+        self._dispatch.clear()
 
 
-# todo make event manager pinned to scene
+# default manager for objects outside of any scene, every Scene has its own `event_manager`
 MainEventManager = EventManager()
@@ -5,3 +5,5 @@ SceneEvent = BaseEvent.create_meta('SceneEvent', ())
 SceneChangeEvent = SceneEvent.create_meta('SceneChangeEvent', ())  # todo remove this event when instancing done and we have multiple scenes and event managers
 GameObjectEvent = SceneEvent.create_meta('GameObjectEvent', ('game_object', ))
 ComponentEvent = SceneEvent.create_meta('ComponentEvent', ('component', ))
+# posted (instantly) by Scene.draw() before drawing, when all update events of the tick are handled
+SceneDrawEvent = SceneEvent.create_meta('SceneDrawEvent', ('scene', ))
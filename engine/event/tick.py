@@ -1,3 +1,3 @@
-from .base import BaseEvent
+from .base import BaseEvent, PRIORITY_CRITICAL
 
-TickEvent = BaseEvent.create_meta('TickEvent', ('delta_time', ))
+TickEvent = BaseEvent.create_meta('TickEvent', ('delta_time', ), priority=PRIORITY_CRITICAL)
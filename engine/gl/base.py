@@ -4,6 +4,7 @@ from ctypes import cast
 import numpy as np
 
 from engine.lib.np_helper import int2array
+from .state import GLState
 
 
 class BasePositioned3D:
@@ -42,19 +43,22 @@ class BufferBase(BaseBindable):
         self.buffer_id = glGenBuffers(1)
         self._buffer_data = np.array([] if data is None else data, dtype=self.buff_type, copy=False)
         self.is_changed = True
+        self.is_mapped = False  # data is persistently mapped storage, see map_itself()
         if use:
             self.use()
 
     def use(self):
-        glBindBuffer(self.GL_BUF_TYPE, self.buffer_id)
+        GLState.bind_buffer(self.GL_BUF_TYPE, self.buffer_id)
 
     def upload(self):
-        if self.is_changed:
+        if self.is_changed and not self.is_mapped:
             self.use()
             glBufferData(self.GL_BUF_TYPE, self._buffer_data.nbytes, self._buffer_data, self.buffer_usage)
             self.is_changed = False
 
     def force_upload(self):
+        if self.is_mapped:
+            return  # storage is immutable and already has the data
         self.use()
         glBufferData(self.GL_BUF_TYPE, self._buffer_data.nbytes, self._buffer_data, self.buffer_usage)
         self.is_changed = False
@@ -64,16 +68,21 @@ class BufferBase(BaseBindable):
         glGetBufferSubData(self.GL_BUF_TYPE, 0, self._buffer_data.nbytes, self._buffer_data.view(np.uint8))
         self.is_changed = False
 
-    def sub_src_upload(self, offset, data):
+    def sub_src_upload(self, offset, data, stream=None):
+        """
+        :param stream: RingBuffer to copy data through, so GL does not wait for draws using the old data
+        """
+        if stream is not None and stream.copy_to(self, offset, data):
+            return
         self.use()
         glBufferSubData(self.GL_BUF_TYPE, offset, data.nbytes, data)
 
-    def chunk_upload(self, offset, size):
+    def chunk_upload(self, offset, size, stream=None):
         # offset and size described in buffer.dtype
-        self.sub_src_upload(offset * self._buffer_data.itemsize, self._buffer_data[offset:offset + size])
+        self.sub_src_upload(offset * self._buffer_data.itemsize, self._buffer_data[offset:offset + size], stream)
 
     def bind_to_block(self, index=None):
-        glBindBufferBase(self.GL_BUF_TYPE, super(BufferBase, self).bind_to_block(index), self.buffer_id)
+        GLState.bind_buffer_base(self.GL_BUF_TYPE, super(BufferBase, self).bind_to_block(index), self.buffer_id)
 
     def set_buf_data(self, data, upload=False):
         self.is_changed = True
@@ -120,18 +129,33 @@ class BufferBase(BaseBindable):
             self._buffer_data[old_len:] = 0
 
     def map_itself(self, size=None):
-        shape = (size, )
+        """
+        Replaces buffer storage with immutable one of `size` bytes (current data size by default), which
+        stays mapped while GL uses it. Current data is kept, further writes to the data are seen by GL
+        without uploading, so they must not change anything GL can still read (see RingBuffer)
+        :return:
+          mapped data array
+        """
+        shape = self._buffer_data.shape
         if size is None:
             size = self._buffer_data.nbytes
-            shape = self._buffer_data.shape
+        elif size != self._buffer_data.nbytes:
+            shape = (size // self._buffer_data.itemsize, )
 
+        # mapping must have the same persistent and coherent flags as the storage to be used while drawing
+        flags = GL_MAP_READ_BIT | GL_MAP_COHERENT_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_WRITE_BIT
         self.use()
-        glBufferStorage(self.GL_BUF_TYPE, size, None,
-                        GL_MAP_READ_BIT | GL_MAP_COHERENT_BIT | GL_MAP_PERSISTENT_BIT | GL_MAP_WRITE_BIT)
-        _raw_mapped_addr = glMapBufferRange(self.GL_BUF_TYPE, 0, size,
-                                            GL_MAP_READ_BIT | GL_MAP_WRITE_BIT)
+        glBufferStorage(self.GL_BUF_TYPE, size, None, flags)
+        _raw_mapped_addr = glMapBufferRange(self.GL_BUF_TYPE, 0, size, flags)
         c_type = np.ctypeslib.as_ctypes_type(self._buffer_data.dtype)
+        old_data = self._buffer_data.reshape(-1)
         self._buffer_data = int2array(_raw_mapped_addr, c_type, shape)
+        count = min(len(old_data), self._buffer_data.size)
+        self._buffer_data.reshape(-1)[:count] = old_data[:count]
+        self.is_mapped = True
+        self.is_changed = False
+        return self._buffer_data
 
     def __del__(self):
         glDeleteBuffers(1, [self.buffer_id])
+        GLState.forget_buffer(self.buffer_id)
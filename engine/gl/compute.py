@@ -0,0 +1,48 @@
+import numpy as np
+from OpenGL.GL import *
+from OpenGL.GL.shaders import compileShader
+
+from .shader import ShaderProgram
+from .state import GLState
+from ..lib.pathlib import read_file
+
+
+class ComputeProgram(ShaderProgram):
+    """
+    Program with a single compute shader. Uniform setters and introspection are shared with ShaderProgram
+    """
+
+    @classmethod
+    def from_file(cls, filename, use=False):
+        return cls(read_file(filename), use)
+
+    def __init__(self, cs, use=False):
+        self.gl_program = self.make_program_from_compute_source(cs, use)
+        # three values are written, so the output array is passed explicitly
+        local_size = np.zeros(3, 'int32')
+        glGetProgramiv(self.gl_program, GL_COMPUTE_WORK_GROUP_SIZE, local_size)
+        self.local_size = tuple(int(size) for size in local_size)
+
+    def dispatch(self, x, y=1, z=1, barrier=GL_SHADER_STORAGE_BARRIER_BIT):
+        """
+        Runs program for at least x*y*z invocations (work group count is rounded up by local size)
+        :param barrier: memory barrier bits to wait for after dispatch, 0 to skip waiting
+        """
+        local_x, local_y, local_z = self.local_size
+        glDispatchCompute((x + local_x - 1) // local_x, (y + local_y - 1) // local_y, (z + local_z - 1) // local_z)
+        if barrier:
+            glMemoryBarrier(barrier)
+
+    @staticmethod
+    def make_program_from_compute_source(compute_shader, use=True):
+        program = glCreateProgram()
+        compute_compiled = compileShader(compute_shader, GL_COMPUTE_SHADER) \
+            if isinstance(compute_shader, str) or isinstance(compute_shader, bytes) else compute_shader
+        glAttachShader(program, compute_compiled)
+
+        glLinkProgram(program)
+        if glGetProgramiv(program, GL_LINK_STATUS) == GL_FALSE:
+            raise RuntimeError(glGetProgramInfoLog(program).decode())
+        if use:
+            GLState.use_program(program)
+        return program
@@ -3,6 +3,7 @@ from typing import Union, Iterable
 from OpenGL.GL import *
 import numpy as np
 
+from .state import GLState
 from .texture import Texture2D
 
 FB_NONE = 0
@@ -116,7 +117,7 @@ class StaticFrameBuffer:
 
     @staticmethod
     def bind_default_framebuffer():
-        glBindFramebuffer(GL_FRAMEBUFFER, 0)
+        GLState.bind_framebuffer(0)
     use = bind_default_framebuffer
 
     @classmethod
@@ -125,7 +126,7 @@ class StaticFrameBuffer:
 
     @staticmethod
     def set_viewport(width, height):
-        glViewport(0, 0, width, height)
+        GLState.set_viewport(0, 0, width, height)
 
     @classmethod
     def add_depth_buffer(cls):
@@ -212,7 +213,7 @@ class FrameBuffer(StaticFrameBuffer):
         self.width, self.height = width, height
 
     def use(self):
-        glBindFramebuffer(GL_FRAMEBUFFER, self.buffer_id)
+        GLState.bind_framebuffer(self.buffer_id)
         self.set_viewport(self.width, self.height)
 
     @staticmethod
@@ -224,3 +225,4 @@ class FrameBuffer(StaticFrameBuffer):
 
     def __del__(self):
         glDeleteFramebuffers(1, [self.buffer_id])
+        GLState.forget_binding('framebuffer', self.buffer_id)
@@ -0,0 +1,170 @@
+from bisect import bisect
+
+import numpy as np
+from OpenGL.GL import GL_TRIANGLES, GL_UNSIGNED_INT, GL_DRAW_INDIRECT_BUFFER, GLvoidp, glDrawElementsBaseVertex
+
+from .base import BufferBase
+from .mesh import VAO, EBO, VAOMesh
+
+# bytes of DrawElementsIndirectCommand: count, instance count, first index, base vertex, base instance
+INDIRECT_COMMAND_SIZE = 20
+
+
+class DrawIndirectBuffer(BufferBase):
+    GL_BUF_TYPE = GL_DRAW_INDIRECT_BUFFER
+    ARRAY_TYPE = 'uint32'
+
+
+class RangeAllocator:
+    """
+    First-fit allocator of [offset, offset + size) ranges, freed ranges are merged with free neighbours.
+    Everything above `end` is free
+    """
+
+    def __init__(self):
+        self.free_ranges = []  # sorted (offset, size)
+        self.end = 0
+
+    def allocate(self, size):
+        for i, (offset, free_size) in enumerate(self.free_ranges):
+            if free_size >= size:
+                if free_size == size:
+                    del self.free_ranges[i]
+                else:
+                    self.free_ranges[i] = (offset + size, free_size - size)
+                return offset
+        offset = self.end
+        self.end += size
+        return offset
+
+    def free(self, offset, size):
+        if not size:
+            return
+        free_ranges = self.free_ranges
+        i = bisect(free_ranges, (offset, size))
+        if i < len(free_ranges) and free_ranges[i][0] == offset + size:
+            size += free_ranges.pop(i)[1]
+        if i and sum(free_ranges[i - 1]) == offset:
+            i -= 1
+            offset, previous_size = free_ranges.pop(i)
+            size += previous_size
+        if offset + size == self.end:
+            self.end = offset
+        else:
+            free_ranges.insert(i, (offset, size))
+
+    @property
+    def free_size(self):
+        # free space below `end`
+        return sum(size for _, size in self.free_ranges)
+
+
+class GeometryStore:
+    """
+    Vertices and indices of all meshes with the same attribute layout in shared VBO and EBO behind one VAO.
+    Meshes (SharedMesh) are ranges of these buffers drawn with base vertex, so drawing different meshes
+    requires no VAO change and can be done by a single glMultiDrawElementsIndirect (see DrawList).
+    Buffers grow by reallocation under the same names, keeping a copy of their data, so the VAO stays valid
+    """
+    stores = {}  # attribute layout: GeometryStore, see get()
+    MIN_CAPACITY = 1 << 16  # vertex buffer floats or indices allocated at once
+
+    def __init__(self, attrib_sizes):
+        self.vao = VAO(attrib_sizes)
+        self.vbo = self.vao.vbo
+        self.ebo = EBO([], use=True)
+        self.vertex_elem_size = self.vao.vertex_elem_size
+        self.vertex_ranges = RangeAllocator()  # in vertices
+        self.index_ranges = RangeAllocator()
+
+    @classmethod
+    def get(cls, attrib_sizes):
+        # shared store of the layout, created on first use
+        key = tuple(attrib_sizes)
+        store = cls.stores.get(key)
+        if store is None:
+            store = cls.stores[key] = cls(attrib_sizes)
+        return store
+
+    def allocate(self, vertices, indices):
+        """
+        :param indices: indices relative to the first of the vertices
+        :return:
+          (base vertex, first index)
+        """
+        vertices = np.asarray(vertices, self.vbo.buff_type).reshape(-1)
+        indices = np.asarray(indices, self.ebo.buff_type).reshape(-1)
+        base_vertex = self.vertex_ranges.allocate(len(vertices) // self.vertex_elem_size)
+        first_index = self.index_ranges.allocate(len(indices))
+        self.write(self.vbo, base_vertex * self.vertex_elem_size, vertices)
+        self.write(self.ebo, first_index, indices)
+        return base_vertex, first_index
+
+    def free(self, base_vertex, vertex_count, first_index, index_count):
+        self.vertex_ranges.free(base_vertex, vertex_count)
+        self.index_ranges.free(first_index, index_count)
+
+    def write(self, buffer: BufferBase, offset, data, stream=None):
+        # offset in buffer items, buffer is grown if data does not fit
+        self.vao.use()  # element buffer binding is a part of VAO state
+        end = offset + len(data)
+        if end > buffer.size:
+            grown = np.zeros(max(end, buffer.size * 2, self.MIN_CAPACITY), buffer.buff_type)
+            grown[:buffer.size] = buffer.get_buffer_data()
+            grown[offset:end] = data
+            buffer.set_buf_data(grown, True)
+        elif len(data):
+            buffer.set_chunk(offset, end, data)
+            buffer.chunk_upload(offset, len(data), stream)
+            buffer.is_changed = False
+
+
+class SharedMesh(VAOMesh):
+    """
+    Mesh stored in the GeometryStore of its attribute layout, a (base vertex, first index, count) range of it
+    """
+    base_vertex = 0
+    first_index = 0
+    index_count = 0
+    vertex_count = 0
+
+    def __init__(self, vertices=None, indices=None, attr_data=(), mode=GL_TRIANGLES, store=None):
+        self.render_mode = mode
+        self.store = store if store is not None else GeometryStore.get(attr_data)
+        self.vao = self.store.vao
+        self.vbo = self.store.vbo
+        self.ebo = self.store.ebo
+        self.set_vertex_data(vertices if vertices is not None else [], indices)
+
+    def set_vertex_data(self, vertices, indices=None):
+        vertex_count = np.size(vertices) // self.store.vertex_elem_size
+        if indices is None:
+            indices = np.arange(vertex_count, dtype='uint32')
+        self.free()
+        self.base_vertex, self.first_index = self.store.allocate(vertices, indices)
+        self.vertex_count = vertex_count
+        self.index_count = np.size(indices)
+
+    def update_vertex_data(self, vertices, stream=None):
+        """
+        Replaces vertices keeping the indices, data of the same size is uploaded in place
+        :param stream: RingBuffer to upload through, e.g. Scene.stream_buffer
+        """
+        elem_size = self.store.vertex_elem_size
+        if np.size(vertices) != self.vertex_count * elem_size:
+            indices = self.ebo.get_chunk(self.first_index, self.first_index + self.index_count).copy()
+            self.set_vertex_data(vertices, indices)
+            return
+        vertices = np.asarray(vertices, self.vbo.buff_type).reshape(-1)
+        self.store.write(self.vbo, self.base_vertex * elem_size, vertices, stream)
+
+    def free(self):
+        self.store.free(self.base_vertex, self.vertex_count, self.first_index, self.index_count)
+        self.vertex_count = self.index_count = 0
+
+    def draw(self):
+        glDrawElementsBaseVertex(self.render_mode, self.index_count, GL_UNSIGNED_INT,
+                                 GLvoidp(self.first_index * 4), self.base_vertex)
+
+    def __del__(self):
+        self.free()
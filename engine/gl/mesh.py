@@ -1,14 +1,47 @@
 from typing import Union
 
+import numpy as np
 from OpenGL.GL import *
 
 from .base import BufferBase
+from .state import GLState
+
+
+# uint vertex attribute with index of the drawn object (e.g. in ModelMatrices SSBO), read with divisor 1,
+# so it equals base instance of the draw call. Locations below it are vertex attributes of the mesh
+DRAW_INDEX_LOCATION = 15
 
 
 class VBO(BufferBase):
     GL_BUF_TYPE = GL_ARRAY_BUFFER
 
 
+class DrawIndexBuffer:
+    """
+    Buffer of 0, 1, 2, ... attached to DRAW_INDEX_LOCATION of every VAO.
+    glDrawElementsInstancedBaseInstance(..., 1, index) passes `index` to the shader this way,
+    which does not require gl_BaseInstance (GL 4.6)
+    """
+    vbo = None
+
+    @classmethod
+    def reserve(cls, count):
+        # buffer is reallocated under the same name, so VAOs keep referring it
+        if cls.vbo is None:
+            cls.vbo = VBO(array_type='uint32')
+        if cls.vbo.size < count:
+            cls.vbo.set_buf_data(np.arange(max(count, cls.vbo.size * 2, 1024), dtype='uint32'), True)
+
+    @classmethod
+    def attach(cls):
+        # sets up DRAW_INDEX_LOCATION of the bound VAO
+        cls.reserve(1)
+        cls.vbo.use()
+        glVertexAttribIPointer(DRAW_INDEX_LOCATION, 1, GL_UNSIGNED_INT, 0, None)
+        glVertexAttribDivisor(DRAW_INDEX_LOCATION, 1)
+        glEnableVertexAttribArray(DRAW_INDEX_LOCATION)
+
+
 class EBO(BufferBase):
     GL_BUF_TYPE = GL_ELEMENT_ARRAY_BUFFER
     ARRAY_TYPE = 'uint32'
@@ -37,15 +70,22 @@ class VAO:
             glVertexAttribPointer(i, size, gl_type, GL_FALSE, self.vertex_byte_size, GLvoidp(curr_offset))
             glEnableVertexAttribArray(i)
             curr_offset += size * type_size
+        DrawIndexBuffer.attach()
+        self.vbo.use()
 
     def use(self):
-        glBindVertexArray(self.buffer_id)
+        GLState.bind_vertex_array(self.buffer_id)
 
     def __del__(self):
         glDeleteVertexArrays(1, [self.buffer_id])
+        GLState.forget_binding('vertex_array', self.buffer_id)
 
 
 class VAOMesh:
+    # range of vao buffers used by the mesh, see geometry.SharedMesh
+    base_vertex = 0
+    first_index = 0
+
     def __init__(self, vertices=None, indices=None, attr_data=(), mode=GL_TRIANGLES):
         self.render_mode = mode
         self.vao = VAO(attr_data)
@@ -56,9 +96,13 @@ class VAOMesh:
     def use(self):
         self.vao.use()
 
+    @property
+    def index_count(self):
+        return self.ebo.size
+
     @staticmethod
     def unbind():
-        glBindVertexArray(0)
+        GLState.bind_vertex_array(0)
 
     def set_vertex_data(self, vertices, indices=None):
         if indices is None:
@@ -66,6 +110,17 @@ class VAOMesh:
         self.vbo.set_buf_data(vertices, True)
         self.ebo.set_buf_data(indices,  True)
 
+    def update_vertex_data(self, vertices, stream=None):
+        """
+        Replaces vertices keeping the indices, data of the same size is uploaded without reallocation
+        :param stream: RingBuffer to upload through, e.g. Scene.stream_buffer
+        """
+        same_size = np.size(vertices) == self.vbo.size
+        self.vbo.set_buf_data(vertices, not same_size)
+        if same_size:
+            self.vbo.sub_src_upload(0, self.vbo.get_buffer_data(), stream)
+            self.vbo.is_changed = False
+
     def draw(self):
         glDrawElements(self.render_mode, self.ebo.size, GL_UNSIGNED_INT, None)
 
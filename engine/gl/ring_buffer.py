@@ -0,0 +1,109 @@
+from timeit import default_timer as timer
+
+import numpy as np
+from OpenGL.GL import GL_ARRAY_BUFFER, GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, GL_SYNC_GPU_COMMANDS_COMPLETE, \
+    GL_SYNC_FLUSH_COMMANDS_BIT, GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED, GL_WAIT_FAILED, \
+    glBindBufferRange, glCopyBufferSubData, glFenceSync, glClientWaitSync, glDeleteSync
+
+from .base import BufferBase
+from .state import GLState
+
+
+class StreamBuffer(BufferBase):
+    GL_BUF_TYPE = GL_ARRAY_BUFFER
+    ARRAY_TYPE = 'uint8'
+
+
+class RingBuffer:
+    """
+    Persistently mapped buffer for data written every frame, split into a region per frame in flight.
+    Space is sub-allocated from the region of the current frame, so writes are memcpy into mapped memory.
+    next_frame() fences the region and switches to the next one, waiting until GPU has finished using it,
+    so written data is never changed while it can still be read.
+
+    Data can be used in place (bind_range(), offsets of allocate()/write() as vertex buffer offsets)
+    or copied into other buffers by GL (copy_to(), used by BufferBase.sub_src_upload())
+    """
+    WAIT_TIMEOUT = 1000000  # ns of a single wait, waiting is repeated until the fence is signaled
+
+    def __init__(self, frame_size, frames=3, alignment=256):
+        """
+        :param frame_size: bytes available in every frame
+        :param frames: frames in flight
+        :param alignment: offset alignment of allocations, max of GL_UNIFORM_BUFFER_OFFSET_ALIGNMENT
+          and GL_SHADER_STORAGE_BUFFER_OFFSET_ALIGNMENT for ranges bound as uniform or storage buffers
+        """
+        self.frame_size = frame_size - frame_size % alignment
+        self.frames = frames
+        self.alignment = alignment
+        self.buffer = StreamBuffer(np.zeros(self.frame_size * frames, 'uint8'))
+        self.data = self.buffer.map_itself()  # whole buffer as mapped uint8 array
+        self.fences = [None] * frames
+        self.frame = 0
+        self.offset = 0  # next free byte of the current region
+        # totals since creation: frames waited for GPU, time spent waiting, allocations not fit in a region
+        self.stats = {'waits': 0, 'wait_time': 0., 'overflows': 0}
+
+    def allocate(self, size):
+        """
+        :return:
+          offset of `size` bytes in the buffer, valid until the region is reused, None if the region is full
+        """
+        offset = self.frame * self.frame_size + self.offset
+        if self.offset + size > self.frame_size:
+            self.stats['overflows'] += 1
+            return None
+        self.offset += size + -size % self.alignment
+        return offset
+
+    def write(self, data):
+        # copies array into the current region, returns its offset (None if it does not fit)
+        data = np.ascontiguousarray(data).reshape(-1).view('uint8')
+        offset = self.allocate(data.nbytes)
+        if offset is not None:
+            self.data[offset:offset + data.nbytes] = data
+        return offset
+
+    def get_array(self, offset, dtype, shape):
+        # mapped memory at offset as array to be filled in place
+        dtype = np.dtype(dtype)
+        return self.data[offset:offset + dtype.itemsize * int(np.prod(shape))].view(dtype).reshape(shape)
+
+    def copy_to(self, buffer: BufferBase, offset, data):
+        """
+        Writes data and queues its copy into `buffer` at `offset` bytes. Draws issued earlier still use old data
+        :return:
+          False if data did not fit into the current region
+        """
+        src_offset = self.write(data)
+        if src_offset is None:
+            return False
+        GLState.bind_buffer(GL_COPY_READ_BUFFER, self.buffer.buffer_id)
+        GLState.bind_buffer(GL_COPY_WRITE_BUFFER, buffer.buffer_id)
+        glCopyBufferSubData(GL_COPY_READ_BUFFER, GL_COPY_WRITE_BUFFER, src_offset, offset, data.nbytes)
+        return True
+
+    def bind_range(self, target, index, offset, size):
+        # binds allocated range to indexed target, e.g. GL_UNIFORM_BUFFER
+        glBindBufferRange(target, index, self.buffer.buffer_id, offset, size)
+        GLState.forget_indexed_buffer(target, index)
+
+    def next_frame(self):
+        # called after all commands of the frame are issued (Scene.draw() does it)
+        self.fences[self.frame] = glFenceSync(GL_SYNC_GPU_COMMANDS_COMPLETE, 0)
+        self.frame = (self.frame + 1) % self.frames
+        self.offset = 0
+        fence = self.fences[self.frame]
+        if fence is None:
+            return
+        self.fences[self.frame] = None
+        start = timer()
+        result = glClientWaitSync(fence, 0, 0)
+        if result not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+            self.stats['waits'] += 1
+            while result not in (GL_ALREADY_SIGNALED, GL_CONDITION_SATISFIED):
+                if result == GL_WAIT_FAILED:
+                    raise RuntimeError('Waiting for ring buffer fence failed')
+                result = glClientWaitSync(fence, GL_SYNC_FLUSH_COMMANDS_BIT, self.WAIT_TIMEOUT)
+            self.stats['wait_time'] += timer() - start
+        glDeleteSync(fence)
@@ -1,6 +1,8 @@
 from OpenGL.GL import *
 from OpenGL.GL.shaders import compileShader
 
+from .mesh import DRAW_INDEX_LOCATION
+from .state import GLState
 from ..lib.pathlib import read_file
 
 
@@ -25,7 +27,7 @@ class ShaderProgram:
         self.gl_program = self.make_program_from_shader_source(vs, fs, use, *args, **kwargs)
 
     def use(self):
-        glUseProgram(self.gl_program)
+        GLState.use_program(self.gl_program)
 
     def get_uniform_setter(self, addr, v_type, *additional_args):
         func = globals()['glUniform' + v_type]
@@ -41,11 +43,11 @@ class ShaderProgram:
         return data
 
     def get_attributes(self):
+        # vertex attributes (name, size, type) sorted by location. built-in ones and attributes
+        # starting from DRAW_INDEX_LOCATION are not a part of mesh data
         data = self._get_internal_data(glGetActiveAttrib, GL_ACTIVE_ATTRIBUTES)
-        sorted_data = [0] * len(data)
-        for item in data:
-            sorted_data[glGetAttribLocation(self.gl_program, item[0])] = item
-        return sorted_data
+        located = sorted((glGetAttribLocation(self.gl_program, item[0]), item) for item in data)
+        return [item for location, item in located if 0 <= location < DRAW_INDEX_LOCATION]
 
     def get_uniforms(self):
         # returns list with all uniforms (name, size, type)
@@ -94,7 +96,7 @@ class ShaderProgram:
         if glGetProgramiv(program, GL_LINK_STATUS) == GL_FALSE:
             raise RuntimeError(glGetProgramInfoLog(program).decode())
         if use:
-            glUseProgram(program)
+            GLState.use_program(program)
         return program
 
     @staticmethod
@@ -106,3 +108,4 @@ class ShaderProgram:
 
     def __del__(self):
         glDeleteProgram(self.gl_program)
+        GLState.forget_binding('program', self.gl_program)
@@ -63,6 +63,21 @@ class ObjStructHelper:
     def add_struct_to_buffer(self, buffer: BufferBase, **kwargs):
         buffer.add_buf_data(self._gen_struct(**kwargs))
 
+    def remove_struct_from_buffer(self, buffer: BufferBase, index):
+        """
+        Removes element by moving the last element into its place
+        :return:
+          old index of moved element, None if the last element was removed
+        """
+        data = buffer.get_buffer_data()
+        last = (len(data) - self.offset) // self.struct_len - 1
+        start, length = self.get_frame_pointer(index)
+        last_start = self.get_frame_pointer(last)[0]
+        if index != last:
+            data[start:start + length] = data[last_start:last_start + length]
+        buffer.set_buf_data(data[:last_start].copy())
+        return last if index != last else None
+
 
 class StructElem:
     def __init__(self, buffer, index):
@@ -135,6 +150,9 @@ class StructuredShaderArrayBuffer(SSBO):
     def add_frame(self, **keyword_params):
         self.struct.add_struct_to_buffer(self, **keyword_params)
 
+    def remove_frame(self, index):
+        return self.struct.remove_struct_from_buffer(self, index)
+
     def get_struct_value_setter(self, name, index=0):
         return self.struct.get_struct_value_setter(self, name, index)
 
@@ -0,0 +1,168 @@
+from OpenGL.GL import GL_TEXTURE0, GL_FRAMEBUFFER, GL_ELEMENT_ARRAY_BUFFER, GL_DEPTH_TEST, GL_CULL_FACE, \
+    glUseProgram, glBindFramebuffer, glViewport, glBindVertexArray, glActiveTexture, glBindTexture, glBindBuffer, \
+    glBindBufferBase, glEnable, glDisable, glBlendFunc
+
+
+class GLState:
+    """
+    Last GL state set through engine wrappers: bound program, framebuffer, viewport, VAO, textures of every unit,
+    buffer bindings and enabled capabilities. Calls setting the value that is already set are skipped.
+    GL calls made outside of engine wrappers must be followed by invalidate(), bindings of deleted GL objects
+    are forgotten by their wrappers, as their names can be reused
+    """
+    # capabilities set by every render stage (see BaseRenderer.capabilities), disabled if not required
+    STAGE_CAPABILITIES = (GL_DEPTH_TEST, GL_CULL_FACE)
+
+    # 'program', 'framebuffer', 'viewport', 'vertex_array', 'active_unit', 'blend_func': value,
+    # kept in a dict, as assigning class attributes makes every attribute lookup of the class slower
+    bound = {'active_unit': 0}
+    textures = {}  # (unit, bind point): texture id
+    buffers = {}  # target: buffer id
+    indexed_buffers = {}  # (target, index): buffer id
+    capabilities = {}  # capability: enabled
+    stats = {'issued': 0, 'skipped': 0}  # state changing calls since the last reset_stats()
+
+    @classmethod
+    def invalidate(cls):
+        # forgets all state, so next calls are issued
+        cls.bound.clear()
+        cls.textures.clear()
+        cls.buffers.clear()
+        cls.indexed_buffers.clear()
+        cls.capabilities.clear()
+
+    @classmethod
+    def reset_stats(cls):
+        cls.stats['issued'] = cls.stats['skipped'] = 0
+
+    @classmethod
+    def use_program(cls, program):
+        if cls.bound.get('program') == program:
+            cls.stats['skipped'] += 1
+            return
+        cls.bound['program'] = program
+        cls.stats['issued'] += 1
+        glUseProgram(program)
+
+    @classmethod
+    def bind_framebuffer(cls, framebuffer):
+        if cls.bound.get('framebuffer') == framebuffer:
+            cls.stats['skipped'] += 1
+            return
+        cls.bound['framebuffer'] = framebuffer
+        cls.stats['issued'] += 1
+        glBindFramebuffer(GL_FRAMEBUFFER, framebuffer)
+
+    @classmethod
+    def set_viewport(cls, x, y, width, height):
+        viewport = (x, y, width, height)
+        if cls.bound.get('viewport') == viewport:
+            cls.stats['skipped'] += 1
+            return
+        cls.bound['viewport'] = viewport
+        cls.stats['issued'] += 1
+        glViewport(x, y, width, height)
+
+    @classmethod
+    def bind_vertex_array(cls, vertex_array):
+        if cls.bound.get('vertex_array') == vertex_array:
+            cls.stats['skipped'] += 1
+            return
+        cls.bound['vertex_array'] = vertex_array
+        cls.buffers.pop(GL_ELEMENT_ARRAY_BUFFER, None)  # element buffer binding is a part of VAO state
+        cls.stats['issued'] += 1
+        glBindVertexArray(vertex_array)
+
+    @classmethod
+    def bind_texture(cls, unit, bind_point, texture):
+        """
+        :param unit: texture unit index, None for the active one
+        """
+        bound = cls.bound
+        if unit is None:
+            unit = bound.get('active_unit', 0)
+        if cls.textures.get((unit, bind_point)) == texture:
+            cls.stats['skipped'] += 1
+            return
+        if bound.get('active_unit') != unit:
+            bound['active_unit'] = unit
+            cls.stats['issued'] += 1
+            glActiveTexture(GL_TEXTURE0 + unit)
+        cls.textures[(unit, bind_point)] = texture
+        cls.stats['issued'] += 1
+        glBindTexture(bind_point, texture)
+
+    @classmethod
+    def bind_buffer(cls, target, buffer):
+        if cls.buffers.get(target) == buffer:
+            cls.stats['skipped'] += 1
+            return
+        cls.buffers[target] = buffer
+        cls.stats['issued'] += 1
+        glBindBuffer(target, buffer)
+
+    @classmethod
+    def bind_buffer_base(cls, target, index, buffer):
+        # also binds the buffer to the generic target
+        if cls.indexed_buffers.get((target, index)) == buffer and cls.buffers.get(target) == buffer:
+            cls.stats['skipped'] += 1
+            return
+        cls.indexed_buffers[(target, index)] = cls.buffers[target] = buffer
+        cls.stats['issued'] += 1
+        glBindBufferBase(target, index, buffer)
+
+    @classmethod
+    def forget_buffer(cls, buffer):
+        # deleted objects are unbound by GL and their names can be reused
+        for bindings in (cls.buffers, cls.indexed_buffers):
+            for key in [key for key, value in bindings.items() if value == buffer]:
+                del bindings[key]
+
+    @classmethod
+    def forget_texture(cls, texture):
+        for key in [key for key, value in cls.textures.items() if value == texture]:
+            del cls.textures[key]
+
+    @classmethod
+    def forget_binding(cls, name, value):
+        # name: 'program', 'framebuffer' or 'vertex_array'
+        if cls.bound.get(name) == value:
+            del cls.bound[name]
+
+    @classmethod
+    def forget_indexed_buffer(cls, target, index):
+        # binding was changed by a call that is not tracked (e.g. glBindBufferRange)
+        cls.indexed_buffers.pop((target, index), None)
+        cls.buffers.pop(target, None)
+
+    @classmethod
+    def set_enabled(cls, capability, enabled=True):
+        if cls.capabilities.get(capability) == enabled:
+            cls.stats['skipped'] += 1
+            return
+        cls.capabilities[capability] = enabled
+        cls.stats['issued'] += 1
+        (glEnable if enabled else glDisable)(capability)
+
+    @classmethod
+    def enable(cls, capability):
+        cls.set_enabled(capability, True)
+
+    @classmethod
+    def disable(cls, capability):
+        cls.set_enabled(capability, False)
+
+    @classmethod
+    def set_capabilities(cls, enabled):
+        # enables the listed STAGE_CAPABILITIES and disables the other ones
+        for capability in cls.STAGE_CAPABILITIES:
+            cls.set_enabled(capability, capability in enabled)
+
+    @classmethod
+    def set_blend_func(cls, source, destination):
+        if cls.bound.get('blend_func') == (source, destination):
+            cls.stats['skipped'] += 1
+            return
+        cls.bound['blend_func'] = (source, destination)
+        cls.stats['issued'] += 1
+        glBlendFunc(source, destination)
@@ -5,6 +5,7 @@ from OpenGL.GL import *
 from PIL import Image
 
 from .base import BaseBindable
+from .state import GLState
 
 
 class BaseTexture(BaseBindable):
@@ -23,16 +24,14 @@ class BaseTexture(BaseBindable):
         glPixelStorei(GL_UNPACK_ALIGNMENT, 1)
 
     def use(self):
-        glBindTexture(self.BIND_POINT, self.sampler_id)
+        GLState.bind_texture(None, self.BIND_POINT, self.sampler_id)
 
     def bind_to_block(self, block_id=None):
-        glActiveTexture(GL_TEXTURE0 + super(BaseTexture, self).bind_to_block(block_id))
-        self.use()
+        GLState.bind_texture(super(BaseTexture, self).bind_to_block(block_id), self.BIND_POINT, self.sampler_id)
 
     @classmethod
     def unbind_block(cls, block_id, tex_type=None):
-        glActiveTexture(GL_TEXTURE0 + block_id)
-        glBindTexture(tex_type or cls.BIND_POINT, 0)
+        GLState.bind_texture(block_id, tex_type or cls.BIND_POINT, 0)
 
     def set_interpolation(self, value):
         if isinstance(value, str):
@@ -66,6 +65,7 @@ class BaseTexture(BaseBindable):
 
     def __del__(self):
         glDeleteTextures(1, [self.sampler_id])
+        GLState.forget_texture(self.sampler_id)
 
 
 class Texture2D(BaseTexture):
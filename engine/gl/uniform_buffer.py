@@ -52,6 +52,9 @@ class StructuredUniformArrayBuffer(UBO):
     def add_frame(self, **keyword_params):
         self.struct.add_struct_to_buffer(self, **keyword_params)
 
+    def remove_frame(self, index):
+        return self.struct.remove_struct_from_buffer(self, index)
+
     def get_struct_value_setter(self, name, index=0):
         return self.struct.get_struct_value_setter(self, name, index)
 
@@ -3,6 +3,7 @@ from glfw.GLFW import *
 from OpenGL.GL import *
 
 from .framebuffer import FrameBuffer
+from .state import GLState
 
 import numpy as np
 from timeit import default_timer
@@ -61,7 +62,7 @@ class Window:
         self.framebuffer.set_clear_color((0.2, 0.3, 0.3, 1.0))
 
         if depth_testing:
-            glEnable(GL_DEPTH_TEST)
+            GLState.enable(GL_DEPTH_TEST)
         if alpha:
             self.enable_blending()  # move this from this class
         if cursor_lock:
@@ -146,8 +147,8 @@ class Window:
 
     @staticmethod
     def enable_blending():
-        glEnable(GL_BLEND)
-        glBlendFunc(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
+        GLState.enable(GL_BLEND)
+        GLState.set_blend_func(GL_SRC_ALPHA, GL_ONE_MINUS_SRC_ALPHA)
 
     def set_cursor_lock(self, mode=True):
         glfwSetInputMode(self.window, GLFW_CURSOR, GLFW_CURSOR_DISABLED if mode else GLFW_CURSOR_NORMAL)
@@ -95,6 +95,12 @@ def _get_attr_pos(attr_data, substr, exclude=' '):  # returns [offset, size, ori
     return None
 
 
+def get_attribute_offset(attribute_data, name):
+    # returns offset of attribute in vertex (in floats), None if there's no such attribute
+    attribute = _get_attr_pos(attribute_data, name)
+    return attribute[1] if attribute else None
+
+
 def retrieve_mesh_numpy(mesh, attribute_data):
     # 'bitangent' in tangent means it is excluded substring
     params = (('pos', mesh.mVertices, 3), ('normal', mesh.mNormals, 3), ('uv', mesh.mTextureCoords[0], 3),
@@ -123,6 +129,14 @@ def retrieve_mesh_numpy(mesh, attribute_data):
     return final_data, faces, mesh.mMaterialIndex
 
 
+def retrieve_mesh_bounds(mesh):
+    # returns axis-aligned bounding box of mesh vertices as 2*3 array (min, max)
+    if not mesh.mNumVertices or not mesh.mVertices:
+        return None
+    vertices = map_ct_pointer(mesh.mVertices, ctypes.c_float, (mesh.mNumVertices, 3))
+    return np.array((vertices.min(axis=0), vertices.max(axis=0)), 'float32')
+
+
 def retrieve_mesh_python(mesh, _):
     final_data = np.empty((mesh.mNumVertices, 8), dtype='float32')
     faces = []
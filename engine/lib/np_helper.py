@@ -21,3 +21,8 @@ def int2ptr(address, data_type=c_uint8):
 def int2array(address, data_type, size):
     ptr = int2ptr(address, data_type)
     return map_ct_pointer(ptr, data_type, size)
+
+
+def mat2array(matrix, dtype='float32'):
+    # converts glm matrix to numpy array in OpenGL memory layout (every row is a glm matrix column)
+    return np.array([tuple(matrix[i]) for i in range(len(matrix))], dtype)
@@ -1,20 +1,29 @@
-from os.path import split, join
+from os.path import split, join, splitext
 
 from pyassimp.material import aiTextureType_DIFFUSE, aiTextureType_SPECULAR, aiTextureType_NORMALS, aiTextureType_HEIGHT
 
 from .model import Node, RenderCompound, Material, UnfinishedModel
+from ..gl.geometry import SharedMesh
 from ..gl.mesh import VAOMesh
 from ..gl.texture import Texture2D
-from ..lib.assimp import load_scene, free_scene, get_material_texture, retrieve_mesh_data
+from .simplify import LodCache, build_lod_chain
+from ..lib.assimp import load_scene, free_scene, get_material_texture, retrieve_mesh_data, retrieve_mesh_bounds, \
+    get_attribute_offset
 
 
-def load_model(filename):
+def load_model(filename, shared_geometry=True):
+    """
+    :param shared_geometry: store meshes in GeometryStore (SharedMesh) instead of their own buffers
+    """
     obj_dir = split(filename)[0]
     assimp_scene = load_scene(filename)
     model = UnfinishedModel(assimp_scene.meshes, assimp_scene.materials, assimp_scene.root_node,
-                            process_mesh, process_material, process_node, lambda obj: free_scene(obj.scene_src))
+                            process_mesh, process_material, process_node, lambda obj: free_scene(obj.scene_src),
+                            process_mesh_lods)
     model.obj_dir = obj_dir
+    model.lod_cache = LodCache(splitext(filename)[0] + '.lod.npz')
     model.scene_src = assimp_scene
+    model.mesh_class = SharedMesh if shared_geometry else VAOMesh
     return model
 
 
@@ -53,11 +62,32 @@ def process_material(unfinished, _model, material, texture_bind_data):
     return Material(textures)
 
 
-def process_mesh(_unfinished, model, mesh, attribute_data):
+def process_mesh(unfinished, model, mesh, attribute_data):
     int_attribute_data = tuple(map(lambda c_type: int(c_type[1] * c_type[0][2] // 4), attribute_data))
     mesh_data = retrieve_mesh_data(mesh, attribute_data)
     if __debug__:
         print('mesh data retrieving: %s vertices, %s faces' % (mesh.mNumVertices, mesh.mNumFaces))
-    mesh_obj = VAOMesh(mesh_data[0], mesh_data[1], int_attribute_data)
+    mesh_obj = unfinished.mesh_class(mesh_data[0], mesh_data[1], int_attribute_data)
     material = model.materials[mesh_data[2]]
-    return RenderCompound(mesh_obj, material)
+    return RenderCompound(mesh_obj, material, retrieve_mesh_bounds(mesh))
+
+
+def process_mesh_lods(unfinished, model, mesh, attribute_data, ratios):
+    # returns RenderCompounds of the source mesh and its simplified copies
+    int_attribute_data = tuple(map(lambda c_type: int(c_type[1] * c_type[0][2] // 4), attribute_data))
+    vertices, faces, material_index = retrieve_mesh_data(mesh, attribute_data)
+    pos_offset = get_attribute_offset(attribute_data, 'pos')
+    if pos_offset is None:
+        # positions are not used by renderer, nothing to simplify by
+        chain = [(vertices, faces)] * len(ratios)
+    elif unfinished.lod_cache is not None:
+        chain = unfinished.lod_cache.get_chain(vertices, faces, ratios, pos_offset)
+    else:
+        chain = build_lod_chain(vertices, faces, ratios, pos_offset)
+    if __debug__:
+        print('mesh lods: %s faces' % ', '.join(str(len(level_faces) // 3) for _, level_faces in chain))
+
+    material = model.materials[material_index]
+    bounds = retrieve_mesh_bounds(mesh)
+    return [RenderCompound(unfinished.mesh_class(level_vertices, level_faces, int_attribute_data), material, bounds)
+            for level_vertices, level_faces in [(vertices, faces)] + chain]
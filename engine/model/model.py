@@ -1,8 +1,14 @@
-from glm import mat4, translate, vec3
+from math import sqrt, inf
+
+import numpy as np
+from glm import mat4
 
 from ..event.base import MainEventManager, BaseEvent
 from ..gl.mesh import VAOMesh
 from ..gl import Texture2D
+from ..gl.base import BaseBindable
+from ..lib.np_helper import mat2array
+from ..scene.culling import transform_bounds, UNBOUNDED_EXTENT
 
 # todo big model update
 
@@ -21,6 +27,8 @@ RenderCompound - Stores a VAOMesh() and Material() instance"""
 
 class Material:
     # todo animations (texture switches)
+    __slots__ = ('_textures', '_methods')
+
     def __init__(self, textures):
         self._textures = textures
         self._methods = [(Texture2D.unbind_block, val) if isinstance(val, int)  # if we should unbind it
@@ -34,18 +42,28 @@ class Material:
         for method, arg in self._methods:
             method(arg)
 
+    def get_bindings(self):
+        # (texture unit, bind point, texture id) of every texture bound by use(), id 0 for unbound units
+        return tuple((val, Texture2D.BIND_POINT, 0) if isinstance(val, int)
+                     else (BaseBindable.bind_to_block(val[0], val[1]), val[0].BIND_POINT, val[0].sampler_id)
+                     if isinstance(val, tuple)
+                     else (BaseBindable.bind_to_block(val), val.BIND_POINT, val.sampler_id) for val in self._textures)
+
 
 RenderCompoundEvent = BaseEvent.create_meta('RenderCompoundEvent', ('compound', ))
-RenderCompoundDrawEvent = RenderCompoundEvent.create_meta('RenderCompoundDrawEvent')
+RenderCompoundDrawEvent = RenderCompoundEvent.create_meta('RenderCompoundDrawEvent', pooled=True)
 
 
 class RenderCompound:
-    def __init__(self, mesh: VAOMesh, material: Material):
+    __slots__ = ('mesh', 'material', 'bounds')
+
+    def __init__(self, mesh: VAOMesh, material: Material, bounds=None):
         self.mesh = mesh
         self.material = material
+        self.bounds = bounds  # local-space AABB as 2*3 array (min, max), None if unknown
 
-    def draw(self):
-        MainEventManager.add_event(RenderCompoundDrawEvent(self, instant=True))
+    def draw(self, event_manager=MainEventManager):
+        event_manager.add_event(RenderCompoundDrawEvent.create(self, instant=True))
         self.material.use()
         self.mesh.use()
         self.mesh.draw()
@@ -53,7 +71,7 @@ class RenderCompound:
 
 class UnfinishedModel:
     def __init__(self, meshes: list, materials: list, node,
-                 mesh_processor, material_processor, node_processor, on_delete):
+                 mesh_processor, material_processor, node_processor, on_delete, lod_mesh_processor=None):
         self.raw_meshes = meshes
         self.raw_materials = materials
         self.raw_node = node
@@ -61,6 +79,9 @@ class UnfinishedModel:
         self.material_processor = material_processor
         self.node_processor = node_processor
         self.on_delete = on_delete
+        # makes RenderCompounds of all LOD levels for a mesh: (unfinished, model, mesh, attribute_data, ratios)
+        self.lod_mesh_processor = lod_mesh_processor
+        self.lod_cache = None  # simplify.LodCache
 
     def format(self, attribute_data, texture_bind_data):
         model = Model()
@@ -72,13 +93,40 @@ class UnfinishedModel:
         model.finished()
         return model
 
+    def format_lods(self, attribute_data, texture_bind_data, ratios=(0.5, 0.25), **lod_params):
+        """
+        Formats the model together with its simplified copies, materials are shared between all levels
+        :param ratios: triangle count of every additional level relative to the source model
+        :param lod_params: LodModel parameters (thresholds, hysteresis)
+        :return:
+          LodModel
+        """
+        if self.lod_mesh_processor is None:
+            raise TypeError('Loader of this model (%s) cannot make LOD levels' % self.mesh_processor.__module__)
+        models = [Model() for _ in range(len(ratios) + 1)]
+        for material in self.raw_materials:
+            material = self.material_processor(self, models[0], material, texture_bind_data)
+            for model in models:
+                model.materials.append(material)
+        for mesh in self.raw_meshes:
+            compounds = self.lod_mesh_processor(self, models[0], mesh, attribute_data, ratios)
+            for model, compound in zip(models, compounds):
+                model.meshes.append(compound)
+        for model in models:
+            model.root_node = self.node_processor(self, model, self.raw_node)
+            model.finished()
+        if self.lod_cache is not None:
+            self.lod_cache.save()
+        return LodModel(models, **lod_params)
+
     def __del__(self):
         self.on_delete(self)
 
 
 class Model:
-    # todo Model.copy() and Node.copy() that copies the meshes and creates new matrices
-    # soft-copy refers original resources, hard-copy copies it's byte data
+    # todo Model.copy() that copies byte data of the meshes, see instantiate() for copies sharing them
+    instance_count = 1  # world matrices of every node, see InstancedModel
+
     def __init__(self, materials=None, meshes=None, root_node=None):
         if meshes is None:
             meshes = []
@@ -87,33 +135,346 @@ class Model:
         self.materials = materials
         self.meshes = meshes  # meshes are RenderCompound instances, not a Mesh
         self.root_node = root_node
-        self.draw = None
-        self.set_model_matrix = None
-        self.set_offset = None
+        self.nodes = []  # all nodes in pre-order, parents always go before their children
+        self.node_matrices = None  # N*4*4 array, transformation of every node relative to model origin
+        self.world_matrices = None  # N*4*4 array, resulting bind-ready matrices. Node.result_matrix are views
+        self.world_matrix = np.identity(4, 'float32')  # model placement, set by owning RenderComponent
 
-    @property
-    def own_matrix(self):
-        return self.root_node.own_matrix
+        # every (node, RenderCompound) pair to be drawn, grouped by node
+        self.draw_items = []
+        self.item_nodes = None  # node index of every draw item
+        self._node_ranges = []  # (node, first item, last item + 1)
+        self.local_centers = None  # local-space AABB of every draw item, stored as center and half-size
+        self.local_extents = None
+        self.world_centers = None  # world-space AABB of every draw item
+        self.world_extents = None
+        self.visible = np.ones(0, 'bool')  # visibility mask of draw items, set by culling
+        self.event_manager = MainEventManager  # receives draw events, set by the scene drawing the model
+        self.matrix_slot = None  # index of the first node matrix in ModelMatrices SSBO of the scene, if stored there
+        self.matrices_changed = True  # world_matrices changed since ModelMatrices copied them
 
     @property
     def raw_matrix(self):
         return self.root_node.raw_matrix
 
     def finished(self):
-        # methods
-        self.draw = self.root_node.draw
-        self.set_model_matrix = self.root_node.set_model_matrix
-        self.set_offset = self.root_node.set_offset
+        self.nodes = list(self.root_node.walk())
+        self.world_matrices = np.empty((len(self.nodes), 4, 4), 'float32')
+        for node, matrix in zip(self.nodes, self.world_matrices):
+            node.result_matrix = matrix
+        self._build_draw_items()
+        self._rebuild_node_matrices()
+        return self
+
+    def instantiate(self):
+        """
+        Soft copy of the finished model: RenderCompounds (meshes) and materials (textures) are shared,
+        node hierarchy and matrices are copied, so the copy is placed independently. Nothing is uploaded
+        :return:
+          Model
+        """
+        model = Model(self.materials, self.meshes, self.root_node.copy())
+        model.nodes = list(model.root_node.walk())
+        model.world_matrices = np.empty_like(self.world_matrices)
+        for node, matrix in zip(model.nodes, model.world_matrices):
+            node.result_matrix = matrix
+        model.draw_items = list(self.draw_items)
+        model.item_nodes = self.item_nodes
+        model._node_ranges = [(node, start, stop) for node, (_, start, stop) in zip(model.nodes, self._node_ranges)]
+        model.local_centers = self.local_centers  # not changed in place, shared as well
+        model.local_extents = self.local_extents
+        model.visible = np.ones(len(self.draw_items), 'bool')
+        model.node_matrices = self.node_matrices.copy()
+        model.world_matrix[:] = self.world_matrix
+        model._update_world_matrices()
+        return model
+
+    def draw(self):
+        # draws with base instance 0, scene models are drawn by DrawList of their renderer instead
+        visible = self.visible.tolist()
+        items = self.draw_items
+        event_manager = self.event_manager
+        for node, start, stop in self._node_ranges:
+            if not any(visible[start:stop]):
+                continue
+            event_manager.add_event(NodeDrawEvent.create(node, instant=True))
+            for i in range(start, stop):
+                if visible[i]:
+                    items[i].draw(event_manager)
+
+    def _build_draw_items(self):
+        self.draw_items = []
+        self._node_ranges = []
+        item_nodes = []
+        for i, node in enumerate(self.nodes):
+            start = len(self.draw_items)
+            self.draw_items.extend(node.meshes)
+            item_nodes.extend([i] * len(node.meshes))
+            self._node_ranges.append((node, start, len(self.draw_items)))
+        self.item_nodes = np.array(item_nodes, 'int64')
+
+        count = len(self.draw_items)
+        self.local_centers = np.zeros((count, 3), 'float32')
+        self.local_extents = np.full((count, 3), UNBOUNDED_EXTENT, 'float32')
+        for i, compound in enumerate(self.draw_items):
+            if compound.bounds is not None:
+                self.local_centers[i] = (compound.bounds[0] + compound.bounds[1]) / 2
+                self.local_extents[i] = (compound.bounds[1] - compound.bounds[0]) / 2
+        self.visible = np.ones(count, 'bool')
+
+    def set_model_matrix(self, matrix: mat4):
+        # sets source transformation of the root node (applied before the world matrix)
+        self.root_node.raw_matrix = matrix
+        self._rebuild_node_matrices()
+
+    def set_world_matrix(self, matrix):
+        # matrix in OpenGL memory layout, e.g. GameObject.world_matrix
+        self.world_matrix[:] = matrix
+        self._update_world_matrices()
+
+    def get_world_bounds(self):
+        # (min, max) corners of the world-space box containing all draw items
+        if not len(self.draw_items):
+            pos = self.world_matrix[3, :3].tolist()
+            return pos, pos
+        return (self.world_centers - self.world_extents).min(axis=0).tolist(), \
+            (self.world_centers + self.world_extents).max(axis=0).tolist()
+
+    def _update_bounds(self):
+        self.world_centers, self.world_extents = transform_bounds(self.local_centers, self.local_extents,
+                                                                  self.world_matrices[self.item_nodes])
+
+    def _rebuild_node_matrices(self):
+        # called only when node hierarchy or source matrices change
+        index = {id(node): i for i, node in enumerate(self.nodes)}
+        self.node_matrices = np.empty((len(self.nodes), 4, 4), 'float32')
+        for i, node in enumerate(self.nodes):
+            self.node_matrices[i] = mat2array(node.raw_matrix)
+            if node.parent is not None:
+                self.node_matrices[i] = self.node_matrices[i] @ self.node_matrices[index[id(node.parent)]]
+        self._update_world_matrices()
+
+    def _update_world_matrices(self):
+        np.matmul(self.node_matrices, self.world_matrix, out=self.world_matrices)
+        self.matrices_changed = True
+        self._update_bounds()
+
+
+class InstancedModel(Model):
+    """
+    A finished Model drawn at many places by instanced draw calls: nodes, draw items and local bounds
+    are shared with the source model, only world matrices are per instance.
+    World matrices are stored node after node (matrix of node j of instance i is world_matrices[j * count + i]),
+    so an item drawn with base instance `matrix_slot + j * count` and `count` instances reads the matrix
+    of every instance from ModelMatrices SSBO by its draw index. Drawing requires ModelMatrices (see DrawList).
+
+    World bounds of every draw item contain the item of all instances, so it is culled only if all of them are.
+    Moving a single instance only grows the bounds, they are refitted when instances are added or removed
+    and by refit_bounds(), called once per frame by the render group drawing the model
+    """
+
+    def __init__(self, source: Model, instance_matrices=()):
+        """
+        :param instance_matrices: placement of every instance relative to the world matrix, OpenGL memory layout
+        """
+        super(InstancedModel, self).__init__(source.materials, source.meshes, source.root_node)
+        self.source = source
+        self.nodes = source.nodes
+        self.draw_items = source.draw_items
+        self.item_nodes = source.item_nodes
+        self._node_ranges = source._node_ranges
+        self.local_centers = source.local_centers
+        self.local_extents = source.local_extents
+        self.node_matrices = source.node_matrices
+        self.instance_matrices = np.zeros((0, 4, 4), 'float32')
+        self.instance_owners = []  # object placing every instance (e.g. a RenderComponent), None if unknown
+        self.bounds_loose = False  # bounds were grown by set_instance_matrix() since the last refit
+        self.set_instances(instance_matrices)
+
+    @property
+    def instance_count(self):
+        return len(self.instance_matrices)
+
+    def finished(self):
+        # nodes belong to the source model and are not rebuilt
         return self
 
+    def set_model_matrix(self, matrix: mat4):
+        self.source.set_model_matrix(matrix)
+        self.node_matrices = self.source.node_matrices
+        self._update_world_matrices()
+
+    def set_instances(self, matrices, owners=None):
+        matrices = np.asarray(matrices, 'float32').reshape(-1, 4, 4)
+        self.instance_matrices = matrices.copy()
+        self.instance_owners = list(owners) if owners is not None else [None] * len(matrices)
+        self._instances_changed()
+
+    def add_instance(self, matrix, owner=None):
+        """
+        :return:
+          index of the new instance
+        """
+        self.instance_matrices = np.concatenate((self.instance_matrices, np.reshape(matrix, (1, 4, 4))))
+        self.instance_owners.append(owner)
+        self._instances_changed()
+        return len(self.instance_matrices) - 1
+
+    def remove_instance(self, index):
+        """
+        Removes instance by moving the last instance into its place
+        :return:
+          owner of the moved instance, None if the last instance was removed
+        """
+        last = len(self.instance_matrices) - 1
+        moved = None
+        if index != last:
+            self.instance_matrices[index] = self.instance_matrices[last]
+            self.instance_owners[index] = moved = self.instance_owners[last]
+        self.instance_matrices = self.instance_matrices[:last].copy()
+        self.instance_owners.pop()
+        self._instances_changed()
+        return moved
+
+    def set_instance_matrix(self, index, matrix):
+        self.instance_matrices[index] = matrix
+        count = len(self.instance_matrices)
+        world_matrices = self.world_matrices.reshape(len(self.nodes), count, 4, 4)
+        np.matmul(self.node_matrices, self.instance_matrices[index] @ self.world_matrix,
+                  out=world_matrices[:, index])
+        self.matrices_changed = True
+        centers, extents = transform_bounds(self.local_centers, self.local_extents,
+                                            world_matrices[self.item_nodes, index])
+        lower = np.minimum(self.world_centers - self.world_extents, centers - extents)
+        upper = np.maximum(self.world_centers + self.world_extents, centers + extents)
+        self.world_centers = (lower + upper) / 2
+        self.world_extents = (upper - lower) / 2
+        self.bounds_loose = True
+
+    def refit_bounds(self):
+        # shrinks bounds grown by moved instances
+        if self.bounds_loose:
+            self._update_bounds()
+
+    def get_instance_bounds(self, index):
+        # (min, max) corners of the world-space box containing all draw items of the instance
+        world_matrices = self.world_matrices.reshape(len(self.nodes), len(self.instance_matrices), 4, 4)
+        if not len(self.draw_items):
+            pos = world_matrices[0, index, 3, :3].tolist()
+            return pos, pos
+        centers, extents = transform_bounds(self.local_centers, self.local_extents,
+                                            world_matrices[self.item_nodes, index])
+        return (centers - extents).min(axis=0).tolist(), (centers + extents).max(axis=0).tolist()
+
+    def _instances_changed(self):
+        # instance count changed: new draw items list makes DrawList recompile the model
+        self.draw_items = list(self.source.draw_items)
+        self.visible = np.ones(len(self.draw_items), 'bool')
+        self.world_matrices = np.empty((len(self.nodes) * len(self.instance_matrices), 4, 4), 'float32')
+        self._update_world_matrices()
+
+    def _update_world_matrices(self):
+        count = len(self.instance_matrices)
+        placements = self.instance_matrices @ self.world_matrix
+        np.matmul(self.node_matrices[:, None], placements[None],
+                  out=self.world_matrices.reshape(len(self.nodes), count, 4, 4))
+        self.matrices_changed = True
+        self._update_bounds()
+
+    def _update_bounds(self):
+        self.bounds_loose = False
+        count = len(self.instance_matrices)
+        if not count:
+            self.world_centers = np.repeat(self.world_matrix[None, 3, :3], len(self.draw_items), 0)
+            self.world_extents = np.zeros((len(self.draw_items), 3), 'float32')
+            return
+        matrices = self.world_matrices.reshape(len(self.nodes), count, 4, 4)[self.item_nodes].reshape(-1, 4, 4)
+        centers, extents = transform_bounds(np.repeat(self.local_centers, count, 0),
+                                            np.repeat(self.local_extents, count, 0), matrices)
+        lower = (centers - extents).reshape(-1, count, 3).min(axis=1)
+        upper = (centers + extents).reshape(-1, count, 3).max(axis=1)
+        self.world_centers = (lower + upper) / 2
+        self.world_extents = (upper - lower) / 2
+
+
+class LodModel:
+    """
+    Several variants of the same Model, from the most detailed to the least detailed one.
+    Level is selected from the projected screen size of the current variant bounds,
+    `hysteresis` widens switching thresholds, so objects near the threshold do not switch every frame
+    """
+
+    def __init__(self, models, thresholds=None, hysteresis=0.15):
+        self.models = list(models)
+        if thresholds is None:
+            thresholds = [0.25 * 0.5 ** i for i in range(len(self.models) - 1)]
+        if len(thresholds) != len(self.models) - 1:
+            raise ValueError('Every LOD level except the last one must have a threshold')
+        # minimum screen size (fraction of screen height) to keep every level but the last one
+        self.thresholds = list(thresholds)
+        self.hysteresis = hysteresis
+        self.level = 0
+        self.world_matrix = np.identity(4, 'float32')
+
+    @property
+    def current(self) -> Model:
+        return self.models[self.level]
+
+    def format(self, attribute_data, texture_bind_data):
+        self.models = [model.format(attribute_data, texture_bind_data) if isinstance(model, UnfinishedModel)
+                       else model for model in self.models]
+        return self
+
+    def instantiate(self):
+        # soft copy of all formatted levels, see Model.instantiate()
+        lod = LodModel([model.instantiate() for model in self.models], self.thresholds, self.hysteresis)
+        lod.level = self.level
+        lod.world_matrix[:] = self.world_matrix
+        return lod
+
+    def set_world_matrix(self, matrix):
+        # only the selected level is transformed, others are updated when selected
+        self.world_matrix[:] = matrix
+        self.current.set_world_matrix(self.world_matrix)
+
+    def get_screen_size(self, camera_pos, projection_scale):
+        """
+        :param projection_scale: 1 / tan(fov / 2) of the camera
+        :return:
+          diameter of bounding sphere projected to the screen, relative to screen height
+        """
+        lower, upper = self.current.get_world_bounds()
+        radius = sqrt(sum((upper[i] - lower[i]) ** 2 for i in range(3))) / 2
+        distance = sqrt(sum(((upper[i] + lower[i]) / 2 - camera_pos[i]) ** 2 for i in range(3)))
+        if distance <= radius:
+            return inf
+        return radius / distance * projection_scale
+
+    def select_level(self, screen_size):
+        """
+        :return:
+          True if selected level has changed
+        """
+        level = self.level
+        while level < len(self.thresholds) and screen_size < self.thresholds[level] * (1 - self.hysteresis):
+            level += 1
+        while level > 0 and screen_size > self.thresholds[level - 1] * (1 + self.hysteresis):
+            level -= 1
+        if level == self.level:
+            return False
+        self.level = level
+        self.current.set_world_matrix(self.world_matrix)
+        return True
+
 
 NodeEvent = BaseEvent.create_meta('NodeEvent', ('node', ))
-NodeDrawEvent = NodeEvent.create_meta('NodeDrawEvent')
-NodeModelMatrixUpdateEvent = NodeEvent.create_meta('NodeModelMatrixUpdate')
+NodeDrawEvent = NodeEvent.create_meta('NodeDrawEvent', pooled=True)
 
 
 class Node:
-    def __init__(self, parent=None, childs=None, name=None, meshes=None, offset=vec3(0)):
+    __slots__ = ('name', 'child_nodes', 'parent', 'meshes', 'raw_matrix', 'result_matrix')
+
+    def __init__(self, parent=None, childs=None, name=None, meshes=None):
         if childs is None:
             childs = []
         if meshes is None:
@@ -123,36 +484,31 @@ class Node:
         self.parent = parent
         self.meshes = meshes  # meshes are RenderCompound instances
 
-        self.offset = offset
-        self.raw_matrix = None  # source self transform matrix (offset not affected)
-        self.own_matrix = None  # resulting self transform matrix (raw_matrix translated by offset)
-        self.result_matrix = None  # resulting model matrix. bind-ready
-        self.set_model_matrix(mat4(1))
+        self.raw_matrix = mat4(1)  # source self transform matrix, relative to parent node
+        self.result_matrix = np.identity(4, 'float32')  # resulting model matrix. bind-ready. set by owning Model
 
-    def set_offset(self, offset):
-        if self.offset == offset:
-            return
-        self.offset = offset
-        self.set_model_matrix(self.raw_matrix)
+    def walk(self):
+        yield self
+        for node in self.child_nodes:
+            yield from node.walk()
 
-    def draw(self):
-        MainEventManager.add_event(NodeDrawEvent(self, instant=True))
+    def copy(self, parent=None):
+        # copy of the subtree with its own matrices, RenderCompounds are shared. __init__ is skipped as it is slow
+        node = Node.__new__(Node)
+        node.name = self.name
+        node.parent = parent
+        node.meshes = list(self.meshes)
+        node.raw_matrix = mat4(self.raw_matrix)
+        node.result_matrix = self.result_matrix.copy()
+        node.child_nodes = [child.copy(node) for child in self.child_nodes]
+        return node
+
+    def draw_meshes(self, event_manager=MainEventManager):
+        event_manager.add_event(NodeDrawEvent.create(self, instant=True))
         for mesh in self.meshes:
-            mesh.draw()
-        for node in self.child_nodes:
-            node.draw()
+            mesh.draw(event_manager)
 
-    def apply_transformation(self, transform_matrix: mat4):
-        self.result_matrix = self.own_matrix * transform_matrix
-        MainEventManager.add_event(NodeModelMatrixUpdateEvent(self, instant=True))
+    def draw(self, event_manager=MainEventManager):
+        self.draw_meshes(event_manager)
         for node in self.child_nodes:
-            node.apply_transformation(self.result_matrix)
-
-    def set_model_matrix(self, matrix: mat4):
-        self.raw_matrix = matrix
-        self.own_matrix = translate(matrix, self.offset)
-        if self.parent is not None:  # root node
-            mult_matrix = self.parent.result_matrix
-        else:
-            mult_matrix = mat4(1)
-        self.apply_transformation(mult_matrix)
+            node.draw(event_manager)
@@ -0,0 +1,207 @@
+"""
+Mesh simplification by quadric error metric (Garland & Heckbert) with half-edge collapses.
+Vertices are collapsed into their neighbours, so attributes of remaining vertices are never interpolated
+and UVs stay valid. Vertices lying on UV/normal seams (several vertices with the same position)
+and on mesh borders are locked, so seams never open and borders never shrink
+"""
+from hashlib import sha1
+from heapq import heappush, heappop
+from os.path import exists
+
+import numpy as np
+
+MAX_NORMAL_ROTATION_COS = 0.25  # collapses rotating face normals by more than ~75 degrees are rejected
+
+
+def weld_vertices(vertices, faces):
+    """
+    Merges vertices with identical attributes
+    :return:
+      (vertices, faces) with faces as M*3 array
+    """
+    vertices, inverse = np.unique(vertices, axis=0, return_inverse=True)
+    return vertices, inverse.reshape(-1)[np.asarray(faces, 'int64').reshape(-1, 3)]
+
+
+def _compute_locked(positions, faces):
+    # seam vertices share position with other vertices, border vertices have position edges with only one face
+    _, group = np.unique(positions, axis=0, return_inverse=True)
+    group = group.reshape(-1)
+    locked = np.bincount(group)[group] > 1
+
+    group_faces = group[faces]
+    edges = np.concatenate((group_faces[:, [0, 1]], group_faces[:, [1, 2]], group_faces[:, [2, 0]]))
+    edges = np.sort(edges, axis=1)
+    edges, counts = np.unique(edges, axis=0, return_counts=True)
+    locked_groups = np.zeros(group.max() + 1 if len(group) else 0, 'bool')
+    locked_groups[edges[counts != 2].reshape(-1)] = True  # border and non-manifold edges
+    return locked | locked_groups[group]
+
+
+def _compute_quadrics(positions, faces):
+    p0, p1, p2 = positions[faces[:, 0]], positions[faces[:, 1]], positions[faces[:, 2]]
+    normals = np.cross(p1 - p0, p2 - p0)
+    areas = np.linalg.norm(normals, axis=1)
+    valid = areas > 0
+    normals[valid] /= areas[valid, None]
+    planes = np.concatenate((normals, -(normals * p0).sum(axis=1)[:, None]), axis=1)
+    # every plane quadric is weighted by the face area
+    face_quadrics = areas[:, None, None] * planes[:, :, None] * planes[:, None, :]
+    quadrics = np.zeros((len(positions), 4, 4))
+    for corner in range(3):
+        np.add.at(quadrics, faces[:, corner], face_quadrics)
+    return quadrics
+
+
+def simplify(vertices, faces, ratio=0.5, pos_offset=0, target_count=None):
+    """
+    Reduces triangle count of indexed triangle mesh
+    :param vertices: N*K array of interleaved vertex attributes
+    :param faces: flat or M*3 index array
+    :param ratio: part of triangles to keep
+    :param pos_offset: column of x coordinate of vertex position
+    :param target_count: triangle count to reach, overrides ratio
+    :return:
+      (vertices, faces) of the simplified mesh, faces have the same shape as the source ones.
+      Triangle count can stay above the target if there are no more valid collapses
+    """
+    flat_faces = np.ndim(faces) == 1
+    vertices, faces = weld_vertices(np.asarray(vertices, 'float32'), faces)
+    if target_count is None:
+        target_count = int(len(faces) * ratio)
+    positions = vertices[:, pos_offset:pos_offset + 3].astype('float64')
+    locked = _compute_locked(positions, faces)
+    quadrics = _compute_quadrics(positions, faces)
+    homogeneous = np.concatenate((positions, np.ones((len(positions), 1))), axis=1)
+
+    tris = faces.tolist()
+    face_alive = [True] * len(tris)
+    vertex_faces = [set() for _ in range(len(vertices))]
+    for index, tri in enumerate(tris):
+        for vertex in tri:
+            vertex_faces[vertex].add(index)
+    stamps = [0] * len(vertices)  # changed on every quadric update to invalidate heap entries
+    heap = []
+
+    def push(src, dst):
+        if not locked[src]:
+            point = homogeneous[dst]
+            cost = float(point @ (quadrics[src] + quadrics[dst]) @ point)
+            heappush(heap, (cost, src, dst, stamps[src], stamps[dst]))
+
+    def neighbours(vertex):
+        return {other for face in vertex_faces[vertex] for other in tris[face]} - {vertex}
+
+    def can_collapse(src, dst):
+        shared = [face for face in vertex_faces[src] if dst in tris[face]]
+        if not shared:
+            return False
+        # link condition: keeps the surface manifold
+        if len(neighbours(src) & neighbours(dst)) != len(shared):
+            return False
+        # collapse must not flip remaining faces or turn them into slivers with a strongly rotated normal
+        for face in vertex_faces[src]:
+            tri = tris[face]
+            if dst in tri:
+                continue
+            p = [positions[vertex] for vertex in tri]
+            old_normal = np.cross(p[1] - p[0], p[2] - p[0])
+            p[tri.index(src)] = positions[dst]
+            new_normal = np.cross(p[1] - p[0], p[2] - p[0])
+            if old_normal @ new_normal <= MAX_NORMAL_ROTATION_COS * np.linalg.norm(old_normal) * \
+                    np.linalg.norm(new_normal):
+                return False
+        return True
+
+    for a, b in {(min(a, b), max(a, b)) for tri in tris for a, b in ((tri[0], tri[1]), (tri[1], tri[2]),
+                                                                    (tri[2], tri[0]))}:
+        push(a, b)
+        push(b, a)
+
+    face_count = len(tris)
+    while heap and face_count > target_count:
+        _, src, dst, src_stamp, dst_stamp = heappop(heap)
+        if stamps[src] != src_stamp or stamps[dst] != dst_stamp or not vertex_faces[src]:
+            continue
+        if not can_collapse(src, dst):
+            continue
+
+        for face in vertex_faces[src]:
+            tri = tris[face]
+            if dst in tri:
+                face_alive[face] = False
+                face_count -= 1
+                for vertex in tri:
+                    if vertex != src:
+                        vertex_faces[vertex].discard(face)
+            else:
+                tri[tri.index(src)] = dst
+                vertex_faces[dst].add(face)
+        vertex_faces[src] = set()
+        quadrics[dst] += quadrics[src]
+        stamps[src] += 1
+        stamps[dst] += 1
+        for other in neighbours(dst):
+            push(other, dst)
+            push(dst, other)
+
+    # removing unused vertices
+    faces = np.array([tri for tri, alive in zip(tris, face_alive) if alive], 'int64').reshape(-1, 3)
+    used, faces = np.unique(faces, return_inverse=True)
+    faces = faces.reshape(-1, 3).astype('uint32')
+    return vertices[used], faces.reshape(-1) if flat_faces else faces
+
+
+def build_lod_chain(vertices, faces, ratios=(0.5, 0.25), pos_offset=0):
+    """
+    Makes progressively simplified copies of the mesh, every level is simplified from the previous one
+    :param ratios: triangle count of every level relative to the source mesh
+    :return:
+      list of (vertices, faces) for every ratio
+    """
+    source_count = np.size(faces) // 3
+    chain = []
+    for ratio in ratios:
+        vertices, faces = simplify(vertices, faces, pos_offset=pos_offset, target_count=int(source_count * ratio))
+        chain.append((vertices, faces))
+    return chain
+
+
+class LodCache:
+    """
+    Simplified meshes of a model, stored in a .npz file next to the source model.
+    Entries are keyed by the hash of source mesh data and simplification parameters,
+    so changed models are simplified again
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.entries = {}
+        self.is_changed = False
+        self._used = set()
+        if exists(filename):
+            with np.load(filename) as data:
+                self.entries = dict(data)
+
+    def get_chain(self, vertices, faces, ratios=(0.5, 0.25), pos_offset=0):
+        vertices, faces = np.asarray(vertices, 'float32'), np.asarray(faces, 'uint32')
+        digest = sha1(vertices.tobytes() + faces.tobytes() + repr((tuple(ratios), pos_offset)).encode()).hexdigest()
+        keys = [('%s_%d_vertices' % (digest, i), '%s_%d_faces' % (digest, i)) for i in range(len(ratios))]
+        self._used.update(key for pair in keys for key in pair)
+
+        if all(vertices_key in self.entries for vertices_key, _ in keys):
+            return [(self.entries[vertices_key], self.entries[faces_key]) for vertices_key, faces_key in keys]
+
+        chain = build_lod_chain(vertices, faces, ratios, pos_offset)
+        for (vertices_key, faces_key), (level_vertices, level_faces) in zip(keys, chain):
+            self.entries[vertices_key] = level_vertices
+            self.entries[faces_key] = level_faces
+        self.is_changed = True
+        return chain
+
+    def save(self):
+        # writes entries requested since loading, entries of changed or removed meshes are dropped
+        if self.is_changed or set(self.entries) != self._used:
+            self.entries = {key: value for key, value in self.entries.items() if key in self._used}
+            np.savez_compressed(self.filename, **self.entries)
+            self.is_changed = False
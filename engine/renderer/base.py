@@ -3,6 +3,10 @@ from typing import Iterable
 from ..gl.shader import ShaderProgram
 from ..model.model import RenderCompound
 from ..gl.framebuffer import StaticFrameBuffer, FrameBuffer
+from ..gl.state import GLState
+from .draw_list import DrawList
+from .render_queue import RenderQueue
+from .gpu_culling import GPUCullingQueue
 
 
 # todo add forward renderer preset and remove this class
@@ -40,12 +44,16 @@ class BaseRenderer(RenderStage):
     """
     signature = {'in': (), 'out': ()}
     load_params = {}  # e.g. {'diffuse': {'anisotropic_filtering': 16, 'gamma_corr': True}}
+    capabilities = ()  # GLState.STAGE_CAPABILITIES enabled while drawing, e.g. (GL_DEPTH_TEST, GL_CULL_FACE)
     shader_prog: ShaderProgram
 
     def draw(self, out_fbo, data) -> int:
         out_fbo.use()
+        GLState.set_capabilities(self.capabilities)
         out_fbo.clear()
         self.shader_prog.use()
+        if isinstance(data, (DrawList, RenderQueue, GPUCullingQueue)):
+            return data.execute()
         i = 0
         for i, elem in enumerate(data):
             elem.draw()
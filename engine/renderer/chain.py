@@ -10,6 +10,10 @@ class RenderChain:
         self.attribute_data = first_pass.attribute_data
         self.sampler_data = first_pass.sampler_data
 
+    def has_dependency(self, name):
+        # first pass shader uses the scene renderer dependency, e.g. 'ModelMatrices'
+        return any(dep.DEPENDENCY_NAME == name for dep in self.first.uniformed.deps)
+
     def draw(self, out_fbo, data):
         self.first_pass(data)
         self.second_pass(out_fbo)
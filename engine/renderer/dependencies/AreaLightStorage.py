@@ -1,13 +1,11 @@
-from ctypes import POINTER, c_int32
-
-from .base import BaseRendererDependence
-from ...scene.component import ComponentAddEvent
+from .base import ComponentArrayDependence
+from ...scene.component import ComponentAddEvent, ComponentRemoveEvent
 from ...scene.components.light import LightDataUpdateEvent, AreaLightComponent
 
 
-class CurrentDependence(BaseRendererDependence):
-    _event_subscriptions_ = (LightDataUpdateEvent, ComponentAddEvent)
-    BUFFER_IS_ARRAY = True
+class CurrentDependence(ComponentArrayDependence):
+    _event_subscriptions_ = ComponentArrayDependence._event_subscriptions_ + \
+        (LightDataUpdateEvent, ComponentAddEvent, ComponentRemoveEvent)
     DEPENDENCY_NAME = 'AreaLightStorage'
 
     def __init__(self, scene, *args, **kwargs):
@@ -18,36 +16,30 @@ class CurrentDependence(BaseRendererDependence):
                                                            ['point2', 3], ['___', 1],
                                                            ['point3', 3], ['____', 1]],
                                                 **kwargs)
-        self.component_dict = {}
 
-    def on_event(self, evt):
+    def on_component_add(self, evt):
         component = evt.component
-        if not isinstance(component, AreaLightComponent):
+        if not isinstance(component, AreaLightComponent) or component.game_object is None:
             return
-        if isinstance(evt, ComponentAddEvent):
-            self.buffer.add_frame(color=component.color, intensity=component.intensity,
-                                  point0=component.points[0],
-                                  point1=component.points[1],
-                                  point2=component.points[2],
-                                  point3=component.points[3])
-            self.component_dict[id(component)] = len(self.component_dict)
-            self.buffer.get_raw_memory_data_setter(POINTER(c_int32))[0] = len(self.component_dict)
-            self.full_upload()
-        elif isinstance(evt, LightDataUpdateEvent):
-            index = self.component_dict[id(component)]
-            setter = self.buffer[index]
-            setter.color = component.color
-            setter.intensity = component.intensity
-            setter.point0 = component.points[0]
-            setter.point1 = component.points[1]
-            setter.point2 = component.points[2]
-            setter.point3 = component.points[3]
-            start, size = self.buffer.struct.get_frame_pointer(index)
-            self.buffer.chunk_upload(4+start, size)
+        self.add_component(component, color=component.color, intensity=component.intensity,
+                           point0=component.points[0],
+                           point1=component.points[1],
+                           point2=component.points[2],
+                           point3=component.points[3])
 
-    def add_setter(self, *_, **__):
-        pass
+    def on_component_remove(self, evt):
+        self.remove_component(evt.component)
 
-    def full_upload(self):
-        self.buffer.upload()
-        self.buffer.force_upload()
+    def on_light_data_update(self, evt):
+        component = evt.component
+        index = self.component_dict.get(id(component))
+        if index is None:
+            return  # inactive or removed light
+        setter = self.buffer[index]
+        setter.color = component.color
+        setter.intensity = component.intensity
+        setter.point0 = component.points[0]
+        setter.point1 = component.points[1]
+        setter.point2 = component.points[2]
+        setter.point3 = component.points[3]
+        self.mark_changed(index)
@@ -1,15 +1,18 @@
 import numpy as np
 from OpenGL.GL import GL_DYNAMIC_DRAW
-from glm import lookAt, perspective
 
 from .base import BaseRendererDependence
 from ...scene.components.camera import CameraDataUpdateEvent
 from ...scene.scene import SetCameraEvent
 from ...model.model import NodeDrawEvent
+from ...event.scene import SceneDrawEvent
 
 
 class CurrentDependence(BaseRendererDependence):
-    _event_subscriptions_ = (CameraDataUpdateEvent, NodeDrawEvent, SetCameraEvent)
+    # NodeDrawEvent is subscribed only if a shader takes model matrix from this buffer (see add_setter),
+    # shaders should read it from ModelMatrices SSBO instead
+    _event_subscriptions_ = (CameraDataUpdateEvent, SetCameraEvent, SceneDrawEvent)
+    PER_NODE_MATRICES = ('model_matrix', 'model_view_projection_matrix')
     DEPENDENCY_NAME = 'MVPMatrices'
     BUFFER_SIZE = 5 * 4 * 4 * 4  # mat_cnt * rows * cols * sizeof(float32)
     BUFFER_SHAPE = (5, 4, 4)  # mat_cnt, rows, cols
@@ -17,7 +20,6 @@ class CurrentDependence(BaseRendererDependence):
     def __init__(self, scene, *args, **kwargs):
         super(CurrentDependence, self).__init__(scene, *args, **kwargs, buffer_usage=GL_DYNAMIC_DRAW)
         self.buffer.set_buf_data(np.zeros(self.BUFFER_SHAPE, 'float32'))
-        self.near_pane = 0.1
 
         self.view_matrix = np.identity(4, 'float32')
         self.projection_matrix = np.identity(4, 'float32')
@@ -25,27 +27,37 @@ class CurrentDependence(BaseRendererDependence):
         self.model_matrix = np.identity(4, 'float32')
         self.model_view_projection_matrix = np.identity(4, 'float32')
         self._old_model_matrix = np.identity(4, 'float32')
+        self._camera_changed = True  # camera matrices are rebuilt once per frame, before drawing
         # todo filter events if current renderer does not require this dependence
 
-    def on_event(self, event):
-        # using a single uniform buffer and same offset for all models is a worst thing you can find here, btw
-        # you can see this if you profile `main.py` and look where most of the time spent :D
+    def on_node_draw(self, event):
+        # legacy path: the whole buffer is uploaded for every drawn node
 
         # note: numpy matrix multiplication differs from glm. multiplication order is reversed
-        if isinstance(event, NodeDrawEvent):
-            self.model_matrix[:] = event.node.result_matrix
-            #if np.array_equal(self.model_matrix, self._old_model_matrix):
-            #    return
-            self._old_model_matrix[:] = self.model_matrix
-            # np.matmul(self.model_matrix, self.view_projection_matrix, out=self.model_view_projection_matrix)
-            self.model_view_projection_matrix[:] = self.model_matrix @ self.view_projection_matrix
-        elif isinstance(event, CameraDataUpdateEvent) or isinstance(event, SetCameraEvent):
-            self._rebuild_view_matrix(event.component.game_object)
-            self._rebuild_projection_matrix(event.component)
-            self.view_projection_matrix[:] = self.view_matrix @ self.projection_matrix
-        else:
+        self.model_matrix[:] = event.node.result_matrix
+        #if np.array_equal(self.model_matrix, self._old_model_matrix):
+        #    return
+        self._old_model_matrix[:] = self.model_matrix
+        # np.matmul(self.model_matrix, self.view_projection_matrix, out=self.model_view_projection_matrix)
+        self.model_view_projection_matrix[:] = self.model_matrix @ self.view_projection_matrix
+        self.stream_upload()
+
+    def on_camera_data_update(self, event):
+        if event.component is self.scene.active_camera:
+            self._camera_changed = True
+
+    def on_set_camera(self, _event):
+        self._camera_changed = True
+
+    def on_scene_draw(self, _event):
+        camera = self.scene.active_camera
+        if not self._camera_changed or camera is None:
             return
-        self.buffer.force_upload()
+        self._rebuild_view_matrix(camera)
+        self._rebuild_projection_matrix(camera)
+        self.view_projection_matrix[:] = self.view_matrix @ self.projection_matrix
+        self.stream_upload()
+        self._camera_changed = False
 
     def add_setter(self, name, offset, size):
         name += '_matrix'
@@ -53,12 +65,12 @@ class CurrentDependence(BaseRendererDependence):
         if not hasattr(self, name):
             raise AttributeError('Invalid attribute name:' + name)
         setattr(self, name, self.buffer.get_buffer_data()[offset])
+        if name in self.PER_NODE_MATRICES and NodeDrawEvent not in self._event_subscriptions_:
+            self._event_subscriptions_ += (NodeDrawEvent, )
+            self.event_manager.add_handler(self, NodeDrawEvent, self.on_node_draw)
 
-    def _rebuild_view_matrix(self, game_object):
-        self.view_matrix[:] = lookAt(game_object.abs_pos, game_object.abs_pos + game_object.direction,
-                                     game_object._get_upward_vector())
+    def _rebuild_view_matrix(self, camera):
+        self.view_matrix[:] = camera.get_view_matrix()
 
     def _rebuild_projection_matrix(self, camera):
-        # it's a perspective matrix only todo add other matrices
-        self.projection_matrix[:] = perspective(camera.fov, camera.render_target.width / camera.render_target.height,
-                                                self.near_pane, camera.render_distance)
+        self.projection_matrix[:] = camera.get_projection_matrix()
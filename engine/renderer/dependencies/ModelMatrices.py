@@ -0,0 +1,57 @@
+import numpy as np
+from OpenGL.GL import GL_DYNAMIC_DRAW
+
+from .base import BaseRendererDependence
+from ...event.scene import SceneDrawEvent
+from ...gl.mesh import DrawIndexBuffer
+
+
+class CurrentDependence(BaseRendererDependence):
+    """
+    World matrices of all nodes of the scene models in one SSBO (`mat4 model_matrices[]`, std430).
+    Nodes of every model (of all its instances, see InstancedModel) take a contiguous range starting
+    at Model.matrix_slot, which is passed to the shader as base instance of the draw call (see DrawIndexBuffer).
+    Changed matrices are uploaded once per frame, before the scene is drawn
+    """
+    _event_subscriptions_ = (SceneDrawEvent, )
+    DEPENDENCY_NAME = 'ModelMatrices'
+    BUFFER_IS_ARRAY = True
+
+    def __init__(self, scene, *args, **kwargs):
+        kwargs['buffer_type'] = 'SSBO'
+        super(CurrentDependence, self).__init__(scene, *args, structure=[['model_matrix', 16]], **kwargs,
+                                                buffer_usage=GL_DYNAMIC_DRAW)
+        self.matrices = np.zeros((0, 4, 4), 'float32')
+        self.count = 0  # matrices in use
+        self.layout_version = 0  # incremented when Model.matrix_slot of some model changes
+
+    def on_scene_draw(self, _evt):
+        # models are laid out in order, so a removed model moves matrices of the following ones
+        models = self.scene.get_render_models()
+        total = sum(len(model.world_matrices) for model in models)
+        resized = total > len(self.matrices)
+        if resized:
+            self.matrices = np.zeros((max(total, len(self.matrices) * 2, 64), 4, 4), 'float32')
+            DrawIndexBuffer.reserve(len(self.matrices))
+        matrices = self.matrices
+        slot = 0
+        dirty_start = dirty_stop = None
+        for model in models:
+            count = len(model.world_matrices)
+            if resized or model.matrices_changed or model.matrix_slot != slot:
+                if model.matrix_slot != slot:
+                    self.layout_version += 1
+                model.matrix_slot = slot
+                model.matrices_changed = False
+                matrices[slot:slot + count] = model.world_matrices
+                if dirty_start is None:
+                    dirty_start = slot
+                dirty_stop = slot + count
+            slot += count
+        self.count = slot
+        if resized:
+            self.buffer.set_buf_data(matrices)
+            self.buffer.force_upload()
+        elif dirty_start is not None:
+            self.buffer.sub_src_upload(dirty_start * matrices[0].nbytes, matrices[dirty_start:dirty_stop],
+                                       self.scene.stream_buffer)
@@ -1,15 +1,13 @@
-from ctypes import POINTER, c_int32
-
 from glm import cos
 
-from .base import BaseRendererDependence
-from ...scene.component import ComponentAddEvent
+from .base import ComponentArrayDependence
+from ...scene.component import ComponentAddEvent, ComponentRemoveEvent
 from ...scene.components.light import LightDataUpdateEvent, SpotLightComponent
 
 
-class CurrentDependence(BaseRendererDependence):
-    _event_subscriptions_ = (LightDataUpdateEvent, ComponentAddEvent)
-    BUFFER_IS_ARRAY = True
+class CurrentDependence(ComponentArrayDependence):
+    _event_subscriptions_ = ComponentArrayDependence._event_subscriptions_ + \
+        (LightDataUpdateEvent, ComponentAddEvent, ComponentRemoveEvent)
     DEPENDENCY_NAME = 'SpotLightStorage'
 
     def __init__(self, scene, *args, **kwargs):
@@ -19,35 +17,29 @@ class CurrentDependence(BaseRendererDependence):
                                                            ['pos', 3],            ['cut_off', 1],
                                                            ['direction', 3],      ['outer_cut_off', 1]],
                                                 **kwargs)
-        self.component_dict = {}
 
-    def on_event(self, evt):
+    def on_component_add(self, evt):
         component = evt.component
-        if not isinstance(component, SpotLightComponent):
+        if not isinstance(component, SpotLightComponent) or component.game_object is None:
             return
-        if isinstance(evt, ComponentAddEvent):
-            self.buffer.add_frame(diffuse_color=component.diffuse_color, linear=0, quadratic=0,
-                                  specular_color=component.specular_color, pos=component.game_object.abs_pos,
-                                  cut_off=cos(component.cut_off), outer_cut_off=cos(component.outer_cut_off),
-                                  direction=component.direction)
-            self.component_dict[id(component)] = len(self.component_dict)
-            self.buffer.get_raw_memory_data_setter(POINTER(c_int32))[0] = len(self.component_dict)
-            self.full_upload()
-        elif isinstance(evt, LightDataUpdateEvent):
-            index = self.component_dict[id(component)]
-            setter = self.buffer[index]
-            setter.diffuse_color = component.diffuse_color
-            setter.specular_color = component.specular_color
-            setter.direction = component.direction
-            setter.cut_off = cos(component.cut_off)
-            setter.outer_cut_off = cos(component.outer_cut_off)
-            setter.pos = component.game_object.abs_pos
-            start, size = self.buffer.struct.get_frame_pointer(index)
-            self.buffer.chunk_upload(4+start, size)
+        self.add_component(component, diffuse_color=component.diffuse_color, linear=0, quadratic=0,
+                           specular_color=component.specular_color, pos=component.game_object.abs_pos,
+                           cut_off=cos(component.cut_off), outer_cut_off=cos(component.outer_cut_off),
+                           direction=component.direction)
 
-    def add_setter(self, *_, **__):
-        pass
+    def on_component_remove(self, evt):
+        self.remove_component(evt.component)
 
-    def full_upload(self):
-        self.buffer.upload()
-        self.buffer.force_upload()
+    def on_light_data_update(self, evt):
+        component = evt.component
+        index = self.component_dict.get(id(component))
+        if index is None:
+            return  # inactive or removed light
+        setter = self.buffer[index]
+        setter.diffuse_color = component.diffuse_color
+        setter.specular_color = component.specular_color
+        setter.direction = component.direction
+        setter.cut_off = cos(component.cut_off)
+        setter.outer_cut_off = cos(component.outer_cut_off)
+        setter.pos = component.game_object.abs_pos
+        self.mark_changed(index)
@@ -1,4 +1,7 @@
+from ctypes import POINTER, c_int32
+
 from ...event.base import BaseEventReceiver
+from ...event.scene import SceneDrawEvent
 from ...gl.shader_buffer import StructuredShaderBuffer, StructuredShaderArrayBuffer
 from ...gl.uniform_buffer import StructuredUniformBuffer, StructuredUniformArrayBuffer
 
@@ -18,11 +21,17 @@ class UniformBufferBindingPointManager:
         return None
 
     @classmethod
-    def take_point(cls, buffer):
+    def reserve_point(cls, owner):
+        # takes binding point without binding anything to it
         index = cls.get_available_index()
         if index is None:
             raise BufferError("[CRITICAL] maximum number of binding points reached")  # todo add this to logging
-        cls.points[index] = buffer
+        cls.points[index] = owner
+        return index
+
+    @classmethod
+    def take_point(cls, buffer):
+        index = cls.reserve_point(buffer)
         buffer.bind_to_block(index)
         return index
 
@@ -40,7 +49,7 @@ class BaseRendererDependence(BaseEventReceiver):
         self.array_type_size = self.buffer.get_buffer_data().dtype.itemsize
         self.setters = {}
         self.binding_point = None
-        super(BaseRendererDependence, self).__init__()
+        super(BaseRendererDependence, self).__init__(scene.event_manager)
         if take_point:
             self.binding_point = UniformBufferBindingPointManager.take_point(self.buffer)
 
@@ -53,11 +62,82 @@ class BaseRendererDependence(BaseEventReceiver):
     def upload_buffer(self):
         self.buffer.upload()
 
+    def stream_upload(self):
+        # uploads the whole buffer through the scene stream buffer, if buffer size has not changed
+        stream = self.scene.stream_buffer
+        if stream is None or self.buffer.is_changed:
+            self.buffer.force_upload()
+        else:
+            self.buffer.sub_src_upload(0, self.buffer.get_buffer_data(), stream)
+
     def recalculate_size(self, end_point):
         if end_point > self.buffer.size:
             self.buffer.resize(end_point)
 
 
+class ComponentArrayDependence(BaseRendererDependence):
+    """
+    Stores one array element per component and element count as int at the start of the buffer.
+    Removed elements are replaced by the last one, so the array stays contiguous.
+    Changes are uploaded once per frame, before the scene is drawn
+    """
+    _event_subscriptions_ = (SceneDrawEvent, )
+    BUFFER_IS_ARRAY = True
+
+    def __init__(self, scene, *args, **kwargs):
+        super(ComponentArrayDependence, self).__init__(scene, *args, **kwargs)
+        self.component_dict = {}  # id(component): element index
+        self.components = []  # components by element index
+        self._resized = False  # element count changed, whole buffer is uploaded on flush
+        self._dirty_range = None  # (start, stop) of changed buffer items
+
+    def add_component(self, component, **frame):
+        if id(component) in self.component_dict:
+            return
+        self.buffer.add_frame(**frame)
+        self.component_dict[id(component)] = len(self.components)
+        self.components.append(component)
+        self._resized = True
+
+    def remove_component(self, component):
+        index = self.component_dict.pop(id(component), None)
+        if index is None:
+            return
+        moved_from = self.buffer.remove_frame(index)
+        last = self.components.pop()
+        if moved_from is not None:
+            self.components[index] = last
+            self.component_dict[id(last)] = index
+        self._resized = True
+
+    def mark_changed(self, index):
+        start, size = self.buffer.struct.get_frame_pointer(index)
+        if self._dirty_range is None:
+            self._dirty_range = (start, start + size)
+        else:
+            self._dirty_range = (min(self._dirty_range[0], start), max(self._dirty_range[1], start + size))
+
+    def on_scene_draw(self, _evt):
+        self.flush()
+
+    def flush(self):
+        if self._resized:
+            self.full_upload()
+        elif self._dirty_range is not None:
+            start, stop = self._dirty_range
+            self.buffer.chunk_upload(start, stop - start, self.scene.stream_buffer)
+        self._resized = False
+        self._dirty_range = None
+
+    def full_upload(self):
+        self.buffer.get_raw_memory_data_setter(POINTER(c_int32))[0] = len(self.components)
+        self.buffer.upload()
+        self.buffer.force_upload()
+
+    def add_setter(self, *_, **__):
+        pass
+
+
 # todo this shitty import system suxxxx, rewrite
 class DependencyImporter:
     importers = []
@@ -0,0 +1,316 @@
+import numpy as np
+from OpenGL.GL import glDrawElementsBaseVertex, glDrawElementsInstancedBaseVertexBaseInstance, \
+    glMultiDrawElementsIndirect, GL_UNSIGNED_INT, GL_STREAM_DRAW, GLvoidp
+
+from ..gl.geometry import SharedMesh, DrawIndirectBuffer, INDIRECT_COMMAND_SIZE
+from ..gl.mesh import VAOMesh
+from ..gl.state import GLState
+from ..model.model import NodeDrawEvent, RenderCompoundDrawEvent
+
+
+class DrawList:
+    """
+    Flat arrays of everything needed to draw a group of models: VAO ids, index counts, texture bindings
+    and matrix slots (nodes) of every draw item. Compiled from all models of the group and rebuilt only when
+    a model is not in the list or its draw items were rebuilt (Model.finished(), instance count changes of
+    InstancedModel).
+    Meshes changed in place (e.g. VAOMesh.set_vertex_data()) require invalidate().
+    Items of models stored in ModelMatrices SSBO are drawn with base instance set to their node matrix index,
+    items of InstancedModel are drawn once for all instances (their node matrices are consecutive).
+
+    Executed by a single loop instead of walking Model -> Node -> RenderCompound: texture and VAO binds
+    are skipped if they are the same as for the previous item, NodeDrawEvent handlers are called directly
+    once per node change and RenderCompoundDrawEvent is only delivered if something is subscribed to it.
+    Items can be submitted in any order (see RenderQueue).
+
+    If all submitted items take matrices from ModelMatrices and nothing handles their draw events, items are drawn
+    by glMultiDrawElementsIndirect: commands of all items are uploaded at once and every run of items with the same
+    material, VAO and render mode (e.g. all SharedMesh items of a material) is a single draw call
+    """
+
+    def __init__(self, source, indirect=True):
+        """
+        :param source: callable returning all models that can be drawn by this list (e.g. including all LOD levels)
+        :param indirect: allow drawing with glMultiDrawElementsIndirect
+        """
+        self.source = source
+        self.indirect = indirect
+        self.vao_ids = []
+        self.index_counts = []
+        self.index_offsets = []  # pointer to the first index of every item
+        self.base_vertices = []
+        self.render_modes = []
+        self.material_slots = []  # index in `bindings` of every item
+        self.bindings = []  # (texture unit, bind point, texture id) tuples of every material
+        self.matrix_slots = []  # index in `nodes` of every item
+        self.node_offsets = []  # index of the first item node matrix in its model, added to Model.matrix_slot
+        self.instance_counts = []
+        self.nodes = []
+        self.custom_meshes = []  # meshes with their own draw() (e.g. instanced ones), None for compiled items
+        self.compounds = []
+        self.item_models = []
+        self.models = []  # compiled models
+        self._models = {}  # id(model): (model, its draw items list, first item, last item + 1)
+        self.selected = []  # models to be drawn by execute(), set every frame
+        self.dirty = True
+        self.version = 0  # incremented by every compile()
+        # of the last submit(): items drawn, GL draw calls, state changes
+        self.stats = {'draws': 0, 'draw_calls': 0, 'material_changes': 0, 'vao_changes': 0}
+        self.indirect_buffer = None
+        self._commands = np.zeros((0, 5), 'uint32')  # indirect command of every item, node offset as base instance
+        self._item_arrays = None  # (material slots, VAO ids, render modes, custom mesh mask, model index) arrays
+        self._node_event = NodeDrawEvent(instant=True)  # reused for every node, handlers must not keep it
+        self._compound_event = RenderCompoundDrawEvent(instant=True)
+
+    def __len__(self):
+        return len(self.vao_ids)
+
+    def invalidate(self):
+        self.dirty = True
+
+    def compile(self):
+        for items in (self.vao_ids, self.index_counts, self.index_offsets, self.base_vertices, self.render_modes,
+                      self.material_slots, self.bindings, self.matrix_slots, self.node_offsets, self.instance_counts,
+                      self.nodes, self.custom_meshes, self.compounds, self.item_models, self.models):
+            items.clear()
+        self._models.clear()
+        materials = {}  # id(material): slot
+        model_indices = []
+        first_indices = []
+        for model in self.source():
+            if id(model) in self._models:
+                continue
+            start = len(self.vao_ids)
+            self.models.append(model)
+            instance_count = model.instance_count
+            for node_offset, (node, node_start, node_stop) in enumerate(model._node_ranges):
+                slot = len(self.nodes)
+                self.nodes.append(node)
+                for compound in model.draw_items[node_start:node_stop]:
+                    mesh = compound.mesh
+                    material = compound.material
+                    if id(material) not in materials:
+                        materials[id(material)] = len(self.bindings)
+                        self.bindings.append(material.get_bindings())
+                    self.vao_ids.append(mesh.vao.buffer_id)
+                    self.index_counts.append(mesh.index_count)
+                    self.index_offsets.append(GLvoidp(mesh.first_index * 4) if mesh.first_index else None)
+                    self.base_vertices.append(mesh.base_vertex)
+                    self.render_modes.append(mesh.render_mode)
+                    self.material_slots.append(materials[id(material)])
+                    self.matrix_slots.append(slot)
+                    self.node_offsets.append(node_offset * instance_count)
+                    self.instance_counts.append(instance_count)
+                    self.custom_meshes.append(None if type(mesh).draw in COMPILED_DRAWS else mesh)
+                    self.compounds.append(compound)
+                    self.item_models.append(model)
+                    model_indices.append(len(self.models) - 1)
+                    first_indices.append(mesh.first_index)
+            self._models[id(model)] = (model, model.draw_items, start, len(self.vao_ids))
+        self._commands = np.array([self.index_counts, self.instance_counts, first_indices, self.base_vertices,
+                                   self.node_offsets], 'uint32').T.reshape(-1, 5)
+        self._item_arrays = (np.array(self.material_slots, 'int64'), np.array(self.vao_ids, 'int64'),
+                             np.array(self.render_modes, 'int64'),
+                             np.array([mesh is not None for mesh in self.custom_meshes], 'bool'),
+                             np.array(model_indices, 'int64'))
+        self.dirty = False
+        self.version += 1
+
+    def select(self, models):
+        # models to be drawn, in drawing order
+        self.selected = models
+        return self
+
+    def gather(self, models, centers=False, visible=True):
+        """
+        Finds visible items of models, compiles the list first if it is outdated
+        :param centers: also return world-space centers of the items (e.g. for depth sorting)
+        :param visible: skip items hidden by Model.visible masks
+        :return:
+          (item indices array in order of models, their centers or None, models not in the list)
+        """
+        entries = self._models
+        if not self.dirty:
+            for model in models:
+                entry = entries.get(id(model))
+                if entry is None or entry[1] is not model.draw_items:
+                    self.dirty = True
+                    break
+        if self.dirty:
+            self.compile()
+        present, missing = [], []
+        for model in models:
+            (present if id(model) in entries else missing).append(model)
+        if not present:
+            return np.zeros(0, 'int64'), np.zeros((0, 3), 'float32') if centers else None, missing
+        starts = np.array([entries[id(model)][2] for model in present], 'int64')
+        counts = np.array([len(model.visible) for model in present], 'int64')
+        items = np.arange(counts.sum()) + np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        mask = np.concatenate([model.visible for model in present]) if visible else slice(None)
+        item_centers = np.concatenate([model.world_centers for model in present])[mask] if centers else None
+        return items[mask], item_centers, missing
+
+    def item_attributes(self, items):
+        """
+        :param items: array of item indices, e.g. returned by gather()
+        :return:
+          (material slots, VAO ids, render modes, custom mesh mask, model indices, indirect commands) arrays
+          of the items, base instance of commands is the node offset in their model matrices
+        """
+        materials, vao_ids, modes, custom, model_indices = (array[items] for array in self._item_arrays)
+        return materials, vao_ids, modes, custom, model_indices, self._commands[items]
+
+    def execute(self):
+        """
+        Draws visible items of selected models, current program and framebuffer are used
+        :return:
+          number of drawn items
+        """
+        items, _, missing = self.gather(self.selected)
+        drawn = self.submit(items)
+        for model in missing:
+            # model is not a part of the source
+            model.draw()
+        return drawn
+
+    def submit(self, items):
+        """
+        Draws items in the given order, updates `stats`
+        :param items: array of item indices
+        :return:
+          number of drawn items
+        """
+        if self.indirect and len(items):
+            slots = self._get_indirect_slots()
+            if slots is not None:
+                return self._submit_indirect(items, slots)
+        return self._submit_direct(items.tolist())
+
+    def _get_indirect_slots(self):
+        """
+        :return:
+          Model.matrix_slot of all compiled models (-1 if not set), None if some of their draw events are handled
+        """
+        event_managers = {id(model.event_manager): model.event_manager for model in self.models}
+        for event_manager in event_managers.values():
+            if event_manager.get_handlers(NodeDrawEvent) or event_manager.get_handlers(RenderCompoundDrawEvent):
+                return None
+        return np.array([-1 if model.matrix_slot is None else model.matrix_slot for model in self.models], 'int64')
+
+    def _submit_indirect(self, items, slots):
+        materials, vao_ids, modes, custom, model_indices, commands = self.item_attributes(items)
+        model_slots = slots[model_indices]
+        if (model_slots < 0).any():
+            return self._submit_direct(items.tolist())
+        commands[:, 4] += model_slots.astype('uint32')
+        if self.indirect_buffer is None:
+            self.indirect_buffer = DrawIndirectBuffer(buffer_usage=GL_STREAM_DRAW)
+        self.indirect_buffer.set_buf_data(commands.reshape(-1), True)
+
+        # runs of items drawn by one call
+        changed = (materials[1:] != materials[:-1]) | (vao_ids[1:] != vao_ids[:-1]) | (modes[1:] != modes[:-1]) | \
+            custom[1:] | custom[:-1]
+        starts = np.flatnonzero(changed) + 1
+        stops = np.append(starts, len(items)).tolist()
+        starts = [0] + starts.tolist()
+        run_items = items[starts].tolist()
+
+        bindings, custom_meshes = self.bindings, self.custom_meshes
+        bind_texture, bind_vertex_array = GLState.bind_texture, GLState.bind_vertex_array
+        current_vao = current_material = -1
+        material_changes = vao_changes = 0
+        for start, stop, i in zip(starts, stops, run_items):
+            material = self.material_slots[i]
+            if material != current_material:
+                current_material = material
+                material_changes += 1
+                for unit, bind_point, texture_id in bindings[material]:
+                    bind_texture(unit, bind_point, texture_id)
+            mesh = custom_meshes[i]
+            if mesh is not None:
+                mesh.use()
+                mesh.draw()
+                current_vao = -1
+                vao_changes += 1
+                continue
+            vao = self.vao_ids[i]
+            if vao != current_vao:
+                current_vao = vao
+                vao_changes += 1
+                bind_vertex_array(vao)
+            glMultiDrawElementsIndirect(self.render_modes[i], GL_UNSIGNED_INT,
+                                        GLvoidp(start * INDIRECT_COMMAND_SIZE), stop - start, 0)
+        self._set_stats(len(items), len(starts), material_changes, vao_changes)
+        return len(items)
+
+    def _submit_direct(self, items):
+        vao_ids, index_counts, index_offsets, base_vertices, render_modes = \
+            self.vao_ids, self.index_counts, self.index_offsets, self.base_vertices, self.render_modes
+        material_slots, bindings = self.material_slots, self.bindings
+        matrix_slots, node_offsets, instance_counts, nodes, custom_meshes = \
+            self.matrix_slots, self.node_offsets, self.instance_counts, self.nodes, self.custom_meshes
+        item_models = self.item_models
+        bind_texture, bind_vertex_array = GLState.bind_texture, GLState.bind_vertex_array
+        node_event = self._node_event
+        compound_event = self._compound_event
+        event_manager = current_model = matrix_slot = None
+        node_handlers = compound_handlers = ()
+        current_vao = current_material = current_slot = -1
+        material_changes = vao_changes = 0
+        for i in items:
+            model = item_models[i]
+            if model is not current_model:
+                current_model = model
+                matrix_slot = model.matrix_slot
+                if model.event_manager is not event_manager:
+                    event_manager = model.event_manager
+                    node_handlers = event_manager.get_handlers(NodeDrawEvent)
+                    compound_handlers = event_manager.get_handlers(RenderCompoundDrawEvent)
+                    current_slot = -1
+            slot = matrix_slots[i]
+            if slot != current_slot:
+                current_slot = slot
+                node_event.node = nodes[slot]
+                for handler in node_handlers:
+                    handler(node_event)
+            if compound_handlers:
+                compound_event.compound = self.compounds[i]
+                for handler in compound_handlers:
+                    handler(compound_event)
+            material = material_slots[i]
+            if material != current_material:
+                current_material = material
+                material_changes += 1
+                for unit, bind_point, texture_id in bindings[material]:
+                    bind_texture(unit, bind_point, texture_id)
+            mesh = custom_meshes[i]
+            if mesh is not None:
+                mesh.use()
+                mesh.draw()
+                current_vao = -1
+                vao_changes += 1
+            else:
+                vao = vao_ids[i]
+                if vao != current_vao:
+                    current_vao = vao
+                    vao_changes += 1
+                    bind_vertex_array(vao)
+                if matrix_slot is None:
+                    glDrawElementsBaseVertex(render_modes[i], index_counts[i], GL_UNSIGNED_INT, index_offsets[i],
+                                             base_vertices[i])
+                else:
+                    glDrawElementsInstancedBaseVertexBaseInstance(
+                        render_modes[i], index_counts[i], GL_UNSIGNED_INT, index_offsets[i], instance_counts[i],
+                        base_vertices[i], matrix_slot + node_offsets[i])
+        self._set_stats(len(items), len(items), material_changes, vao_changes)
+        return len(items)
+
+    def _set_stats(self, draws, draw_calls, material_changes, vao_changes):
+        self.stats['draws'] = draws
+        self.stats['draw_calls'] = draw_calls
+        self.stats['material_changes'] = material_changes
+        self.stats['vao_changes'] = vao_changes
+
+
+# draw() of meshes drawn by DrawList itself
+COMPILED_DRAWS = (VAOMesh.draw, SharedMesh.draw)
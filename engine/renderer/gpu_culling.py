@@ -0,0 +1,249 @@
+import numpy as np
+from OpenGL.GL import GL_SHADER_STORAGE_BUFFER, GL_ATOMIC_COUNTER_BUFFER, GL_DRAW_INDIRECT_BUFFER, \
+    GL_PARAMETER_BUFFER, GL_COMMAND_BARRIER_BIT, GL_SHADER_STORAGE_BARRIER_BIT, GL_STATIC_DRAW, GL_R32UI, \
+    GL_RED_INTEGER, GL_UNSIGNED_INT, GLvoidp, glClearBufferData, glShaderStorageBlockBinding, \
+    glMultiDrawElementsIndirect, glMultiDrawElementsIndirectCount
+
+from ..gl.atomic import AtomicBuffer
+from ..gl.compute import ComputeProgram
+from ..gl.geometry import DrawIndirectBuffer, INDIRECT_COMMAND_SIZE
+from ..gl.shader_buffer import SSBO
+from ..gl.state import GLState
+from .dependencies.base import UniformBufferBindingPointManager
+from .draw_list import DrawList
+
+# CullItems element, std430
+ITEM_DTYPE = np.dtype([('center', 'float32', 3), ('count', 'uint32'), ('extent', 'float32', 3),
+                       ('first_index', 'uint32'), ('base_vertex', 'int32'), ('base_instance', 'uint32'),
+                       ('batch', 'uint32'), ('batch_start', 'uint32')])
+# planes nothing is outside of, used when frustum culling is disabled
+ACCEPT_ALL_PLANES = np.array([[0, 0, 0, 1]] * 6, 'float32')
+
+
+class GPUCullingQueue:
+    """
+    Draws current models of a group with frustum culling done by GPU, CPU cost per frame depends only on the number
+    of batches (items with the same material, VAO and render mode).
+
+    Items are uploaded once, when the draw list, models of the group or ModelMatrices layout change.
+    Every frame a compute pass transforms local bounds of every item by its node matrix from ModelMatrices,
+    tests them against the frustum planes and appends commands of visible items to the region of their batch
+    in the indirect buffer, counting them in the AtomicBuffer. Every batch is then drawn by a single
+    glMultiDrawElementsIndirectCount (GL 4.6), or by glMultiDrawElementsIndirect over the whole region, which
+    is cleared every frame, so commands of culled items draw nothing.
+
+    Items of models without matrix slots, of InstancedModel and custom meshes are drawn by the draw list itself,
+    not culled.
+    Call invalidate() after models of the group change other way than by LOD switching
+    """
+
+    # language=GLSL
+    _cull_shader = '''\
+#version 430 core
+
+layout (local_size_x = 64) in;
+
+struct Item {  // size: 48 bytes
+    vec3 center;  // local-space AABB, transformed by the node matrix
+    uint count;
+    vec3 extent;
+    uint first_index;
+    int base_vertex;
+    uint base_instance;  // node matrix index in ModelMatrices
+    uint batch;
+    uint batch_start;  // first command of the batch region
+};
+
+struct Command {  // DrawElementsIndirectCommand, size: 20 bytes
+    uint count;
+    uint instance_count;
+    uint first_index;
+    int base_vertex;
+    uint base_instance;
+};
+
+layout (std430) readonly buffer ModelMatrices {
+    mat4 model_matrices[];
+};
+
+layout (std430) readonly buffer CullItems {
+    Item items[];
+};
+
+layout (std430) writeonly buffer CullCommands {
+    Command commands[];
+};
+
+layout (std430) buffer CullCounters {
+    uint counters[];  // visible items of every batch
+};
+
+layout (location = 1) uniform vec4 planes[6];
+layout (location = 7) uniform uint item_count;
+
+void main() {
+    uint index = gl_GlobalInvocationID.x;
+    if (index >= item_count)
+        return;
+
+    Item item = items[index];
+    mat4 model = model_matrices[item.base_instance];
+    vec3 center = (model * vec4(item.center, 1)).xyz;
+    vec3 extent = abs(model[0].xyz) * item.extent.x + abs(model[1].xyz) * item.extent.y +
+                  abs(model[2].xyz) * item.extent.z;
+    for (int i = 0; i < 6; i++) {
+        if (dot(planes[i].xyz, center) + planes[i].w + dot(abs(planes[i].xyz), extent) < 0)
+            return;
+    }
+
+    uint slot = item.batch_start + atomicAdd(counters[item.batch], 1u);
+    commands[slot] = Command(item.count, 1u, item.first_index, item.base_vertex, item.base_instance);
+}
+'''
+
+    def __init__(self, draw_list: DrawList, get_models):
+        """
+        :param get_models: callable returning models to be drawn (e.g. the current LOD level of every component)
+        """
+        self.draw_list = draw_list
+        self.get_models = get_models
+        self.planes = ACCEPT_ALL_PLANES
+        self.model_matrices = None
+        self.program = None
+        self.items = None
+        self.commands = None
+        self.counters = None
+        self.binding_points = ()
+        self.batches = []  # (material slot, VAO id, render mode, first command, capacity)
+        self.direct_items = np.zeros(0, 'int64')  # drawn by the draw list
+        self.item_count = 0
+        self.indirect_count = None  # glMultiDrawElementsIndirectCount is available, checked on first draw
+        self.stats = {'items': 0, 'batches': 0, 'direct': 0, 'rebuilds': 0}
+        self._versions = None
+        self._models_changed = True
+
+    def invalidate(self):
+        self._models_changed = True
+
+    def select(self, planes, model_matrices):
+        """
+        :param planes: (6, 4) frustum planes (see FrustumCuller.get_planes()), None to draw everything
+        :param model_matrices: ModelMatrices dependency of the scene
+        """
+        self.planes = ACCEPT_ALL_PLANES if planes is None else planes
+        if model_matrices is not self.model_matrices:
+            self.model_matrices = model_matrices
+            self._models_changed = True
+        return self
+
+    def _create_gl_objects(self):
+        self.program = ComputeProgram(self._cull_shader)
+        self._set_planes = self.program.get_uniform_setter(1, '4fv', 6)
+        self._set_item_count = self.program.get_uniform_setter(7, '1ui')
+        self.items = SSBO(array_type='uint32', buffer_usage=GL_STATIC_DRAW)
+        self.commands = DrawIndirectBuffer()
+        self.counters = AtomicBuffer()
+        self.binding_points = tuple(UniformBufferBindingPointManager.reserve_point(self) for _ in range(3))
+        blocks = self.program.get_ssbo_block_indices()
+        for name, point in zip(('CullItems', 'CullCommands', 'CullCounters'), self.binding_points):
+            glShaderStorageBlockBinding(self.program.gl_program, blocks[name], point)
+
+    def rebuild(self):
+        draw_list = self.draw_list
+        if self.program is None:
+            self._create_gl_objects()
+        glShaderStorageBlockBinding(self.program.gl_program, self.program.get_ssbo_block_indices()['ModelMatrices'],
+                                    self.model_matrices.binding_point)
+        models = self.get_models()
+        items, _, missing = draw_list.gather(models, visible=False)
+        local_centers = np.concatenate([model.local_centers for model in models if model not in missing] or
+                                       [np.zeros((0, 3), 'float32')])
+        local_extents = np.concatenate([model.local_extents for model in models if model not in missing] or
+                                       [np.zeros((0, 3), 'float32')])
+        materials, vao_ids, modes, custom, model_indices, commands = draw_list.item_attributes(items)
+        slots = np.array([-1 if model.matrix_slot is None else model.matrix_slot for model in draw_list.models],
+                         'int64')[model_indices]
+        culled = ~custom & (slots >= 0) & (commands[:, 1] == 1)
+        self.direct_items = items[~culled]
+
+        # items of a batch are laid out together
+        order = np.lexsort((modes[culled], vao_ids[culled], materials[culled]))
+        culled = np.flatnonzero(culled)[order]
+        keys = np.stack((materials[culled], vao_ids[culled], modes[culled]), axis=1)
+        starts = np.flatnonzero(np.any(keys[1:] != keys[:-1], axis=1)) + 1 if len(culled) else np.zeros(0, 'int64')
+        starts = np.concatenate(([0], starts)) if len(culled) else starts
+        capacities = np.diff(np.append(starts, len(culled)))
+        self.batches = [(int(material), int(vao), int(mode), int(start), int(capacity))
+                        for (material, vao, mode), start, capacity in zip(keys[starts].tolist(), starts, capacities)]
+
+        data = np.zeros(len(culled), ITEM_DTYPE)
+        data['center'] = local_centers[culled]
+        data['extent'] = local_extents[culled]
+        commands = commands[culled]
+        data['count'] = commands[:, 0]
+        data['first_index'] = commands[:, 2]
+        data['base_vertex'] = commands[:, 3].view('int32')
+        data['base_instance'] = commands[:, 4] + slots[culled]
+        data['batch'] = np.repeat(np.arange(len(starts)), capacities)
+        data['batch_start'] = np.repeat(starts, capacities)
+        self.items.set_buf_data(data.view('uint32'), True)
+        self.commands.set_buf_data(np.zeros(max(len(culled), 1) * 5, 'uint32'), True)
+        self.counters.set_buf_data(np.zeros(max(len(starts), 1), 'uint32'), True)
+        self.item_count = len(culled)
+        self._versions = (draw_list.version, self.model_matrices.layout_version)
+        self._models_changed = False
+        self.stats['rebuilds'] += 1
+
+    def execute(self):
+        """
+        Culls and draws all items of the current models, current program and framebuffer are used
+        :return:
+          number of items submitted to culling and drawing
+        """
+        draw_list = self.draw_list
+        if self._models_changed or draw_list.dirty or \
+                self._versions != (draw_list.version, self.model_matrices.layout_version):
+            self.rebuild()
+        if self.indirect_count is None:
+            self.indirect_count = bool(glMultiDrawElementsIndirectCount)
+
+        if self.item_count:
+            program = GLState.bound.get('program')
+            for buffer, point in zip((self.items, self.commands, self.counters), self.binding_points):
+                GLState.bind_buffer_base(GL_SHADER_STORAGE_BUFFER, point, buffer.buffer_id)
+            GLState.bind_buffer(GL_ATOMIC_COUNTER_BUFFER, self.counters.buffer_id)
+            glClearBufferData(GL_ATOMIC_COUNTER_BUFFER, GL_R32UI, GL_RED_INTEGER, GL_UNSIGNED_INT, None)
+            if not self.indirect_count:
+                GLState.bind_buffer(GL_DRAW_INDIRECT_BUFFER, self.commands.buffer_id)
+                glClearBufferData(GL_DRAW_INDIRECT_BUFFER, GL_R32UI, GL_RED_INTEGER, GL_UNSIGNED_INT, None)
+            self.program.use()
+            self._set_planes(self.planes)
+            self._set_item_count(self.item_count)
+            self.program.dispatch(self.item_count, barrier=GL_COMMAND_BARRIER_BIT | GL_SHADER_STORAGE_BARRIER_BIT)
+            if program is not None:
+                GLState.use_program(program)
+
+            GLState.bind_buffer(GL_DRAW_INDIRECT_BUFFER, self.commands.buffer_id)
+            GLState.bind_buffer(GL_PARAMETER_BUFFER, self.counters.buffer_id)
+            bindings = draw_list.bindings
+            for batch, (material, vao, mode, start, capacity) in enumerate(self.batches):
+                for unit, bind_point, texture_id in bindings[material]:
+                    GLState.bind_texture(unit, bind_point, texture_id)
+                GLState.bind_vertex_array(vao)
+                if self.indirect_count:
+                    glMultiDrawElementsIndirectCount(mode, GL_UNSIGNED_INT, GLvoidp(start * INDIRECT_COMMAND_SIZE),
+                                                     batch * 4, capacity, 0)
+                else:
+                    glMultiDrawElementsIndirect(mode, GL_UNSIGNED_INT, GLvoidp(start * INDIRECT_COMMAND_SIZE),
+                                                capacity, 0)
+        if len(self.direct_items):
+            draw_list.submit(self.direct_items)
+        self.stats['items'] = self.item_count
+        self.stats['batches'] = len(self.batches)
+        self.stats['direct'] = len(self.direct_items)
+        return self.item_count + len(self.direct_items)
+
+    def read_counters(self):
+        # visible items of every batch in the last frame, waits for GPU
+        self.counters.download()
+        return self.counters.get_buffer_data()[:len(self.batches)].copy()
@@ -0,0 +1,233 @@
+import numpy as np
+from OpenGL.GL import *
+
+from ..gl.compute import ComputeProgram
+from ..gl.shader_buffer import SSBO
+from ..gl.texture import Texture2D
+
+
+class DepthPyramidTexture(Texture2D):
+    """
+    Single-channel float texture with a full mip chain, every texel holds the farthest depth of the area it covers
+    """
+
+    def __init__(self, width, height):
+        super(DepthPyramidTexture, self).__init__(use=True, interpolation='nearest', border='edge')
+        glTexParameteri(self.BIND_POINT, GL_TEXTURE_MIN_FILTER, GL_NEAREST_MIPMAP_NEAREST)
+        self.levels = 0
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        self.use()
+        self.width, self.height = width, height
+        self.levels = max(width, height).bit_length()  # down to 1x1
+        for level in range(self.levels):
+            glTexImage2D(self.BIND_POINT, level, GL_R32F, max(width >> level, 1), max(height >> level, 1), 0,
+                         GL_RED, GL_FLOAT, None)
+        glTexParameteri(self.BIND_POINT, GL_TEXTURE_MAX_LEVEL, self.levels - 1)
+
+    def get_level_size(self, level):
+        return max(self.width >> level, 1), max(self.height >> level, 1)
+
+
+class HiZOcclusionCuller:
+    """
+    Hierarchical-Z occlusion culling.
+    At the start of a frame depth buffer still contains the previous frame, so it is reduced into a depth pyramid
+    by a compute pass. World-space boxes of RenderCompounds that passed the frustum test are then tested against
+    the pyramid on GPU, and occluded ones are removed from `Model.visible` masks.
+    Objects that appear from behind occluders can be missed for one frame, as the depth is one frame old.
+    Set instance as `scene.culler.occlusion` to enable it
+    """
+
+    # language=GLSL
+    _reduce_shader = '''\
+#version 430 core
+
+layout (local_size_x = 8, local_size_y = 8) in;
+
+layout (binding = 0) uniform sampler2D depth_map;
+layout (binding = 0, r32f) uniform readonly image2D src_level;
+layout (binding = 1, r32f) uniform writeonly image2D dst_level;
+layout (location = 1) uniform ivec2 src_size;
+layout (location = 2) uniform bool from_depth;
+
+float fetch(ivec2 coord) {
+    coord = min(coord, src_size - 1);
+    return from_depth ? texelFetch(depth_map, coord, 0).r : imageLoad(src_level, coord).r;
+}
+
+void main() {
+    ivec2 dst_size = imageSize(dst_level);
+    ivec2 dst_coord = ivec2(gl_GlobalInvocationID.xy);
+    if (any(greaterThanEqual(dst_coord, dst_size)))
+        return;
+
+    ivec2 src_coord = dst_coord * 2;
+    float depth = max(max(fetch(src_coord), fetch(src_coord + ivec2(1, 0))),
+                      max(fetch(src_coord + ivec2(0, 1)), fetch(src_coord + ivec2(1, 1))));
+
+    // last row and column of odd-sized level are merged into the last texel
+    bool odd_x = (src_size.x & 1) != 0 && dst_coord.x == dst_size.x - 1;
+    bool odd_y = (src_size.y & 1) != 0 && dst_coord.y == dst_size.y - 1;
+    if (odd_x)
+        depth = max(depth, max(fetch(src_coord + ivec2(2, 0)), fetch(src_coord + ivec2(2, 1))));
+    if (odd_y)
+        depth = max(depth, max(fetch(src_coord + ivec2(0, 2)), fetch(src_coord + ivec2(1, 2))));
+    if (odd_x && odd_y)
+        depth = max(depth, fetch(src_coord + ivec2(2, 2)));
+
+    imageStore(dst_level, dst_coord, vec4(depth));
+}
+'''
+
+    # language=GLSL
+    _cull_shader = '''\
+#version 430 core
+
+layout (local_size_x = 64) in;
+
+struct Bounds {  // size: 32 bytes
+    vec4 center;
+    vec4 extent;
+};
+
+layout (std430, binding = 0) readonly buffer BoundsBuffer {
+    Bounds bounds[];
+};
+
+layout (std430, binding = 1) writeonly buffer VisibilityBuffer {
+    uint visibility[];
+};
+
+layout (binding = 0) uniform sampler2D depth_pyramid;
+layout (location = 1) uniform mat4 view_projection;
+layout (location = 2) uniform uint object_count;
+layout (location = 3) uniform int max_level;
+
+void main() {
+    uint index = gl_GlobalInvocationID.x;
+    if (index >= object_count)
+        return;
+
+    vec3 center = bounds[index].center.xyz;
+    vec3 extent = bounds[index].extent.xyz;
+    vec3 ndc_min = vec3(1e30);
+    vec3 ndc_max = vec3(-1e30);
+    for (int i = 0; i < 8; i++) {
+        vec3 corner_sign = vec3((i & 1) != 0 ? 1 : -1, (i & 2) != 0 ? 1 : -1, (i & 4) != 0 ? 1 : -1);
+        vec4 clip = view_projection * vec4(center + extent * corner_sign, 1);
+        if (clip.w <= 0) {
+            // box intersects the camera plane
+            visibility[index] = 1u;
+            return;
+        }
+        vec3 ndc = clip.xyz / clip.w;
+        ndc_min = min(ndc_min, ndc);
+        ndc_max = max(ndc_max, ndc);
+    }
+
+    vec2 uv_min = clamp(ndc_min.xy * 0.5 + 0.5, 0, 1);
+    vec2 uv_max = clamp(ndc_max.xy * 0.5 + 0.5, 0, 1);
+    float nearest_depth = ndc_min.z * 0.5 + 0.5;
+
+    // selecting level where the box covers at most 2x2 texels
+    vec2 rect = (uv_max - uv_min) * vec2(textureSize(depth_pyramid, 0));
+    int level = clamp(int(ceil(log2(max(max(rect.x, rect.y), 1)))), 0, max_level);
+    ivec2 size = textureSize(depth_pyramid, level);
+    ivec2 lo = min(ivec2(uv_min * vec2(size)), size - 1);
+    ivec2 hi = min(ivec2(uv_max * vec2(size)), size - 1);
+
+    float depth = max(max(texelFetch(depth_pyramid, lo, level).r,
+                          texelFetch(depth_pyramid, ivec2(hi.x, lo.y), level).r),
+                      max(texelFetch(depth_pyramid, ivec2(lo.x, hi.y), level).r,
+                          texelFetch(depth_pyramid, hi, level).r));
+    visibility[index] = nearest_depth <= depth ? 1u : 0u;
+}
+'''
+
+    def __init__(self, depth_texture: Texture2D):
+        self.enabled = True
+        self.depth_texture = depth_texture
+        self.pyramid = DepthPyramidTexture(max(depth_texture.width >> 1, 1), max(depth_texture.height >> 1, 1))
+        self.reduce_program = ComputeProgram(self._reduce_shader)
+        self.cull_program = ComputeProgram(self._cull_shader)
+        self.bounds_buffer = SSBO(buffer_usage=GL_STREAM_DRAW)
+        self.visibility_buffer = SSBO(array_type='uint32', buffer_usage=GL_STREAM_READ)
+        self.view_projection = np.identity(4, 'float32')
+        self._depth_ready = False  # depth buffer holds nothing before the first frame and after resize
+        self._pyramid_ready = False
+
+        self._set_src_size = self.reduce_program.get_uniform_setter(1, '2i')
+        self._set_from_depth = self.reduce_program.get_uniform_setter(2, '1i')
+        self._set_view_projection = self.cull_program.get_uniform_setter(1, 'Matrix4fv', 1, GL_FALSE)
+        self._set_object_count = self.cull_program.get_uniform_setter(2, '1ui')
+        self._set_max_level = self.cull_program.get_uniform_setter(3, '1i')
+
+    def update(self, view_projection):
+        # called once per frame before drawing, view_projection is in OpenGL memory layout
+        self.view_projection[:] = view_projection
+        width, height = max(self.depth_texture.width >> 1, 1), max(self.depth_texture.height >> 1, 1)
+        if (width, height) != (self.pyramid.width, self.pyramid.height):
+            self.pyramid.resize(width, height)
+            self._depth_ready = False
+
+        if self._depth_ready:
+            self.build_pyramid()
+        self._pyramid_ready = self._depth_ready
+        self._depth_ready = True
+
+    def build_pyramid(self):
+        self.reduce_program.use()
+        self.depth_texture.bind_to_block(0)
+        self._set_from_depth(1)
+        self._set_src_size(self.depth_texture.width, self.depth_texture.height)
+        for level in range(self.pyramid.levels):
+            if level:
+                self._set_from_depth(0)
+                self._set_src_size(*self.pyramid.get_level_size(level - 1))
+                glBindImageTexture(0, self.pyramid.sampler_id, level - 1, GL_FALSE, 0, GL_READ_ONLY, GL_R32F)
+            glBindImageTexture(1, self.pyramid.sampler_id, level, GL_FALSE, 0, GL_WRITE_ONLY, GL_R32F)
+            self.reduce_program.dispatch(*self.pyramid.get_level_size(level),
+                                         barrier=GL_SHADER_IMAGE_ACCESS_BARRIER_BIT)
+        glMemoryBarrier(GL_TEXTURE_FETCH_BARRIER_BIT)
+
+    def cull_models(self, models):
+        """
+        Tests visible RenderCompounds of models against the depth pyramid and updates `Model.visible` masks.
+        Results are read back synchronously
+        :return:
+          number of occluded RenderCompounds
+        """
+        if not self.enabled or not self._pyramid_ready:
+            return 0
+        indices = [np.flatnonzero(model.visible) for model in models]
+        count = sum(len(item) for item in indices)
+        if not count:
+            return 0
+
+        bounds = np.zeros((count, 2, 4), 'float32')
+        offset = 0
+        for model, item in zip(models, indices):
+            bounds[offset:offset + len(item), 0, :3] = model.world_centers[item]
+            bounds[offset:offset + len(item), 1, :3] = model.world_extents[item]
+            offset += len(item)
+        self.bounds_buffer.set_buf_data(bounds.reshape(-1), upload=True)
+        self.visibility_buffer.set_buf_data(np.ones(count, 'uint32'), upload=True)
+        self.bounds_buffer.bind_to_block(0)
+        self.visibility_buffer.bind_to_block(1)
+
+        self.cull_program.use()
+        self.pyramid.bind_to_block(0)
+        self._set_view_projection(self.view_projection)
+        self._set_object_count(count)
+        self._set_max_level(self.pyramid.levels - 1)
+        self.cull_program.dispatch(count, barrier=GL_BUFFER_UPDATE_BARRIER_BIT)
+
+        self.visibility_buffer.download()
+        visibility = self.visibility_buffer.get_buffer_data().astype('bool')
+        offset = 0
+        for model, item in zip(models, indices):
+            model.visible[item] = visibility[offset:offset + len(item)]
+            offset += len(item)
+        return count - int(np.count_nonzero(visibility))
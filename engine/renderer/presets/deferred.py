@@ -1,4 +1,4 @@
-from OpenGL.GL import GL_RGBA32F, GL_RGB32F, GL_RGB, GL_RGBA, GL_FLOAT, GL_RGB16F, GL_RGBA16F, glEnable, glDisable, \
+from OpenGL.GL import GL_RGBA32F, GL_RGB32F, GL_RGB, GL_RGBA, GL_FLOAT, GL_RGB16F, GL_RGBA16F, \
     GL_DEPTH_TEST, GL_INT, GL_RGB8_SNORM, GL_CULL_FACE
 
 from ...fx.shader.loader import Effect, Builder
@@ -62,6 +62,8 @@ class GBuffer3Int(GBuffer):
 
 
 class GeometryPassRenderer(BaseRenderer):
+    capabilities = (GL_DEPTH_TEST, GL_CULL_FACE)
+
     def __init__(self):
         shader = Effect.from_file(get_rel_path(__file__, '../../fx/shader/fx/template/base'))
         shader.insert(Effect.from_file(get_rel_path(__file__, '../../fx/shader/fx/transformation/mvp')))
@@ -70,11 +72,7 @@ class GeometryPassRenderer(BaseRenderer):
         self.shader_prog = ShaderProgram(builder.vert_str, builder.frag_str)
     
     def draw(self, data, out_fbo):
-        glEnable(GL_DEPTH_TEST)
-        glEnable(GL_CULL_FACE)
         super(GeometryPassRenderer, self).draw(out_fbo, data)
-        glDisable(GL_CULL_FACE)
-        glDisable(GL_DEPTH_TEST)
 
 
 class LightPassRenderer(SecondPassRenderer):
@@ -5,6 +5,7 @@ from glm import vec2
 from ....model.model import Material, RenderCompound
 from ....gl.framebuffer import FrameBuffer, FB_NONE
 from ....gl.shader import ShaderProgram
+from ....gl.state import GLState
 from ...base import SecondPassRenderer
 from ...util import sample_vertex_shader, gen_screen_mesh
 
@@ -150,6 +151,7 @@ class SeparableConvolutionPass(SecondPassRenderer):
 
     def draw(self, out_fbo, data) -> int:
         out_fbo.use()
+        GLState.set_capabilities(self.capabilities)
         self.shader_prog.use()
         self.direction_setter(*self.direction)
         i = 0
@@ -1,4 +1,4 @@
-from OpenGL.GL import GL_DEPTH_TEST, GL_CULL_FACE, glEnable, glDisable
+from OpenGL.GL import GL_DEPTH_TEST, GL_CULL_FACE
 
 from ....gl import ShaderProgram
 from ...base import BaseRenderer
@@ -7,7 +7,7 @@ from ...base import BaseRenderer
 class GeometryPassBase(BaseRenderer):
     _vert_shader = 'example that causes compilation error'
     _frag_shader = 'example that causes compilation error'
-    _effects_to_enable = (GL_DEPTH_TEST, GL_CULL_FACE)
+    capabilities = (GL_DEPTH_TEST, GL_CULL_FACE)
 
     def __init__(self):
         self._make_shader()
@@ -15,14 +15,6 @@ class GeometryPassBase(BaseRenderer):
     def _make_shader(self):
         self.shader_prog = ShaderProgram(self._vert_shader, self._frag_shader, use=True)
 
-    def draw(self, out_fbo, data) -> int:
-        for effect in self._effects_to_enable:
-            glEnable(effect)
-        result = super(GeometryPassBase, self).draw(out_fbo, data)
-        for effect in self._effects_to_enable:
-            glDisable(effect)
-        return result
-
 
 class GeometryPassDefault(GeometryPassBase):
     # language=GLSL
@@ -32,21 +24,25 @@ class GeometryPassDefault(GeometryPassBase):
 layout (location = 0) in vec3 pos_a;
 layout (location = 1) in vec3 normal_a;
 layout (location = 2) in vec2 uv_coord_a;
+layout (location = 15) in uint draw_index_a;  // index in ModelMatrices
 
 out vec3 pos;
 out vec3 normal;
 out vec2 uv;
 
 layout (std140, binding = 0) uniform MVPMatrices {
-    mat4 model;
     mat4 view;
     mat4 projection;
     mat4 view_projection;
-    mat4 model_view_projection;
+};
+
+layout (std430, binding = 1) readonly buffer ModelMatrices {
+    mat4 model_matrices[];
 };
 
 void main() {
-    gl_Position = model_view_projection * vec4(pos_a.xyz, 1.0);
+    mat4 model = model_matrices[draw_index_a];
+    gl_Position = view_projection * model * vec4(pos_a.xyz, 1.0);
 
     pos = (model * vec4(pos_a, 1)).xyz;
     normal = normal_a * transpose(inverse(mat3(model)));
@@ -0,0 +1,100 @@
+import numpy as np
+
+from .draw_list import DrawList
+
+DIGIT_BITS = 16
+KEY_FIELD_MAX = (1 << DIGIT_BITS) - 1
+
+
+def radix_argsort(keys, bits=64):
+    """
+    LSD radix sort of unsigned integer keys by 16-bit digits
+    (stable sort of uint16 array is a counting sort in numpy)
+    :param bits: number of low bits used by the keys
+    :return:
+      indices that sort the keys
+    """
+    order = np.arange(len(keys))
+    for shift in range(0, bits, DIGIT_BITS):
+        digits = (keys[order] >> np.uint64(shift)).astype('uint16')
+        order = order[np.argsort(digits, kind='stable')]
+    return order
+
+
+class RenderQueue:
+    """
+    Submits visible items of a DrawList sorted by 48-bit keys: material, mesh (VAO) and depth, from the highest bits.
+    So items with the same textures and VAO are drawn together, and front to back within the same state,
+    letting early depth test reject hidden fragments.
+    Pass and program are not a part of the key, as the whole queue is drawn by a single renderer
+    (every CachedComponentsGroup has its own one).
+
+    Sorting mixes items of different nodes, so it is worth it when node matrices are taken from ModelMatrices
+    and nothing handles NodeDrawEvent for every node
+    """
+
+    def __init__(self, draw_list: DrawList, sort=True, depth_sort=True):
+        self.draw_list = draw_list
+        self.sort = sort
+        self.depth_sort = depth_sort
+        self.selected = []
+        self.view_projection = None
+        self.state_keys = np.zeros(0, 'uint64')  # material and mesh part of the key of every draw list item
+        self._version = None
+
+    def select(self, models, view_projection=None):
+        """
+        :param models: models to be drawn
+        :param view_projection: camera matrix in OpenGL memory layout, items are not sorted by depth if None
+        """
+        self.selected = models
+        self.view_projection = view_projection
+        return self
+
+    def _build_state_keys(self):
+        draw_list = self.draw_list
+        vao_ranks = np.unique(np.array(draw_list.vao_ids, 'int64'), return_inverse=True)[1].reshape(-1)
+        materials = np.minimum(np.array(draw_list.material_slots, 'uint64'), KEY_FIELD_MAX)
+        meshes = np.minimum(vao_ranks.astype('uint64'), KEY_FIELD_MAX)
+        self.state_keys = (materials << np.uint64(DIGIT_BITS) | meshes) << np.uint64(DIGIT_BITS)
+        self._version = draw_list.version
+
+    def get_depth_keys(self, centers):
+        # clip-space w (distance along the view direction) of item centers, quantized to 16 bits
+        depth = centers @ self.view_projection[:3, 3] + self.view_projection[3, 3]
+        near, far = depth.min(), depth.max()
+        scale = KEY_FIELD_MAX / max(far - near, 1e-6)
+        return ((depth - near) * scale).astype('uint64')
+
+    def get_order(self):
+        """
+        :return:
+          (sorted item indices of the draw list, models not in the draw list)
+        """
+        depth_sort = self.depth_sort and self.view_projection is not None
+        items, centers, missing = self.draw_list.gather(self.selected, centers=depth_sort)
+        if not self.sort or len(items) < 2:
+            return items, missing
+        if self._version != self.draw_list.version:
+            self._build_state_keys()
+        keys = self.state_keys[items]
+        if depth_sort:
+            keys |= self.get_depth_keys(centers)
+        return items[radix_argsort(keys, DIGIT_BITS * 3)], missing
+
+    def execute(self):
+        """
+        Draws visible items of selected models in sorted order, current program and framebuffer are used
+        :return:
+          number of drawn items
+        """
+        items, missing = self.get_order()
+        drawn = self.draw_list.submit(items)
+        for model in missing:
+            model.draw()
+        return drawn
+
+    @property
+    def stats(self):
+        # state changes of the last execute()
+        return self.draw_list.stats
@@ -7,12 +7,11 @@ from .uniformed import UniformedRenderer
 
 
 class SceneRenderer(BaseEventReceiver):
-    # todo remove scene change event (accept events only from specific scene)
     _event_subscriptions_ = (TickEvent, SceneChangeEvent)
 
     def __init__(self, scene, uniformed: UniformedRenderer):
         self.scene = scene
-        super(SceneRenderer, self).__init__()
+        super(SceneRenderer, self).__init__(scene.event_manager)
         self.uniformed = uniformed
         self.uniformed.process_deps(scene)
 
@@ -32,9 +31,10 @@ class SceneRenderer(BaseEventReceiver):
     def meshes(self):
         return self.raw.meshes
 
-    def on_event(self, evt):
-        if isinstance(evt, TickEvent) or isinstance(evt, SceneChangeEvent):
-            self.raw.shader_prog.use()
-            for name, setter in self.uniformed.setters.items():
-                setter, np_type = setter
-                setter(1, np.array(self.scene.static_data[name]), np_type)  # todo get count from numpy array length
+    def on_tick(self, _evt):
+        self.raw.shader_prog.use()
+        for name, setter in self.uniformed.setters.items():
+            setter, np_type = setter
+            setter(1, np.array(self.scene.static_data[name]), np_type)  # todo get count from numpy array length
+
+    on_scene_change = on_tick
@@ -1,19 +1,37 @@
-from ..event.base import MainEventManager
+from ..event.base import PRIORITY_BULK
 from ..event.scene import ComponentEvent
 
-ComponentAddEvent = ComponentEvent.create_meta('ComponentAddEvent')
-ComponentUpdateEvent = ComponentEvent.create_meta('ComponentUpdateEvent')
+# objects entering or leaving the scene are registered by scene systems within the event time budget
+ComponentAddEvent = ComponentEvent.create_meta('ComponentAddEvent', priority=PRIORITY_BULK)
+ComponentUpdateEvent = ComponentEvent.create_meta('ComponentUpdateEvent', coalesce_by='component')
+# posted when component leaves the scene (removed from its object, object detached or deactivated)
+ComponentRemoveEvent = ComponentEvent.create_meta('ComponentRemoveEvent', priority=PRIORITY_BULK)
+
+
+def get_slots(cls):
+    # all slot names of the class and its bases
+    return [name for klass in cls.__mro__ for name in getattr(klass, '__slots__', ())
+            if name not in ('__dict__', '__weakref__')]
 
 
 class Component:
+    # engine components are slotted, subclasses without __slots__ get __dict__ and can have any attributes
+    __slots__ = ('game_object', 'spatial_proxy')
+
     def __init__(self, game_object=None):
         self.game_object = game_object
+        self.spatial_proxy = None  # leaf of the scene spatial index, set by the scene if get_bounds() is implemented
 
     @property
     def copy(self):
-        copy_obj = Component()
-        copy_obj.__dict__ = self.__dict__
+        copy_obj = self.__class__.__new__(self.__class__)
+        for name in get_slots(self.__class__):
+            if hasattr(self, name):
+                setattr(copy_obj, name, getattr(self, name))
+        if hasattr(self, '__dict__'):
+            copy_obj.__dict__.update(self.__dict__)
         copy_obj.game_object = None
+        copy_obj.spatial_proxy = None
         copy_obj.on_copied()
         return copy_obj
 
@@ -23,15 +41,34 @@ class Component:
     def update(self):
         pass
 
+    def get_bounds(self):
+        """
+        Components with a location in the world return their (min, max) world-space box here
+        to be placed into the scene spatial index
+        """
+        return None
+
+    def refit_bounds(self):
+        # must be called from update() of components that implement get_bounds()
+        if self.spatial_proxy is not None:
+            self.game_object.scene.spatial_index.move(self.spatial_proxy, *self.get_bounds())
+
     def on_attach(self, game_object):
         self.game_object = game_object
-        MainEventManager.add_event(ComponentAddEvent(self))
+        # components of detached or inactive objects are announced when object enters the scene
+        if game_object.scene is not None and game_object.active_in_hierarchy:
+            game_object.scene.event_manager.add_event(ComponentAddEvent(self))
         self.update()
 
+    def on_detach(self):
+        if self.game_object.scene is not None and self.game_object.active_in_hierarchy:
+            self.game_object.scene.event_manager.add_event(ComponentRemoveEvent(self))
+        self.game_object = None
+
 
 class CollideComponent(Component):
-    pass
+    __slots__ = ()
 
 
 class SoundComponent(Component):
-    pass
+    __slots__ = ()
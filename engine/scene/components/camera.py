@@ -1,18 +1,21 @@
-from glm import pi as pi_func, vec3, normalize, clamp, acos, asin, cross, rotate, mat4, vec4, cos, sin, radians
+from glm import pi as pi_func, vec3, normalize, clamp, acos, asin, cross, rotate, mat4, vec4, cos, sin, radians, \
+    lookAt, perspective
 
-from ...event.base import MainEventManager
+from ...event.base import PRIORITY_CRITICAL
 from ..component import ComponentUpdateEvent, Component
 
 pi = pi_func()
-CameraDataUpdateEvent = ComponentUpdateEvent.create_meta('CameraDataUpdateEvent')
+CameraDataUpdateEvent = ComponentUpdateEvent.create_meta('CameraDataUpdateEvent', priority=PRIORITY_CRITICAL)
 
 
 class CameraComponent(Component):
-    def __init__(self, game_object=None, render_target=None, render_distance=10000, activate=False, fov=0.0):
+    def __init__(self, game_object=None, render_target=None, render_distance=10000, activate=False, fov=0.0,
+                 near_plane=0.1):
         super(CameraComponent, self).__init__(game_object)
         self.render_target = render_target
         self.fov = radians(fov)  # radians
         self.render_distance = render_distance
+        self.near_plane = near_plane
         self.activate = activate
     
     def on_attach(self, game_object):
@@ -27,5 +30,14 @@ class CameraComponent(Component):
     def set_render_target(self, render_target):
         self.render_target = render_target
 
+    def get_view_matrix(self):
+        obj = self.game_object
+        return lookAt(obj.abs_pos, obj.abs_pos + obj.direction, obj._get_upward_vector())
+
+    def get_projection_matrix(self):
+        # it's a perspective matrix only todo add other matrices
+        return perspective(self.fov, self.render_target.width / self.render_target.height,
+                           self.near_plane, self.render_distance)
+
     def update(self):
-        MainEventManager.add_event(CameraDataUpdateEvent(self))
+        self.game_object.event_manager.add_event(CameraDataUpdateEvent(self))
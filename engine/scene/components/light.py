@@ -1,18 +1,30 @@
 from glm import vec3, radians, normalize
 
 from ..component import Component, ComponentUpdateEvent
-from ...event.base import MainEventManager
 
 LightDataUpdateEvent = ComponentUpdateEvent.create_meta('LightDataUpdateEvent')
 
 
+def _influence_bounds(points, radius):
+    # box around points expanded by light influence radius, None for lights affecting everything
+    if radius is None:
+        return None
+    return [min(point[i] for point in points) - radius for i in range(3)], \
+        [max(point[i] for point in points) + radius for i in range(3)]
+
+
 class LightComponent(Component):
-    def __init__(self, game_object=None, diffuse_color=vec3(1), specular_color=None):
+    __slots__ = ('_diffuse_color', '_specular_color', 'radius')
+
+    def __init__(self, game_object=None, diffuse_color=vec3(1), specular_color=None, radius=None):
         if specular_color is None:
             specular_color = diffuse_color
         super(LightComponent, self).__init__(game_object)
         self._diffuse_color = diffuse_color
         self._specular_color = specular_color
+        # influence radius used by scene light queries, None for lights affecting everything.
+        # Set before the light enters the scene
+        self.radius = radius
 
     @property
     def diffuse_color(self):
@@ -35,12 +47,17 @@ class LightComponent(Component):
             self.update()
 
     def update(self):
-        # raise Exception()
-        MainEventManager.add_event(LightDataUpdateEvent(self))
+        self.refit_bounds()
+        self.game_object.event_manager.add_event(LightDataUpdateEvent(self))
+
+    def get_bounds(self):
+        return _influence_bounds((self.game_object.abs_pos, ), self.radius)
 
 
 class SpotLightComponent(LightComponent):
     # todo add linear and quadratic coefficients
+    __slots__ = ('_cut_off', '_outer_cut_off', '_direction')
+
     def __init__(self, game_object=None, cut_off=0, outer_cut_off=None, direction=vec3(0), *args, **kwargs):
         if outer_cut_off is None:
             outer_cut_off = cut_off * 1.1
@@ -81,14 +98,25 @@ class SpotLightComponent(LightComponent):
 
 
 class AreaLightComponent(Component):
+    __slots__ = ('_color', '_intensity', '_points', 'radius')
+
     def __init__(self, game_object=None, color=(1, 1, 1), intensity=1, points=(vec3(0, 0, 0),
                                                                                vec3(1, 0, 0),
                                                                                vec3(0, 0, 1),
-                                                                               vec3(1, 0, 1))):
+                                                                               vec3(1, 0, 1)), radius=None):
         super().__init__(game_object)
         self._color = vec3(color)
         self._intensity = intensity
         self._points = points
+        # influence radius used by scene light queries, None for lights affecting everything.
+        # Set before the light enters the scene
+        self.radius = radius
+
+    def update(self):
+        self.refit_bounds()
+
+    def get_bounds(self):
+        return _influence_bounds(self._points, self.radius)
 
     @property
     def intensity(self):
@@ -3,25 +3,94 @@ from typing import Union, List
 import glm
 
 from ...renderer.chain import RenderChain
-from ...model.model import UnfinishedModel, Model
+from ...renderer.draw_list import DrawList
+from ...renderer.render_queue import RenderQueue
+from ...renderer.gpu_culling import GPUCullingQueue
+from ...model.model import UnfinishedModel, Model, LodModel, InstancedModel
 from ..component import Component
 
 
 class RenderComponent(Component):
-    def __init__(self, game_object=None, model: Union[UnfinishedModel, Model] = None, renderer: RenderChain = None):
+    __slots__ = ('lod', 'model', 'transform', 'renderer', 'instanced', 'instance_index')
+
+    def __init__(self, game_object=None, model: Union[UnfinishedModel, Model, LodModel, list] = None,
+                 renderer: RenderChain = None):
+        """
+        :param model: a model or its LOD variants (LodModel or a list of models, the most detailed first)
+        """
         super(RenderComponent, self).__init__(game_object)
-        if isinstance(model, UnfinishedModel):
+        if isinstance(model, (list, tuple)):
+            model = LodModel(model)
+        self.lod = None
+        if isinstance(model, LodModel):
+            self.lod = model.format(renderer.attribute_data, renderer.sampler_data)
+            model = self.lod.current
+        elif isinstance(model, UnfinishedModel):
             print('attrib data', renderer.attribute_data)
             model = model.format(renderer.attribute_data, renderer.sampler_data)
         self.model = model
         self.transform = TransformationProcessor(self)
         self.renderer = renderer
+        # InstancedModel drawing the component with others sharing its model, set by CachedComponentsGroup
+        self.instanced = None
+        self.instance_index = None
+
+    def on_copied(self):
+        # the copy shares the model and is drawn as its instance in the scene
+        self.instanced = self.instance_index = None
 
     def update(self):
-        self.model.set_offset(self.game_object.abs_pos)
+        if self.instanced is not None:
+            self.instanced.set_instance_matrix(self.instance_index, self.game_object.world_matrix)
+        else:
+            (self.lod or self.model).set_world_matrix(self.game_object.world_matrix)
+        self.refit_bounds()
+
+    def select_lod(self, camera_pos, projection_scale):
+        # switches drawn model to LOD level matching current screen size, returns True if it was switched
+        if self.lod.select_level(self.lod.get_screen_size(camera_pos, projection_scale)):
+            self.model = self.lod.current
+            self.refit_bounds()
+            return True
+        return False
+
+    def get_models(self):
+        if self.instanced is not None:
+            return self.instanced,
+        return self.lod.models if self.lod is not None else (self.model, )
 
-    def set_model(self, model):
+    def get_drawn_model(self):
+        # current LOD level or InstancedModel shared with other components
+        return self.model if self.instanced is None else self.instanced
+
+    def get_bounds(self):
+        if self.instanced is not None:
+            return self.instanced.get_instance_bounds(self.instance_index)
+        return self.model.get_world_bounds()
+
+    def set_model(self, model: Union[Model, LodModel, list]):
+        """
+        :param model: a finished model or its LOD variants, see __init__()
+        """
+        if self.instanced is not None:
+            moved = self.instanced.remove_instance(self.instance_index)
+            if moved is not None:
+                moved.instance_index = self.instance_index
+            self.instanced = self.instance_index = None
+        if isinstance(model, (list, tuple)):
+            model = LodModel(model)
+        event_manager = self.model.event_manager
+        self.lod = None
+        if isinstance(model, LodModel):
+            self.lod = model.format(self.renderer.attribute_data, self.renderer.sampler_data)
+            model = self.lod.current
         self.model = model
+        for level in self.get_models():
+            level.event_manager = event_manager
+        if self.game_object is not None:
+            self.update()
+            if self.game_object.scene is not None:
+                self.game_object.scene.update_render_model(self)
 
     def set_renderer(self, renderer):
         self.renderer = renderer
@@ -30,17 +99,64 @@ class RenderComponent(Component):
         self.renderer.first_pass(self.model)
 
 
+class InstancedRenderComponent(RenderComponent):
+    """
+    Draws a model at many places (foliage, crowds) by instanced draw calls of its InstancedModel.
+    Instance matrices are placement relative to the game object, changing them does not move the object
+    """
+    __slots__ = ()
+
+    def __init__(self, game_object=None, model: Union[UnfinishedModel, Model] = None, renderer: RenderChain = None,
+                 instance_matrices=()):
+        """
+        :param instance_matrices: N*4*4 array in OpenGL memory layout
+        """
+        if isinstance(model, (list, tuple, LodModel)):
+            raise TypeError('Instanced models have no LOD levels')
+        super(InstancedRenderComponent, self).__init__(game_object, model, renderer)
+        self.model = InstancedModel(self.model, instance_matrices)
+
+    def on_copied(self):
+        super(InstancedRenderComponent, self).on_copied()
+        self.model = InstancedModel(self.model.source, self.model.instance_matrices)
+
+    def set_instances(self, matrices):
+        self.model.set_instances(matrices)
+        self.refit_bounds()
+
+    def add_instance(self, matrix):
+        """
+        :return:
+          index of the new instance
+        """
+        index = self.model.add_instance(matrix)
+        self.refit_bounds()
+        return index
+
+    def remove_instance(self, index):
+        # the last instance takes index of the removed one
+        self.model.remove_instance(index)
+        self.refit_bounds()
+
+    def set_instance_matrix(self, index, matrix):
+        self.model.set_instance_matrix(index, matrix)
+        self.refit_bounds()
+
+
 class TransformationProcessor:
     """
     This class applies transformation to already transformed data
     If you want to undo transformation - drop the matrix or apply reverse transform
     """
 
+    __slots__ = ('component', )
+
     def __init__(self, component):
         self.component = component
 
     def _add_transformation(self, func):
-        self.component.model.set_model_matrix(func(self.component.model.raw_matrix))
+        for model in self.component.get_models():
+            model.set_model_matrix(func(model.raw_matrix))
         return self.component
 
     def scale(self, scale):
@@ -57,8 +173,109 @@ class TransformationProcessor:
 
 
 class CachedComponentsGroup(list):
-    def draw(self):
+    # components drawn by the same renderer
+    def __init__(self, *args):
+        super(CachedComponentsGroup, self).__init__(*args)
+        self.draw_list = DrawList(self.get_models)  # compiled on first draw and when models change
+        self.render_queue = RenderQueue(self.draw_list)  # sorts items of the draw list every frame
+        self.gpu_queue = None  # GPUCullingQueue, created on first draw_gpu()
+        self.instanced = {}  # id(model): InstancedModel drawing all components of the group sharing the model
+        self._instancing_dirty = False
+
+    def get_models(self):
+        if self._instancing_dirty:
+            self.update_instancing()
+        return list({id(model): model for component in self for model in component.get_models()}.values())
+
+    def get_current_models(self):
+        # models drawn now (current LOD level of every component)
+        if self._instancing_dirty:
+            self.update_instancing()
+        return list({id(model): model for model in (component.get_drawn_model() for component in self)}.values())
+
+    def add_component(self, component):
+        self.append(component)
+        self.invalidate()
+
+    def remove_component(self, component):
+        if component in self:
+            self.remove(component)
+            # its instance is removed from InstancedModel by update_instancing()
+            component.instanced = component.instance_index = None
+            self.invalidate()
+
+    def update_instancing(self):
+        """
+        Components sharing a model (without LOD levels) are drawn as instances of one InstancedModel
+        if the renderer takes node matrices from ModelMatrices, called once after components of the group change
+        """
+        self._instancing_dirty = False
+        instancing = bool(self) and self[0].renderer.has_dependency('ModelMatrices')
+        users = {}  # id(model): components
+        for component in self:
+            if component.lod is None and not isinstance(component, InstancedRenderComponent):
+                users.setdefault(id(component.model), []).append(component)
+        instanced = {}
+        for key, components in users.items():
+            if len(components) == 1 or not instancing:
+                # the only user left (or every user without ModelMatrices) draws the model itself
+                for component in components:
+                    if component.instanced is not None:
+                        component.instanced = component.instance_index = None
+                        component.update()
+                continue
+            model = self.instanced.get(key)
+            if model is None:
+                model = InstancedModel(components[0].model)
+                model.event_manager = components[0].model.event_manager
+            if model.instance_owners != components:
+                model.set_instances([component.game_object.world_matrix for component in components], components)
+                for index, component in enumerate(components):
+                    component.instanced = model
+                    component.instance_index = index
+                    component.refit_bounds()
+            instanced[key] = model
+        self.instanced = instanced
+
+    def invalidate(self):
+        # components or their models changed
+        self.draw_list.invalidate()
+        self._instancing_dirty = True
+        if self.gpu_queue is not None:
+            self.gpu_queue.invalidate()
+
+    def draw(self, culler=None, components=None):
+        """
+        :param culler: FrustumCuller to test every RenderCompound with
+        :param components: visible subset of this group (e.g. found by the scene spatial index), whole group if None
+        """
         self: List[RenderComponent]
-        if self:
+        if components is None:
+            components = self
+        if self._instancing_dirty:
+            self.update_instancing()
+        for model in self.instanced.values():
+            model.refit_bounds()
+        if components:
             renderer = self[0].renderer
-            renderer.first_pass((component.model for component in self))
+            models = list({id(model): model for model in (component.get_drawn_model() for component in components)}
+                          .values())
+            if culler is None:
+                view_projection = None
+            else:
+                models = [model for model in models if culler.cull_model(model)]
+                models = culler.cull_occluded(models)
+                view_projection = culler.view_projection
+            renderer.first_pass(self.render_queue.select(models, view_projection))
+
+    def draw_gpu(self, culler, model_matrices):
+        """
+        Draws the whole group culled by GPU, see GPUCullingQueue
+        :param culler: FrustumCuller planes are taken from, nothing is culled if it is disabled
+        :param model_matrices: ModelMatrices dependency of the scene
+        """
+        if self:
+            if self.gpu_queue is None:
+                self.gpu_queue = GPUCullingQueue(self.draw_list, self.get_current_models)
+            planes = culler.get_planes() if culler.enabled else None
+            self[0].renderer.first_pass(self.gpu_queue.select(planes, model_matrices))
@@ -1,6 +1,6 @@
 from glm import vec3
 
-from ...event.base import MainEventManager, BaseEventReceiver
+from ...event.base import BaseEventReceiver
 from ...event.tick import TickEvent
 from ..component import Component, ComponentUpdateEvent
 from ...al.listener import SoundListener
@@ -16,12 +16,17 @@ class SoundSourceComponent(Component, BaseEventReceiver):
 
     def __init__(self, game_object=None):
         Component.__init__(self, game_object)
-        BaseEventReceiver.__init__(self)
+        self.event_manager = None  # ticks are received from the scene of the object, subscribed by the scene
         self.source = SoundSource()
 
     def update(self):
         self.source.set_position(self.game_object.abs_pos)
-        MainEventManager.add_event(SoundSourceUpdateEvent(self))
+        self.refit_bounds()
+        self.game_object.event_manager.add_event(SoundSourceUpdateEvent(self))
+
+    def get_bounds(self):
+        pos = self.game_object.abs_pos
+        return pos, pos
 
     def play(self, sound):
         sound.bind(self.source)
@@ -40,13 +45,18 @@ class SoundSourceComponent(Component, BaseEventReceiver):
     def set_direction(self, direction: vec3):
         pass
 
-    def on_event(self, evt: TickEvent):
+    def on_tick(self, _evt: TickEvent):
         self.source.update()
 
     def on_attach(self, game_object):
         super(SoundSourceComponent, self).on_attach(game_object)
         self.update()
 
+    def on_detach(self):
+        super(SoundSourceComponent, self).on_detach()
+        self.source.stop()
+        self.unsubscribe()
+
     # todo add control methods like stopping, pausing, etc
 
 
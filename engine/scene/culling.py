@@ -0,0 +1,99 @@
+import numpy as np
+
+from ..lib.np_helper import mat2array
+
+# half-size used for objects without known bounds: big enough to be never culled, but still finite
+UNBOUNDED_EXTENT = 1e30
+
+
+def transform_bounds(centers, extents, matrices):
+    """
+    Transforms N axis-aligned boxes by N matrices (in OpenGL memory layout)
+    :return:
+      world-space (centers, extents) of boxes that contain transformed ones
+    """
+    rotation = matrices[:, :3, :3]
+    world_centers = np.einsum('ni,nij->nj', centers, rotation) + matrices[:, 3, :3]
+    world_extents = np.einsum('ni,nij->nj', extents, np.abs(rotation))
+    return world_centers, world_extents
+
+
+class FrustumCuller:
+    """
+    Tests axis-aligned bounding boxes against camera frustum planes.
+    `stats` contains drawn and culled RenderCompound counts of the current frame
+    and the number of RenderComponents rejected by the scene spatial index.
+    Optional `occlusion` culler (e.g. renderer.occlusion.HiZOcclusionCuller) additionally removes
+    RenderCompounds hidden behind others, their count is stored as `stats['occluded']`
+    """
+
+    def __init__(self):
+        self.enabled = True
+        self.normals = np.zeros((3, 6), 'float32')  # plane normals as columns
+        self.abs_normals = np.zeros((3, 6), 'float32')
+        self.distances = np.zeros(6, 'float32')
+        self.view_projection = np.identity(4, 'float32')
+        self.occlusion = None
+        self.stats = {'drawn': 0, 'culled': 0, 'objects_culled': 0, 'occluded': 0}
+
+    def update(self, camera):
+        # called once per frame, before drawing
+        for key in self.stats:
+            self.stats[key] = 0
+        self.set_view_projection(mat2array(camera.get_projection_matrix() * camera.get_view_matrix()))
+        if self.occlusion is not None:
+            self.occlusion.update(self.view_projection)
+
+    def set_view_projection(self, matrix):
+        # planes are extracted from rows of mathematical matrix (columns of a matrix in OpenGL memory layout)
+        self.view_projection[:] = matrix
+        rows = np.asarray(matrix, 'float64').T
+        planes = np.array((rows[3] + rows[0], rows[3] - rows[0],   # left, right
+                           rows[3] + rows[1], rows[3] - rows[1],   # bottom, top
+                           rows[3] + rows[2], rows[3] - rows[2]))  # near, far
+        planes /= np.linalg.norm(planes[:, :3], axis=1)[:, None]
+        self.normals[:] = planes[:, :3].T
+        self.abs_normals[:] = np.abs(self.normals)
+        self.distances[:] = planes[:, 3]
+
+    def get_planes(self):
+        # (6, 4) array of plane normals and distances, e.g. for GPU culling
+        return np.ascontiguousarray(np.vstack((self.normals, self.distances)).T)
+
+    def test(self, centers, extents):
+        # returns bool array: True if box is (at least partially) inside the frustum
+        distance = centers @ self.normals + self.distances
+        radius = extents @ self.abs_normals
+        return (distance + radius >= 0).all(axis=1)
+
+    def cull_model(self, model):
+        """
+        Updates `model.visible` mask
+        :return:
+          number of visible RenderCompounds
+        """
+        if not len(model.visible):
+            return 0
+        if self.enabled:
+            model.visible[:] = self.test(model.world_centers, model.world_extents)
+        else:
+            model.visible[:] = True
+        drawn = int(np.count_nonzero(model.visible))
+        self.stats['drawn'] += drawn
+        self.stats['culled'] += len(model.visible) - drawn
+        return drawn
+
+    def cull_occluded(self, models):
+        """
+        Tests RenderCompounds that passed the frustum test against the occlusion culler
+        :return:
+          models that still have visible RenderCompounds
+        """
+        if self.occlusion is None or not self.enabled or not models:
+            return models
+        occluded = self.occlusion.cull_models(models)
+        if not occluded:
+            return models
+        self.stats['occluded'] += occluded
+        self.stats['drawn'] -= occluded
+        return [model for model in models if model.visible.any()]
@@ -0,0 +1,183 @@
+"""
+Archetype storage of scene components.
+Objects with the same set of component types share an Archetype, which keeps their components
+in one column (list) per type, so systems can process all instances of a type without walking the scene tree.
+World matrices of archetype objects are gathered from the scene TransformStore by cached row indices.
+GameObject.components stays the primary API, the store mirrors components that are in the scene
+"""
+import numpy as np
+
+
+def get_world_matrices(objects):
+    """
+    :return:
+      N*4*4 array of world matrices (OpenGL memory layout) of the objects
+    """
+    if not objects:
+        return np.empty((0, 4, 4), 'float32')
+    store = objects[0].transform_store
+    if store is not None and all(obj.transform_store is store for obj in objects):
+        return store.world_matrix[[obj.store_index for obj in objects]]
+    return np.array([obj.world_matrix for obj in objects], 'float32')
+
+
+def get_world_positions(objects):
+    # N*3 array of world positions of the objects
+    return get_world_matrices(objects)[:, 3, :3]
+
+
+class Archetype:
+    def __init__(self, types, transform_store=None):
+        self.types = types  # component types sorted by name
+        self.objects = []
+        self.columns = {component_type: [] for component_type in types}
+        self.transform_store = transform_store
+        self._lookup = {}  # requested type: column type of its first subclass in archetype or None
+        self._store_indices = None  # rows of the objects in the transform store, None if some are not stored
+        self._store_version = -1  # store version the indices were built for, -1 if archetype changed since
+
+    def __len__(self):
+        return len(self.objects)
+
+    @property
+    def world_matrices(self):
+        # N*4*4 array of world matrices of the objects
+        indices = self.get_store_indices()
+        if indices is None:
+            return get_world_matrices(self.objects)
+        return self.transform_store.world_matrix[indices]
+
+    @property
+    def world_positions(self):
+        # N*3 array of world positions of the objects
+        indices = self.get_store_indices()
+        if indices is None:
+            return get_world_positions(self.objects)
+        return self.transform_store.world_matrix[indices, 3, :3]
+
+    def get_store_indices(self):
+        # rebuilt only after objects are added or removed here or in the store
+        store = self.transform_store
+        if store is None:
+            return None
+        if self._store_version != store.version:
+            self._store_version = store.version
+            self._store_indices = None
+            if all(obj.transform_store is store for obj in self.objects):
+                self._store_indices = np.array([obj.store_index for obj in self.objects], 'intp')
+        return self._store_indices
+
+    def find_column(self, metaclass):
+        try:
+            return self._lookup[metaclass]
+        except KeyError:
+            found = next((component_type for component_type in self.types if issubclass(component_type, metaclass)),
+                         None)
+            self._lookup[metaclass] = found
+            return found
+
+    def get_component(self, row, metaclass):
+        column_type = self.find_column(metaclass)
+        return None if column_type is None else self.columns[column_type][row]
+
+    def append(self, obj, components):
+        # components: first component of every archetype type
+        obj.archetype, obj.archetype_row = self, len(self.objects)
+        self.objects.append(obj)
+        self._store_version = -1
+        for component_type, component in components.items():
+            self.columns[component_type].append(component)
+
+    def remove(self, row):
+        # last row is moved into the removed one, so columns stay contiguous
+        obj = self.objects[row]
+        obj.archetype = obj.archetype_row = None
+        last = self.objects.pop()
+        self._store_version = -1
+        columns = self.columns.values()
+        if last is obj:
+            for column in columns:
+                column.pop()
+            return
+        self.objects[row] = last
+        last.archetype_row = row
+        for column in columns:
+            column[row] = column.pop()
+
+
+class ComponentStore:
+    """
+    Keeps components of the scene grouped by archetypes.
+    Object changes its archetype every time a component is added or removed
+    """
+
+    def __init__(self, transform_store=None):
+        """
+        :param transform_store: TransformStore of the scene, world matrices of archetypes are read from it
+        """
+        self.transform_store = transform_store
+        self.archetypes = {}  # sorted type tuple: Archetype
+        self._object_components = {}  # id(obj): components of the object that are in the store
+        self._owners = {}  # id(component): object, as removed components are already detached from it
+        self._queries = {}  # requested types: matching archetypes
+
+    def add(self, component):
+        obj = component.game_object
+        if id(component) in self._owners:
+            return
+        self._owners[id(component)] = obj
+        self._object_components.setdefault(id(obj), []).append(component)
+        self._relocate(obj)
+
+    def remove(self, component):
+        obj = self._owners.pop(id(component), None)
+        if obj is None:
+            return
+        components = self._object_components[id(obj)]
+        components.remove(component)
+        if not components:
+            del self._object_components[id(obj)]
+        self._relocate(obj)
+
+    def _relocate(self, obj):
+        if obj.archetype is not None:
+            obj.archetype.remove(obj.archetype_row)
+        components = {}
+        for component in self._object_components.get(id(obj), ()):
+            # object can have several components of a type, column keeps the first one as get_component() does
+            components.setdefault(component.__class__, component)
+        if not components:
+            return
+        types = tuple(sorted(components, key=lambda component_type: component_type.__qualname__))
+        try:
+            archetype = self.archetypes[types]
+        except KeyError:
+            archetype = self.archetypes[types] = Archetype(types, self.transform_store)
+            self._queries.clear()
+        archetype.append(obj, components)
+
+    def get_archetypes(self, *metaclasses):
+        # archetypes with components of all requested types (or their subclasses)
+        try:
+            return self._queries[metaclasses]
+        except KeyError:
+            found = self._queries[metaclasses] = [
+                archetype for archetype in self.archetypes.values()
+                if all(archetype.find_column(metaclass) is not None for metaclass in metaclasses)]
+            return found
+
+    def query(self, *metaclasses):
+        """
+        Iterates over objects having components of all the types, batched by archetype
+        :return:
+          iterator of (archetype, column of the first type, column of the second type, ...) for every archetype.
+          archetype.objects and component columns are lists that must not be modified and are valid
+          until the store changes, archetype.world_matrices and archetype.world_positions are arrays
+        """
+        for archetype in self.get_archetypes(*metaclasses):
+            if archetype.objects:
+                yield (archetype, ) + tuple(archetype.columns[archetype.find_column(metaclass)]
+                                                     for metaclass in metaclasses)
+
+    def count(self, *metaclasses):
+        return sum(len(archetype) for archetype in self.get_archetypes(*metaclasses))
@@ -1,31 +1,51 @@
 from typing import Union, Iterable
 
-from glm import pi as pi_func, vec3, normalize, clamp, acos, asin, cross, rotate, mat4, vec4, cos, sin
+import numpy as np
+from glm import pi as pi_func, vec3, normalize, clamp, acos, asin, cross, rotate, mat4, vec4, cos, sin, quat
 
 from ..event.scene import GameObjectEvent
-from ..event.base import MainEventManager
-from .component import Component, ComponentUpdateEvent
+from ..event.base import MainEventManager, PRIORITY_BULK
+from .component import Component, ComponentAddEvent, ComponentRemoveEvent
+from .transform import quat2array, resolve_hierarchy
 
 pi = pi_func()
 
-GameObjectAddEvent = GameObjectEvent.create_meta('GameObjectAddEvent')
-GameObjectUpdateEvent = GameObjectEvent.create_meta('GameObjectUpdateEvent')
+GameObjectAddEvent = GameObjectEvent.create_meta('GameObjectAddEvent', priority=PRIORITY_BULK)
+GameObjectUpdateEvent = GameObjectEvent.create_meta('GameObjectUpdateEvent', coalesce_by='game_object')
+GameObjectRemoveEvent = GameObjectEvent.create_meta('GameObjectRemoveEvent', priority=PRIORITY_BULK)
 
 
 class GameObject:
-    def __init__(self, parent=None, scene=None, pos=(0., 0., 0.), children=(), components=()):
+    __slots__ = ('scene', 'parent', '_pos', '_rotation', '_scale', '_world_matrix', 'transform_store', 'store_index',
+                 '_dirty', '_changed', 'active', 'children', 'components', 'archetype', 'archetype_row')
+
+    def __init__(self, parent=None, scene=None, pos=(0., 0., 0.), children=(), components=(),
+                 rotation=None, scale=(1., 1., 1.)):
         # todo protect game_objects and components from being used more than once
         pos = vec3(pos)
         self.scene = scene
-        self.parent = parent
+        self.parent = None  # set by parent.add_child()
         self._pos = pos
-        self.abs_pos = pos
+        self._rotation = quat() if rotation is None else quat(rotation)
+        self._scale = vec3(scale)
+        self._world_matrix = np.identity(4, 'float32')  # in OpenGL memory layout, translation is in row 3
+        self._world_matrix[3, :3] = pos
+        self.transform_store = None  # set when the scene keeps transforms in a TransformStore
+        self.store_index = None
+        self._dirty = False
+        self._changed = False  # transform was changed since the last resolve (not only entered the hierarchy)
+        self.active = True  # components of inactive objects and their children are removed from the scene
         self.children = []
         self.components = []
+        self.archetype = None  # ecs.Archetype holding components of the object, set by scene ComponentStore
+        self.archetype_row = None
+        if parent is None and scene is not None and scene.transform_store is not None:
+            self._bind_store(scene.transform_store, -1)
         if parent is not None:
             self.scene = parent.scene
+            # initial transform is already set (or copied into the transform store), it is not a change
             parent.add_child(self)
-            self.pos = pos
+            self._world_matrix[3, :3] += parent.abs_pos
         for child in children:
             self.add_child(child)
         for component in components:
@@ -33,35 +53,210 @@ class GameObject:
 
     @property
     def pos(self):
+        if self.transform_store is not None:
+            return vec3(*self.transform_store.local_pos[self.store_index])
         return vec3(self._pos)
 
     @pos.setter
     def pos(self, value):
+        if self.transform_store is not None:
+            # world position will be resolved by the store once per tick
+            self.transform_store.set_position(self.store_index, tuple(value))
+            return
         self._pos = vec3(value)
         self.update()
 
+    @property
+    def rotation(self):
+        if self.transform_store is not None:
+            return quat(*self.transform_store.rotations[self.store_index])
+        return quat(self._rotation)
+
+    @rotation.setter
+    def rotation(self, value):
+        if self.transform_store is not None:
+            self.transform_store.set_rotation(self.store_index, quat2array(value))
+            return
+        self._rotation = quat(value)
+        self.update()
+
+    @property
+    def scale(self):
+        if self.transform_store is not None:
+            return vec3(*self.transform_store.scales[self.store_index])
+        return vec3(self._scale)
+
+    @scale.setter
+    def scale(self, value):
+        if self.transform_store is not None:
+            self.transform_store.set_scale(self.store_index, tuple(vec3(value)))
+            return
+        self._scale = vec3(value)
+        self.update()
+
+    @property
+    def world_matrix(self):
+        if self.transform_store is not None:
+            return self.transform_store.world_matrix[self.store_index]
+        return self._world_matrix
+
+    def set_world_matrix(self, matrix):
+        # used by transform resolvers only
+        self._world_matrix = matrix
+        self._dirty = self._changed = False
+
+    @property
+    def abs_pos(self):
+        return vec3(*self.world_matrix[3, :3])
+
     def move_by_vector(self, vector: vec3):
         self.pos = self.pos + vector
 
+    def rotate_by(self, angle, axis):
+        self.rotation = rotate(self.rotation, angle, vec3(axis))
+
     def update(self):
-        self.abs_pos = self.parent.abs_pos + self.pos
-        MainEventManager.add_event(GameObjectUpdateEvent(self))
-        for child in self.children:
-            child.update()
+        # transform is only marked dirty here, it will be resolved by Scene.resolve_transforms() once per tick
+        if self._changed and self.scene is not None:
+            # changed again before it was resolved
+            self.scene.coalesced_updates += 1
+            return
+        self._changed = True
+        self._mark_dirty()
+
+    def _mark_dirty(self):
+        # also called when object enters a hierarchy, which is not counted as a transform change
+        if self.scene is None:
+            self._dirty = True
+            for obj in resolve_hierarchy((self, )):
+                obj.notify_update()
+            return
+        if not self._dirty:
+            self._dirty = True
+            self.scene.dirty_objects.append(self)
+
+    def get_dirty_root(self):
+        # returns top-most dirty object whose subtree contains current object, or None if it is already resolved
+        if not self._dirty:
+            return None
+        top = self
+        parent = self.parent
+        while parent is not None:
+            if parent._dirty:
+                top = parent
+            parent = parent.parent
+        return top
+
+    def notify_update(self):
+        self._dirty = self._changed = False
+        self.event_manager.add_event(GameObjectUpdateEvent(self))
         for comp in self.components:
             comp.update()
 
+    @property
+    def event_manager(self):
+        # manager of the scene, or the global one for objects outside of any scene
+        return MainEventManager if self.scene is None else self.scene.event_manager
+
+    @property
+    def active_in_hierarchy(self):
+        obj = self
+        while obj is not None:
+            if not obj.active:
+                return False
+            obj = obj.parent
+        return True
+
+    def set_active(self, active):
+        """
+        Deactivated object keeps its children and components (with all their resources),
+        but they are removed from scene systems: renderers, light storages, spatial index, etc.
+        """
+        active = bool(active)
+        if self.active == active:
+            return
+        in_scene = self.scene is not None and (self.parent is None or self.parent.active_in_hierarchy)
+        if in_scene and not active:
+            self._post_subtree_events(GameObjectRemoveEvent, ComponentRemoveEvent)
+        self.active = active
+        if in_scene and active:
+            self._post_subtree_events(GameObjectAddEvent, ComponentAddEvent)
+
+    def _post_subtree_events(self, object_event, component_event):
+        # announces active part of the subtree to the scene
+        if not self.active:
+            return
+        event_manager = self.scene.event_manager
+        event_manager.add_event(object_event(self))
+        for comp in self.components:
+            event_manager.add_event(component_event(comp))
+        for child in self.children:
+            child._post_subtree_events(object_event, component_event)
+
+    def _set_scene(self, scene):
+        self.scene = scene
+        for child in self.children:
+            child._set_scene(scene)
+
+    def _bind_store(self, store, parent_index):
+        if self.transform_store is store:
+            store.set_parent(self.store_index, parent_index)
+            return
+        self.store_index = store.add(self, parent_index, tuple(self._pos))
+        store.rotations[self.store_index] = quat2array(self._rotation)
+        store.scales[self.store_index] = self._scale
+        self.transform_store = store
+        for child in self.children:
+            child.scene = self.scene
+            child._bind_store(store, self.store_index)
+
+    def _unbind_store(self):
+        # copies transform out of the store, so object keeps it while detached
+        store = self.transform_store
+        for child in self.children:
+            child._unbind_store()
+        index = self.store_index  # removing children may move this object to another row
+        self._pos = vec3(*store.local_pos[index])
+        self._rotation = quat(*store.rotations[index])
+        self._scale = vec3(*store.scales[index])
+        self._world_matrix = store.world_matrix[index].copy()
+        store.remove(index)
+        self.transform_store = None
+        self.store_index = None
+
     def add_child(self, obj: 'GameObject'):
+        if obj.parent is not None:
+            obj.parent.remove_child(obj)
         obj.parent = self
         self.children.append(obj)
-        obj.recursive_add_object_event()
+        obj._set_scene(self.scene)
+        if self.transform_store is not None:
+            obj._bind_store(self.transform_store, self.store_index)
+        obj._mark_dirty()
+        if self.scene is not None and self.active_in_hierarchy:
+            obj._post_subtree_events(GameObjectAddEvent, ComponentAddEvent)
 
-    def recursive_add_object_event(self):
-        MainEventManager.add_event(GameObjectAddEvent(self))
-        for obj in self.children:
-            MainEventManager.add_event(GameObjectAddEvent(obj))
-        for comp in self.components:
-            MainEventManager.add_event(ComponentUpdateEvent(comp))
+    def remove_child(self, obj: 'GameObject'):
+        """
+        Detaches object with its subtree from the scene. Detached objects keep their components
+        and can be added to the scene again (e.g. by GameObjectPool)
+        """
+        self.children.remove(obj)
+        if self.scene is not None and self.active_in_hierarchy:
+            obj._post_subtree_events(GameObjectRemoveEvent, ComponentRemoveEvent)
+        if obj.transform_store is not None:
+            obj._unbind_store()
+        obj.parent = None
+        obj._set_scene(None)
+
+    def destroy(self):
+        # detaches object and removes all its children and components, so they can be garbage-collected
+        if self.parent is not None:
+            self.parent.remove_child(self)
+        for child in tuple(self.children):
+            child.destroy()
+        for component in tuple(self.components):
+            self.remove_component(component)
 
     @property
     def copy(self):
@@ -76,6 +271,10 @@ class GameObject:
         self.components.append(component)
         component.on_attach(self)
 
+    def remove_component(self, component: Component):
+        self.components.remove(component)
+        component.on_detach()
+
     def get_component(self, metaclass):
         for item in self.components:
             if isinstance(item, metaclass):
@@ -90,11 +289,14 @@ class GameObject:
 
 
 class DirectedGameObject(GameObject):
+    __slots__ = ('_angles', '_direction')
+
     def __init__(self, *args, direction = None, **kwargs):
         self._angles = vec3(0)
         self._direction = vec3(0.0, 0.0, 1.0) if direction == None else direction
         super(DirectedGameObject, self).__init__(*args, **kwargs)
         self.angles = (pi, 0, 0)
+        self._changed = False  # initial direction is not a change
 
     @property
     def angles(self):
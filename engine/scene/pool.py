@@ -0,0 +1,32 @@
+from .game_object import GameObject
+
+
+class GameObjectPool:
+    """
+    Keeps detached GameObjects for reuse. Released objects keep their children, components and GL resources,
+    so acquiring them again costs only scene add events instead of loading and uploading models
+    """
+
+    def __init__(self, factory, size=0):
+        """
+        :param factory: callable without arguments making new detached GameObject
+        :param size: number of objects to make in advance
+        """
+        self.factory = factory
+        self.free = [factory() for _ in range(size)]
+
+    def acquire(self, parent: GameObject, pos=(0., 0., 0.)) -> GameObject:
+        obj = self.free.pop() if self.free else self.factory()
+        obj.pos = pos
+        parent.add_child(obj)
+        return obj
+
+    def release(self, obj: GameObject):
+        if obj.parent is not None:
+            obj.parent.remove_child(obj)
+        self.free.append(obj)
+
+    def clear(self):
+        for obj in self.free:
+            obj.destroy()
+        self.free = []
@@ -1,21 +1,46 @@
+from math import tan
+
 from ..sound.context import AudioContext
-from ..event.base import MainEventManager, BaseEventReceiver
+from ..event.base import EventManager, BaseEventReceiver, PRIORITY_CRITICAL
 from ..event.tick import TickEvent
+from ..event.scene import SceneDrawEvent
 from .game_object import GameObject
-from .component import ComponentUpdateEvent, ComponentAddEvent
+from .transform import TransformStore, resolve_hierarchy
+from .culling import FrustumCuller
+from .spatial import DynamicAABBTree
+from .ecs import ComponentStore
+from .component import ComponentUpdateEvent, ComponentAddEvent, ComponentRemoveEvent
 from .components.camera import CameraComponent
 from .components.render import RenderComponent, CachedComponentsGroup
+from .components.light import LightComponent, AreaLightComponent
+from .components.sound import SoundSourceComponent
 
-SetCameraEvent = ComponentUpdateEvent.create_meta('SetCameraEvent', ('camera', ))
+LIGHT_COMPONENTS = (LightComponent, AreaLightComponent)  # returned by Scene.get_lights()
+SetCameraEvent = ComponentUpdateEvent.create_meta('SetCameraEvent', ('camera', ), priority=PRIORITY_CRITICAL)
 
 
 class Scene(BaseEventReceiver):
-    _event_subscriptions_ = (ComponentAddEvent, TickEvent)
+    _event_subscriptions_ = (ComponentAddEvent, ComponentRemoveEvent, TickEvent)
 
-    def __init__(self, sound_context=True):
+    def __init__(self, sound_context=True, transform_store=False, event_time_budget=None, stream_buffer=None,
+                 gpu_culling=False):
+        """
+        :param event_time_budget: seconds per tick for bulk events (objects entering or leaving the scene),
+          None for no limit
+        :param stream_buffer: RingBuffer that renderer dependencies upload their per-frame changes through
+          instead of reallocating or synchronously updating their buffers (requires GL 4.4)
+        :param gpu_culling: cull and draw render components by GPU (see GPUCullingQueue) when ModelMatrices
+          dependency is used, instead of the spatial index and CPU frustum culling (culler.occlusion is not applied)
+        """
         # todo move all cached to other dedicated class
-        # todo implement removing renderers, dependencies, cached render components
-        super(Scene, self).__init__()
+        # todo implement removing renderer dependencies
+        # events of the scene objects are posted to its own manager
+        super(Scene, self).__init__(EventManager(event_time_budget))
+        # opt-in structure-of-arrays storage for object transforms, resolved once per tick
+        self.transform_store = TransformStore() if transform_store else None
+        # objects with changed transforms, resolved once per tick by resolve_transforms()
+        self.dirty_objects = []
+        self.coalesced_updates = 0
         self.root_obj = GameObject(scene=self)
         self.events = []
         self.active_renderers = []
@@ -29,9 +54,19 @@ class Scene(BaseEventReceiver):
             raise ValueError("Not Supported")  # todo log this instead of exception
 
         self.renderer_dependencies = {}
+        self.stream_buffer = stream_buffer
         self._cached_render_components = []
+        self._lod_components = []  # render components with several LOD levels
+        self.culler = FrustumCuller()  # culler.stats has drawn and culled counts of the last frame
+        self.gpu_culling = gpu_culling
+        # bounds of all components that implement get_bounds(), refitted on their updates
+        self.spatial_index = DynamicAABBTree()
+        # lights without influence radius, returned by every get_lights() query.
+        # Kept out of the index, as their boxes would inflate all nodes above them
+        self.unbounded_lights = []
+        # components of active objects grouped by archetype, see query()
+        self.component_store = ComponentStore(self.transform_store)
         self.static_data = {'camera_pos': None, 'camera_dir': None}
-        self.event_manager = MainEventManager
 
     def set_active_camera(self, obj):
         component = obj
@@ -40,30 +75,201 @@ class Scene(BaseEventReceiver):
         if not isinstance(component, CameraComponent):
             raise TypeError("No camera component found")
         self.active_camera = component
-        MainEventManager.add_event(SetCameraEvent(component))
+        self.event_manager.add_event(SetCameraEvent(component))
+
+    @property
+    def coalesced_transform_updates(self):
+        # number of redundant transform updates that were merged into a single per-tick resolve
+        if self.transform_store is not None:
+            return self.coalesced_updates + self.transform_store.coalesced_updates
+        return self.coalesced_updates
+
+    def resolve_transforms(self):
+        if self.transform_store is not None:
+            self.transform_store.resolve()
+        dirty, self.dirty_objects = self.dirty_objects, []
+        roots = {}
+        for obj in dirty:
+            if obj.transform_store is not None:
+                # world matrix is already propagated by the store
+                obj.notify_update()
+                continue
+            root = obj.get_dirty_root()
+            if root is not None:
+                roots[id(root)] = root
+        for obj in resolve_hierarchy(roots.values()):
+            obj.notify_update()
+        return len(dirty)
 
     def draw(self):
+        # objects moved after the tick was processed: resolve them and deliver their update events before drawing.
+        # bulk events were given their time budget by the tick poll
+        if self.resolve_transforms():
+            self.event_manager.poll_events(time_budget=0)
+
+        self.update_lods()
+        # dependencies upload changes of the whole tick at once, including matrices of switched LOD levels
+        self.event_manager.add_event(SceneDrawEvent(self, instant=True))
+
+        self.culler.update(self.active_camera)
+
         # group must not be empty: remove it if so
-        for group in self._cached_render_components:
-            group.draw()
+        model_matrices = self.renderer_dependencies.get('ModelMatricesSSBO') if self.gpu_culling else None
+        if model_matrices is not None:
+            for group in self._cached_render_components:
+                group.draw_gpu(self.culler, model_matrices)
+        elif self.culler.enabled:
+            visible = self.get_visible_render_components()
+            for group, components in zip(self._cached_render_components, visible):
+                group.draw(self.culler, components)
+        else:
+            for group in self._cached_render_components:
+                group.draw(self.culler)
 
         for item in self.active_renderers:
             item.second_pass(self.active_camera.render_target)
         self.active_camera.render_target.finish()
+        if self.stream_buffer is not None:
+            self.stream_buffer.next_frame()
+        if self.event_manager.profiler is not None:
+            self.event_manager.profiler.end_frame()
 
     def add_render_component(self, component: RenderComponent):
         if component.renderer not in self.active_renderers:
             self.active_renderers.append(component.renderer)
             self._cached_render_components.append(CachedComponentsGroup())
-        self._cached_render_components[self.active_renderers.index(component.renderer)].append(component)
+        group = self._cached_render_components[self.active_renderers.index(component.renderer)]
+        group.add_component(component)
+        for model in component.get_models():
+            model.event_manager = self.event_manager  # draw events go to dependencies of this scene
+        if component.lod is not None:
+            self._lod_components.append(component)
+
+    def remove_render_component(self, component: RenderComponent):
+        if component.renderer not in self.active_renderers:
+            return
+        index = self.active_renderers.index(component.renderer)
+        group = self._cached_render_components[index]
+        group.remove_component(component)
+        if not group:
+            del self.active_renderers[index]
+            del self._cached_render_components[index]
+        if component in self._lod_components:
+            self._lod_components.remove(component)
+
+    def get_render_group(self, component):
+        # CachedComponentsGroup drawing the component, None if it is not in this scene
+        if component.renderer in self.active_renderers:
+            group = self._cached_render_components[self.active_renderers.index(component.renderer)]
+            if component in group:
+                return group
+        return None
 
-    def on_tick(self):
+    def update_render_model(self, component):
+        # called by RenderComponent.set_model(): instancing and draw list of the group are rebuilt,
+        # component can gain or lose LOD levels
+        group = self.get_render_group(component)
+        if group is None:
+            return
+        group.invalidate()
+        if component.lod is None and component in self._lod_components:
+            self._lod_components.remove(component)
+        elif component.lod is not None and component not in self._lod_components:
+            self._lod_components.append(component)
+
+    def get_render_models(self):
+        # models of all render components (every LOD level), grouped by renderer
+        return [model for group in self._cached_render_components for model in group.get_models()]
+
+    def update_lods(self):
+        # selects LOD level of every multi-level render component for the active camera, called once per frame
+        if not self._lod_components:
+            return
+        camera = self.active_camera
+        camera_pos = camera.game_object.abs_pos
+        projection_scale = 1 / tan(camera.fov / 2)
+        for component in self._lod_components:
+            if component.select_lod(camera_pos, projection_scale) and self.gpu_culling:
+                gpu_queue = self.get_render_group(component).gpu_queue
+                if gpu_queue is not None:
+                    gpu_queue.invalidate()  # only the drawn level changed, the draw list has all of them
+
+    def add_spatial_proxy(self, component):
+        if isinstance(component, LIGHT_COMPONENTS) and component.radius is None:
+            if component not in self.unbounded_lights:
+                self.unbounded_lights.append(component)
+            return
+        bounds = component.get_bounds()
+        if bounds is not None and component.spatial_proxy is None:
+            component.spatial_proxy = self.spatial_index.insert(component, *bounds)
+
+    def remove_spatial_proxy(self, component):
+        if isinstance(component, LIGHT_COMPONENTS) and component in self.unbounded_lights:
+            self.unbounded_lights.remove(component)
+        # proxy can belong to the index of another scene if component was moved between scenes
+        proxy = component.spatial_proxy
+        index = self.spatial_index
+        if proxy is not None and proxy < len(index.items) and index.get_item(proxy) is component:
+            index.remove(proxy)
+            component.spatial_proxy = None
+
+    def get_visible_render_components(self):
+        """
+        Finds RenderComponents inside the camera frustum using the spatial index
+        :return:
+          list of visible components for every cached render group
+        """
+        visible = self.spatial_index.query_frustum(self.culler,
+                                                   lambda component: isinstance(component, RenderComponent))
+        groups = [[] for _ in self.active_renderers]
+        for component in visible:
+            groups[self.active_renderers.index(component.renderer)].append(component)
+        total = sum(len(group) for group in self._cached_render_components)
+        self.culler.stats['objects_culled'] = total - len(visible)
+        return groups
+
+    def get_lights(self, center, radius):
+        # light components whose influence reaches the sphere
+        return self.unbounded_lights + self.spatial_index.query_sphere(
+            center, radius, lambda component: isinstance(component, LIGHT_COMPONENTS))
+
+    def get_nearest_sound_sources(self, point, count=1):
+        # `count` SoundSourceComponents nearest to the point, sorted by distance
+        return [component for _, component in self.spatial_index.nearest(
+            point, count, lambda component: isinstance(component, SoundSourceComponent))]
+
+    def query(self, *metaclasses):
+        """
+        Iterates over active objects having components of all the types, batched by archetype:
+            for batch, renders, lights in scene.query(RenderComponent, LightComponent):
+                positions = batch.world_positions
+        :return:
+          iterator of (Archetype, components of the first type, components of the second type, ...)
+        """
+        return self.component_store.query(*metaclasses)
+
+    def on_tick(self, _evt):
+        self.resolve_transforms()
         self.static_data['camera_pos'] = self.active_camera.game_object.abs_pos
         self.static_data['camera_dir'] = self.active_camera.game_object.direction
 
-    def on_event(self, evt):
-        if isinstance(evt, ComponentAddEvent):
-            if isinstance(evt.component, RenderComponent):
-                self.add_render_component(evt.component)
-        elif isinstance(evt, TickEvent):
-            self.on_tick()
+    def on_component_add(self, evt):
+        game_object = evt.component.game_object
+        if game_object is None or game_object.scene is not self:
+            return  # component was removed or moved to another scene before the event was processed
+        if isinstance(evt.component, RenderComponent):
+            self.add_render_component(evt.component)
+        elif isinstance(evt.component, SoundSourceComponent):
+            # ticks are posted to the manager of the scene, object may come from another scene or from outside
+            evt.component.unsubscribe()
+            evt.component.subscribe(self.event_manager)
+        self.add_spatial_proxy(evt.component)
+        self.component_store.add(evt.component)
+
+    def on_component_remove(self, evt):
+        if isinstance(evt.component, RenderComponent):
+            self.remove_render_component(evt.component)
+        elif isinstance(evt.component, SoundSourceComponent) and evt.component.event_manager is self.event_manager:
+            evt.component.unsubscribe()  # unless it was already subscribed by the scene it moved to
+        self.remove_spatial_proxy(evt.component)
+        self.component_store.remove(evt.component)
@@ -0,0 +1,412 @@
+from heapq import heappush, heappop
+
+NULL_NODE = -1
+
+
+def _union(lo0, hi0, lo1, hi1):
+    return (min(lo0[0], lo1[0]), min(lo0[1], lo1[1]), min(lo0[2], lo1[2])), \
+           (max(hi0[0], hi1[0]), max(hi0[1], hi1[1]), max(hi0[2], hi1[2]))
+
+
+def _area(lo, hi):
+    # half of the surface area, used as insertion cost
+    dx, dy, dz = hi[0] - lo[0], hi[1] - lo[1], hi[2] - lo[2]
+    return dx * dy + dy * dz + dz * dx
+
+
+def _contains(lo0, hi0, lo1, hi1):
+    return lo0[0] <= lo1[0] and lo0[1] <= lo1[1] and lo0[2] <= lo1[2] and \
+        hi0[0] >= hi1[0] and hi0[1] >= hi1[1] and hi0[2] >= hi1[2]
+
+
+def _distance2(lo, hi, point):
+    # squared distance from point to the box (0 if point is inside)
+    result = 0.
+    for i in range(3):
+        value = point[i]
+        if value < lo[i]:
+            result += (lo[i] - value) ** 2
+        elif value > hi[i]:
+            result += (value - hi[i]) ** 2
+    return result
+
+
+class DynamicAABBTree:
+    """
+    Incrementally maintained bounding volume hierarchy (dynamic AABB tree, as used in Box2D/Bullet).
+    Leaves store "fat" boxes, so small movements of objects do not change the tree at all,
+    tree is kept balanced by AVL-like rotations on insertion and removal.
+    Items are any objects, proxies returned by `insert()` are used to move or remove them
+    """
+
+    def __init__(self, margin=1.0, relative_margin=0.1):
+        self.margin = margin
+        self.relative_margin = relative_margin
+        self.root = NULL_NODE
+        self.item_count = 0
+        self.refit_count = 0  # number of moves that actually changed the tree
+
+        # node fields (structure of lists)
+        self.lower = []
+        self.upper = []
+        self.parent = []
+        self.left = []
+        self.right = []
+        self.height = []
+        self.items = []
+        self.tight = []  # exact (not fattened) box of leaf nodes
+        self._free = []
+
+    def __len__(self):
+        return self.item_count
+
+    # public api
+    def insert(self, item, lower, upper):
+        node = self._allocate()
+        self.items[node] = item
+        self._set_leaf_box(node, tuple(lower), tuple(upper))
+        self._insert_leaf(node)
+        self.item_count += 1
+        return node
+
+    def remove(self, proxy):
+        self._remove_leaf(proxy)
+        self.items[proxy] = None
+        self.tight[proxy] = None
+        self._free.append(proxy)
+        self.item_count -= 1
+
+    def move(self, proxy, lower, upper):
+        """
+        Refits leaf after item movement
+        :return:
+          True if tree has been changed, False if new box still fits into the fat box
+        """
+        lower, upper = tuple(lower), tuple(upper)
+        self.tight[proxy] = (lower, upper)
+        if _contains(self.lower[proxy], self.upper[proxy], lower, upper):
+            return False
+        self._remove_leaf(proxy)
+        self._set_leaf_box(proxy, lower, upper)
+        self._insert_leaf(proxy)
+        self.refit_count += 1
+        return True
+
+    def get_item(self, proxy):
+        return self.items[proxy]
+
+    def query_aabb(self, lower, upper, condition=None):
+        result = []
+        if self.root == NULL_NODE:
+            return result
+        stack = [self.root]
+        node_lower, node_upper, left, right, items, tight = \
+            self.lower, self.upper, self.left, self.right, self.items, self.tight
+        while stack:
+            node = stack.pop()
+            lo, hi = node_lower[node], node_upper[node]
+            if hi[0] < lower[0] or hi[1] < lower[1] or hi[2] < lower[2] or \
+                    lo[0] > upper[0] or lo[1] > upper[1] or lo[2] > upper[2]:
+                continue
+            if left[node] == NULL_NODE:
+                lo, hi = tight[node]
+                if hi[0] < lower[0] or hi[1] < lower[1] or hi[2] < lower[2] or \
+                        lo[0] > upper[0] or lo[1] > upper[1] or lo[2] > upper[2]:
+                    continue
+                item = items[node]
+                if condition is None or condition(item):
+                    result.append(item)
+            else:
+                stack.append(left[node])
+                stack.append(right[node])
+        return result
+
+    def query_sphere(self, center, radius, condition=None):
+        result = []
+        if self.root == NULL_NODE:
+            return result
+        radius2 = radius * radius
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if _distance2(self.lower[node], self.upper[node], center) > radius2:
+                continue
+            if self.left[node] == NULL_NODE:
+                if _distance2(*self.tight[node], center) > radius2:
+                    continue
+                item = self.items[node]
+                if condition is None or condition(item):
+                    result.append(item)
+            else:
+                stack.append(self.left[node])
+                stack.append(self.right[node])
+        return result
+
+    def query_frustum(self, culler, condition=None):
+        """
+        Returns items whose boxes intersect the frustum of FrustumCuller.
+        Subtrees that are fully inside the frustum are collected without further plane tests
+        """
+        result = []
+        if self.root == NULL_NODE:
+            return result
+        planes = [(*map(float, culler.normals[:, i]), float(culler.distances[i]), *map(float, culler.abs_normals[:, i]))
+                  for i in range(6)]
+        node_lower, node_upper, left, right, items = self.lower, self.upper, self.left, self.right, self.items
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            lo, hi = node_lower[node], node_upper[node]
+            cx, cy, cz = (lo[0] + hi[0]) * .5, (lo[1] + hi[1]) * .5, (lo[2] + hi[2]) * .5
+            ex, ey, ez = hi[0] - cx, hi[1] - cy, hi[2] - cz
+            inside = True
+            for nx, ny, nz, d, ax, ay, az in planes:
+                distance = nx * cx + ny * cy + nz * cz + d
+                radius = ax * ex + ay * ey + az * ez
+                if distance + radius < 0:
+                    break
+                if distance - radius < 0:
+                    inside = False
+            else:
+                if left[node] == NULL_NODE:
+                    item = items[node]
+                    if condition is None or condition(item):
+                        result.append(item)
+                elif inside:
+                    self._collect(node, result, condition)
+                else:
+                    stack.append(left[node])
+                    stack.append(right[node])
+        return result
+
+    def nearest(self, point, count=1, condition=None):
+        """
+        Best-first search of `count` items nearest to the point (distance is measured to item boxes)
+        :return:
+          list of (squared distance, item), sorted by distance
+        """
+        result = []
+        if self.root == NULL_NODE:
+            return result
+        point = tuple(point)
+        heap = [(_distance2(self.lower[self.root], self.upper[self.root], point), 0, self.root)]
+        while heap and len(result) < count:
+            distance, is_exact, node = heappop(heap)
+            if is_exact:
+                result.append((distance, self.items[node]))
+            elif self.left[node] == NULL_NODE:
+                if condition is None or condition(self.items[node]):
+                    heappush(heap, (_distance2(*self.tight[node], point), 1, node))
+            else:
+                for child in (self.left[node], self.right[node]):
+                    heappush(heap, (_distance2(self.lower[child], self.upper[child], point), 0, child))
+        return result
+
+    def get_height(self):
+        return self.height[self.root] if self.root != NULL_NODE else 0
+
+    # internals
+    def _collect(self, node, result, condition):
+        stack = [node]
+        left, right, items = self.left, self.right, self.items
+        while stack:
+            node = stack.pop()
+            if left[node] == NULL_NODE:
+                item = items[node]
+                if condition is None or condition(item):
+                    result.append(item)
+            else:
+                stack.append(left[node])
+                stack.append(right[node])
+
+    def _allocate(self):
+        if self._free:
+            node = self._free.pop()
+        else:
+            node = len(self.parent)
+            for field in (self.lower, self.upper, self.items, self.tight):
+                field.append(None)
+            for field in (self.parent, self.left, self.right):
+                field.append(NULL_NODE)
+            self.height.append(0)
+        self.parent[node] = self.left[node] = self.right[node] = NULL_NODE
+        self.height[node] = 0
+        return node
+
+    def _set_leaf_box(self, node, lower, upper):
+        self.tight[node] = (lower, upper)
+        margin = [self.margin + (upper[i] - lower[i]) * self.relative_margin for i in range(3)]
+        self.lower[node] = (lower[0] - margin[0], lower[1] - margin[1], lower[2] - margin[2])
+        self.upper[node] = (upper[0] + margin[0], upper[1] + margin[1], upper[2] + margin[2])
+
+    def _insert_leaf(self, leaf):
+        if self.root == NULL_NODE:
+            self.root = leaf
+            self.parent[leaf] = NULL_NODE
+            return
+
+        lower, upper, left, right = self.lower, self.upper, self.left, self.right
+        leaf_lo, leaf_hi = lower[leaf], upper[leaf]
+
+        # finding the best sibling
+        index = self.root
+        while left[index] != NULL_NODE:
+            area = _area(lower[index], upper[index])
+            combined_area = _area(*_union(lower[index], upper[index], leaf_lo, leaf_hi))
+            cost = 2 * combined_area  # cost of creating a new parent for this node and the new leaf
+            inheritance_cost = 2 * (combined_area - area)  # minimum cost of pushing the leaf further down
+
+            child_costs = []
+            for child in (left[index], right[index]):
+                child_area = _area(*_union(lower[child], upper[child], leaf_lo, leaf_hi))
+                if left[child] != NULL_NODE:
+                    child_area -= _area(lower[child], upper[child])
+                child_costs.append(child_area + inheritance_cost)
+
+            if cost < child_costs[0] and cost < child_costs[1]:
+                break
+            index = left[index] if child_costs[0] < child_costs[1] else right[index]
+
+        # creating a new parent
+        sibling = index
+        old_parent = self.parent[sibling]
+        new_parent = self._allocate()
+        self.parent[new_parent] = old_parent
+        lower[new_parent], upper[new_parent] = _union(leaf_lo, leaf_hi, lower[sibling], upper[sibling])
+        self.height[new_parent] = self.height[sibling] + 1
+        if old_parent != NULL_NODE:
+            if left[old_parent] == sibling:
+                left[old_parent] = new_parent
+            else:
+                right[old_parent] = new_parent
+        else:
+            self.root = new_parent
+        left[new_parent] = sibling
+        right[new_parent] = leaf
+        self.parent[sibling] = new_parent
+        self.parent[leaf] = new_parent
+
+        self._fix_upwards(self.parent[leaf])
+
+    def _remove_leaf(self, leaf):
+        if leaf == self.root:
+            self.root = NULL_NODE
+            return
+        parent = self.parent[leaf]
+        grand_parent = self.parent[parent]
+        sibling = self.right[parent] if self.left[parent] == leaf else self.left[parent]
+
+        if grand_parent != NULL_NODE:
+            if self.left[grand_parent] == parent:
+                self.left[grand_parent] = sibling
+            else:
+                self.right[grand_parent] = sibling
+            self.parent[sibling] = grand_parent
+            self._free_node(parent)
+            self._fix_upwards(grand_parent)
+        else:
+            self.root = sibling
+            self.parent[sibling] = NULL_NODE
+            self._free_node(parent)
+
+    def _free_node(self, node):
+        self.lower[node] = self.upper[node] = None
+        self._free.append(node)
+
+    def _fix_upwards(self, index):
+        # rebalances and refits all ancestors
+        left, right, height = self.left, self.right, self.height
+        while index != NULL_NODE:
+            index = self._balance(index)
+            child1, child2 = left[index], right[index]
+            height[index] = 1 + max(height[child1], height[child2])
+            self.lower[index], self.upper[index] = _union(self.lower[child1], self.upper[child1],
+                                                          self.lower[child2], self.upper[child2])
+            index = self.parent[index]
+
+    def _refit(self, node):
+        child1, child2 = self.left[node], self.right[node]
+        self.lower[node], self.upper[node] = _union(self.lower[child1], self.upper[child1],
+                                                    self.lower[child2], self.upper[child2])
+        self.height[node] = 1 + max(self.height[child1], self.height[child2])
+
+    def _replace_child(self, parent, old, new):
+        if parent == NULL_NODE:
+            self.root = new
+        elif self.left[parent] == old:
+            self.left[parent] = new
+        else:
+            self.right[parent] = new
+
+    def _balance(self, a):
+        # performs a left or right rotation if node `a` is imbalanced, returns the new subtree root
+        left, right, height, parent = self.left, self.right, self.height, self.parent
+        if left[a] == NULL_NODE or height[a] < 2:
+            return a
+        b, c = left[a], right[a]
+        balance = height[c] - height[b]
+
+        if balance > 1:  # rotate c up
+            f, g = left[c], right[c]
+            left[c] = a
+            parent[c] = parent[a]
+            parent[a] = c
+            self._replace_child(parent[c], a, c)
+            if height[f] > height[g]:
+                right[c], right[a] = f, g
+                parent[g] = a
+            else:
+                right[c], right[a] = g, f
+                parent[f] = a
+            self._refit(a)
+            self._refit(c)
+            return c
+
+        if balance < -1:  # rotate b up
+            d, e = left[b], right[b]
+            left[b] = a
+            parent[b] = parent[a]
+            parent[a] = b
+            self._replace_child(parent[b], a, b)
+            if height[d] > height[e]:
+                right[b], left[a] = d, e
+                parent[e] = a
+            else:
+                right[b], left[a] = e, d
+                parent[d] = a
+            self._refit(a)
+            self._refit(b)
+            return b
+
+        return a
+
+    def validate(self):
+        """
+        Debug helper: checks structure of the tree, raises RuntimeError if it is broken
+        :return:
+          number of leaves
+        """
+        if self.root == NULL_NODE:
+            return 0
+        if self.parent[self.root] != NULL_NODE:
+            raise RuntimeError('Root node %d has a parent' % self.root)
+        leaves = 0
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if self.left[node] == NULL_NODE:
+                leaves += 1
+                if not _contains(self.lower[node], self.upper[node], *self.tight[node]):
+                    raise RuntimeError('Fat box of leaf %d does not contain its item box' % node)
+                continue
+            for child in (self.left[node], self.right[node]):
+                if self.parent[child] != node:
+                    raise RuntimeError('Parent of node %d is %d instead of %d' % (child, self.parent[child], node))
+                if not _contains(self.lower[node], self.upper[node], self.lower[child], self.upper[child]):
+                    raise RuntimeError('Box of node %d does not contain box of its child %d' % (node, child))
+                stack.append(child)
+            if self.height[node] != 1 + max(self.height[self.left[node]], self.height[self.right[node]]):
+                raise RuntimeError('Height of node %d is wrong' % node)
+        if leaves != self.item_count:
+            raise RuntimeError('Tree has %d leaves, but %d items' % (leaves, self.item_count))
+        return leaves
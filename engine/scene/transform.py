@@ -0,0 +1,250 @@
+from typing import Iterable
+
+import numpy as np
+
+# note: all matrices here are stored in OpenGL memory layout (column-major), so they are multiplied
+# in reversed order compared to glm: `child_world = child_local @ parent_world` and the translation is in row 3
+
+
+def compose_matrices(positions, rotations, scales, out=None):
+    """
+    Builds local transformation matrices (translate * rotate * scale) for N objects at once
+    :param positions: N*3 array
+    :param rotations: N*4 array of (w, x, y, z) quaternions
+    :param scales: N*3 array
+    :param out: optional N*4*4 float32 array to write result into
+    :return:
+      N*4*4 array of matrices
+    """
+    count = len(positions)
+    if out is None:
+        out = np.empty((count, 4, 4), 'float32')
+    w, x, y, z = np.asarray(rotations, 'float32').T
+    scales = np.asarray(scales, 'float32')
+
+    # rows of the transposed rotation matrix, each one scaled by corresponding axis scale
+    out[:, 0, 0] = 1 - 2 * (y * y + z * z)
+    out[:, 0, 1] = 2 * (x * y + w * z)
+    out[:, 0, 2] = 2 * (x * z - w * y)
+    out[:, 1, 0] = 2 * (x * y - w * z)
+    out[:, 1, 1] = 1 - 2 * (x * x + z * z)
+    out[:, 1, 2] = 2 * (y * z + w * x)
+    out[:, 2, 0] = 2 * (x * z + w * y)
+    out[:, 2, 1] = 2 * (y * z - w * x)
+    out[:, 2, 2] = 1 - 2 * (x * x + y * y)
+    out[:, :3, :3] *= scales[:, :, None]
+    out[:, :3, 3] = 0
+    out[:, 3, :3] = positions
+    out[:, 3, 3] = 1
+    return out
+
+
+def quat2array(quat):
+    return quat.w, quat.x, quat.y, quat.z
+
+
+class TransformStore:
+    """
+    Structure-of-arrays storage for GameObject transforms.
+    Local transforms and world matrices are kept in contiguous arrays, world matrices are resolved
+    by a single vectorized pass per tick instead of recursive GameObject.update() calls
+    """
+
+    def __init__(self, capacity=256):
+        self.local_pos = np.zeros((capacity, 3), 'float32')
+        self.rotations = np.zeros((capacity, 4), 'float32')
+        self.rotations[:, 0] = 1
+        self.scales = np.ones((capacity, 3), 'float32')
+        self.local_matrix = np.empty((capacity, 4, 4), 'float32')
+        self.world_matrix = np.tile(np.identity(4, 'float32'), (capacity, 1, 1))
+        self.parents = np.full(capacity, -1, 'int32')
+        self.objects = []  # handles (GameObject instances) by index
+        self.is_dirty = False
+        self.coalesced_updates = 0  # writes to transforms that were already written since last propagation
+        self.version = 0  # changed when objects are added or removed, so their indices may have moved
+        self._written = np.zeros(capacity, 'bool')
+        self._levels = None  # index arrays for every hierarchy depth, in topological order
+
+    @property
+    def count(self):
+        return len(self.objects)
+
+    @property
+    def world_pos(self):
+        return self.world_matrix[:, 3, :3]
+
+    def add(self, obj, parent_index=-1, pos=(0., 0., 0.)):
+        index = len(self.objects)
+        if index == len(self.parents):
+            self._grow(index * 2)
+        self.objects.append(obj)
+        self.parents[index] = parent_index
+        self.local_pos[index] = pos
+        self.world_matrix[index] = np.identity(4, 'float32')
+        self.world_matrix[index, 3, :3] = self.local_pos[index]
+        if parent_index >= 0:
+            self.world_matrix[index, 3, :3] += self.world_matrix[parent_index, 3, :3]
+        self._levels = None
+        self.is_dirty = True
+        self.version += 1
+        return index
+
+    def remove(self, index):
+        """
+        Removes object by moving the last one into its place, so arrays stay contiguous.
+        Children of removed object must be removed too
+        """
+        last = len(self.objects) - 1
+        moved = self.objects.pop()
+        if index != last:
+            for array in (self.local_pos, self.rotations, self.scales, self.local_matrix, self.world_matrix,
+                          self.parents, self._written):
+                array[index] = array[last]
+            self.objects[index] = moved
+            moved.store_index = index
+            self.parents[:last][self.parents[:last] == last] = index
+        self.parents[last] = -1
+        self._written[last] = False
+        self._levels = None
+        self.is_dirty = True
+        self.version += 1
+
+    def set_parent(self, index, parent_index):
+        self.parents[index] = parent_index
+        self._levels = None
+        self.is_dirty = True
+
+    def set_position(self, index, pos):
+        self.local_pos[index] = pos
+        self._mark_written(index)
+
+    def set_rotation(self, index, rotation):
+        self.rotations[index] = rotation
+        self._mark_written(index)
+
+    def set_scale(self, index, scale):
+        self.scales[index] = scale
+        self._mark_written(index)
+
+    def set_positions(self, indices, positions):
+        self.local_pos[indices] = positions
+        self.coalesced_updates += int(np.count_nonzero(self._written[indices]))
+        self._written[indices] = True
+        self.is_dirty = True
+
+    def _mark_written(self, index):
+        if self._written[index]:
+            self.coalesced_updates += 1
+        self._written[index] = True
+        self.is_dirty = True
+
+    def propagate(self):
+        """
+        Recomputes world matrices of all objects
+        :return:
+          indices of objects whose world matrix has changed
+        """
+        count = len(self.objects)
+        if not self.is_dirty or not count:
+            return np.empty(0, 'int64')
+        if self._levels is None:
+            self._rebuild_levels()
+
+        local = compose_matrices(self.local_pos[:count], self.rotations[:count], self.scales[:count],
+                                 self.local_matrix[:count])
+        world = self.world_matrix
+        parents = self.parents
+        old_world = world[:count].copy()
+
+        roots = self._levels[0]
+        world[roots] = local[roots]
+        for level in self._levels[1:]:
+            world[level] = np.einsum('nij,njk->nik', local[level], world[parents[level]])
+
+        self.is_dirty = False
+        self._written[:count] = False
+        return np.flatnonzero((world[:count] != old_world).reshape(count, 16).any(axis=1))
+
+    def resolve(self):
+        # propagates transforms and marks handles with changed world matrices as updated
+        changed = self.propagate()
+        objects = self.objects
+        for index in changed.tolist():
+            objects[index].update()
+        return len(changed)
+
+    def _rebuild_levels(self):
+        count = len(self.objects)
+        parents = self.parents[:count]
+        has_parent = parents >= 0
+        depths = np.zeros(count, 'int32')
+        # every iteration fixes at least one more hierarchy level
+        for _ in range(count):
+            new_depths = np.where(has_parent, depths[parents] + 1, 0)
+            if np.array_equal(new_depths, depths):
+                break
+            depths = new_depths
+        order = np.argsort(depths, kind='stable')
+        bounds = np.flatnonzero(np.diff(depths[order])) + 1
+        self._levels = np.split(order, bounds)
+
+    def _grow(self, capacity):
+        old_size = len(self.parents)
+        self.local_pos = np.resize(self.local_pos, (capacity, 3))
+        self.rotations = np.resize(self.rotations, (capacity, 4))
+        self.scales = np.resize(self.scales, (capacity, 3))
+        self.local_matrix = np.resize(self.local_matrix, (capacity, 4, 4))
+        self.world_matrix = np.resize(self.world_matrix, (capacity, 4, 4))
+        self.parents = np.resize(self.parents, capacity)
+        self.parents[old_size:] = -1
+        self._written = np.resize(self._written, capacity)
+        self._written[old_size:] = False
+
+
+def resolve_hierarchy(roots: Iterable):
+    """
+    Recomputes world matrices of GameObjects that are not stored in a TransformStore.
+    Every root subtree is walked level by level, so local matrices of all dirty objects are composed
+    and multiplied by their parent matrices in a few batched NumPy calls
+    :return:
+      all resolved objects in topological order
+    """
+    level = list(roots)
+    resolved = []
+    while level:
+        local = compose_matrices([obj.pos for obj in level],
+                                 [quat2array(obj.rotation) for obj in level],
+                                 [obj.scale for obj in level])
+        parents = np.array([obj.parent.world_matrix if obj.parent is not None else np.identity(4, 'float32')
+                            for obj in level], 'float32')
+        world = np.einsum('nij,njk->nik', local, parents)
+        for obj, matrix in zip(level, world):
+            obj.set_world_matrix(matrix)
+        resolved.extend(level)
+        level = [child for obj in level for child in obj.children]
+    return resolved
+
+
+def set_positions(objects: Iterable, positions):
+    """
+    Sets local positions of many GameObjects at once.
+    Objects that are stored in a TransformStore are written with a single fancy-indexed assignment per store,
+    others fall back to the usual `GameObject.pos` setter
+    """
+    positions = np.asarray(positions, 'float32').reshape(-1, 3)
+    grouped = {}
+    for row, obj in enumerate(objects):
+        store = obj.transform_store
+        if store is None:
+            obj.pos = positions[row]
+            continue
+        try:
+            rows, indices = grouped[id(store)][1:]
+        except KeyError:
+            rows, indices = [], []
+            grouped[id(store)] = (store, rows, indices)
+        rows.append(row)
+        indices.append(obj.store_index)
+
+    for store, rows, indices in grouped.values():
+        store.set_positions(np.array(indices, 'int64'), positions[rows])
@@ -7,6 +7,7 @@ from engine.gl.framebuffer import FB_TEXTURE_BUFFER
 from engine.renderer.presets.fancy.convolution import DepthOfFieldRenderer
 from engine.renderer.presets.fancy.light_volume import LightVolumeRenderer
 from engine.renderer.presets.fancy.pbr_light import PbrLightPass
+from engine.renderer.occlusion import HiZOcclusionCuller
 
 OpenGL.ERROR_CHECKING = False
 from glm import vec3
@@ -42,6 +43,7 @@ def make_renderer(scene, size):
     normal = SceneRenderer(scene, UniformedRenderer(NormalMapping()))
     light = SceneRenderer(scene, UniformedRenderer(PbrLightPass(*size)))
     light.uniformed.src_renderer.fbo.add_depth_buffer(FB_TEXTURE_BUFFER)
+    scene.culler.occlusion = HiZOcclusionCuller(light.uniformed.src_renderer.fbo.depth_buffer)
 
     volumetric = SceneRenderer(scene, UniformedRenderer(LightVolumeRenderer(
         *size,
@@ -0,0 +1,162 @@
+"""
+Fixtures replacing GL and OpenAL, so tests run without a GL context or an audio device.
+Replaced functions are restored after every test
+"""
+import gc
+from itertools import count
+
+import numpy as np
+import pytest
+from OpenGL.GL import GL_TRIANGLES
+
+import engine.gl.base
+import engine.gl.mesh
+import engine.gl.state
+import engine.gl.texture
+import engine.renderer.draw_list
+import engine.renderer.gpu_culling
+import engine.scene.components.sound
+from engine.gl.mesh import VAO, EBO, VAOMesh
+from engine.gl.state import GLState
+from engine.gl.texture import Texture2D
+from engine.renderer.dependencies.base import UniformBufferBindingPointManager
+from engine.sound.context import AudioContext
+
+# GL functions replaced by the `gl_calls` fixture
+GL_FUNCTIONS = ((engine.gl.base, ('glBufferData', 'glBufferSubData', 'glDeleteBuffers')),
+                (engine.gl.mesh, ('glDrawElements', 'glDeleteVertexArrays', 'glVertexAttribPointer',
+                                  'glEnableVertexAttribArray')),
+                (engine.gl.texture, ('glDeleteTextures', )),
+                (engine.gl.state, ('glActiveTexture', 'glBindTexture', 'glBindVertexArray', 'glBindBuffer',
+                                   'glBindBufferBase', 'glUseProgram')),
+                (engine.renderer.draw_list, ('glDrawElementsBaseVertex',
+                                             'glDrawElementsInstancedBaseVertexBaseInstance',
+                                             'glMultiDrawElementsIndirect')),
+                (engine.renderer.gpu_culling, ('glClearBufferData', 'glShaderStorageBlockBinding',
+                                               'glMultiDrawElementsIndirect', 'glMultiDrawElementsIndirectCount')))
+
+
+class FakeTexture(Texture2D):
+    # texture without a GL object
+    def __init__(self, sampler_id):
+        self.sampler_id = sampler_id
+        self.set_bind_index(0)
+
+    def __del__(self):
+        pass
+
+
+class FakeVAO(VAO):
+    def __init__(self, buffer_id):
+        self.buffer_id = buffer_id
+
+    def __del__(self):
+        pass
+
+
+class FakeEBO(EBO):
+    def __init__(self, buffer_id, index_count):
+        self.buffer_id = buffer_id
+        self._buffer_data = np.zeros(index_count, 'uint32')
+
+    def __del__(self):
+        pass
+
+
+class FakeComputeProgram:
+    # compute program without GL objects, dispatch is recorded as a GL call
+    calls = None
+
+    def __init__(self, _source):
+        self.gl_program = 0
+
+    def get_uniform_setter(self, *_args):
+        return lambda *_values: None
+
+    def get_ssbo_block_indices(self):
+        return {'ModelMatrices': 0, 'CullItems': 1, 'CullCommands': 2, 'CullCounters': 3}
+
+    def use(self):
+        GLState.use_program(self.gl_program)
+
+    def dispatch(self, *_args, **_kwargs):
+        self.calls.append('dispatch')
+
+
+class StubAudioContext(AudioContext):
+    # no OpenAL device is opened
+    def __init__(self):
+        self.source_cache_len = 0
+        self._sources = []
+        self.active_listener = None
+
+    def __del__(self):
+        pass
+
+
+class FakeSoundSource:
+    # OpenAL source without an AL object, updates are counted
+    def __init__(self):
+        self.update_count = 0
+
+    def set_position(self, _position):
+        pass
+
+    def update(self):
+        self.update_count += 1
+
+    def stop(self):
+        pass
+
+
+@pytest.fixture
+def gl_calls(monkeypatch):
+    """
+    Replaces GL functions of the engine by a recorder, GL objects get unique names
+    :return:
+      list of names of called GL functions
+    """
+    calls = []
+    for module, names in GL_FUNCTIONS:
+        for name in names:
+            monkeypatch.setattr(module, name, lambda *_args, _name=name: calls.append(_name))
+    buffer_names = count(1)
+    monkeypatch.setattr(engine.gl.base, 'glGenBuffers', lambda _count: next(buffer_names))
+    monkeypatch.setattr(engine.gl.mesh, 'glGenVertexArrays', lambda _count: next(buffer_names))
+    monkeypatch.setattr(engine.renderer.gpu_culling, 'ComputeProgram', FakeComputeProgram)
+    monkeypatch.setattr(FakeComputeProgram, 'calls', calls)
+    monkeypatch.setattr(UniformBufferBindingPointManager, 'max_count', 64)
+    monkeypatch.setattr(UniformBufferBindingPointManager, 'points', [None] * 64)
+    GLState.invalidate()
+    yield calls
+    # GL objects of the test are deleted while GL functions are still replaced
+    gc.collect()
+    GLState.invalidate()
+
+
+@pytest.fixture
+def make_texture():
+    return FakeTexture
+
+
+@pytest.fixture
+def make_mesh():
+    def make(buffer_id, index_count=36):
+        # VAOMesh with VAO and EBO, but without creating GL objects, 36 indices by default (a box)
+        mesh = VAOMesh.__new__(VAOMesh)
+        mesh.render_mode = GL_TRIANGLES
+        mesh.vao = FakeVAO(buffer_id)
+        mesh.ebo = FakeEBO(buffer_id, index_count)
+        return mesh
+    return make
+
+
+@pytest.fixture
+def sound_context():
+    return StubAudioContext()
+
+
+@pytest.fixture
+def fake_sound_source(monkeypatch):
+    # SoundSourceComponent creates FakeSoundSource instead of an OpenAL source
+    monkeypatch.setattr(engine.scene.components.sound, 'SoundSource', FakeSoundSource)
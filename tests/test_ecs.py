@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from engine.scene.scene import Scene
+from engine.scene.game_object import GameObject
+from engine.scene.component import CollideComponent, SoundComponent
+
+
+@pytest.mark.parametrize('transform_store', (False, True))
+def test_query_world_arrays(sound_context, transform_store):
+    scene = Scene(sound_context=sound_context, transform_store=transform_store)
+    objects = [GameObject(scene.root_obj, pos=(i, 0, 0),
+                          components=[CollideComponent()] + ([SoundComponent()] if i % 2 else []))
+               for i in range(6)]
+    scene.event_manager.poll_events()
+    scene.resolve_transforms()
+
+    (batch, collides, sounds), = scene.query(CollideComponent, SoundComponent)
+    assert batch.objects == [objects[1], objects[3], objects[5]]
+    assert [sound.game_object for sound in sounds] == batch.objects
+    assert np.allclose(batch.world_positions, [[1, 0, 0], [3, 0, 0], [5, 0, 0]])
+    indices = batch.get_store_indices()
+    assert (indices is not None) == transform_store
+
+    objects[3].pos = (3, 2, 0)
+    scene.resolve_transforms()
+    assert batch.get_store_indices() is indices  # nothing was added or removed
+    assert np.allclose(batch.world_matrices[1], objects[3].world_matrix)
+
+    # removed object of the other archetype moves the last stored object into its row
+    scene.root_obj.remove_child(objects[0])
+    scene.event_manager.poll_events()
+    scene.root_obj.remove_child(objects[1])
+    assert np.allclose(batch.world_positions, [[1, 0, 0], [3, 2, 0], [5, 0, 0]])  # removal is not processed yet
+    scene.event_manager.poll_events()
+    objects[5].pos = (5, 0, 4)
+    scene.resolve_transforms()
+    assert batch.objects == [objects[5], objects[3]]
+    assert np.allclose(batch.world_positions, [[5, 0, 4], [3, 2, 0]])
+    assert np.allclose(batch.world_matrices, [obj.world_matrix for obj in batch.objects])
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import numpy as np
+from OpenGL.GL import GL_TRIANGLES
+
+from engine.gl.mesh import VAOMesh
+from engine.model.model import Model, Node, RenderCompound, Material, InstancedModel
+from engine.renderer.draw_list import DrawList
+from engine.renderer.gpu_culling import GPUCullingQueue, ITEM_DTYPE
+
+BOUNDS = (np.full(3, -1, 'float32'), np.ones(3, 'float32'))
+
+
+class CustomMesh(VAOMesh):
+    # mesh with its own draw(), not compiled by DrawList
+    def draw(self):
+        pass
+
+
+def make_model(mesh, material, matrix_slot=None):
+    model = Model(root_node=Node(meshes=[RenderCompound(mesh, material, BOUNDS)])).finished()
+    model.matrix_slot = matrix_slot
+    return model
+
+
+def test_rebuild_batch_layout(gl_calls, make_texture, make_mesh):
+    materials = [Material([(make_texture(1), 0)]), Material([(make_texture(2), 0)])]
+    shared, other, custom = make_mesh(1), make_mesh(2), make_mesh(3)
+    custom.__class__ = CustomMesh
+    # one item per model
+    culled = [make_model(shared, materials[0], 10), make_model(other, materials[1], 11),
+              make_model(shared, materials[0], 12), make_model(shared, materials[1], 13)]
+    unplaced = make_model(shared, materials[0])
+    instanced = InstancedModel(make_model(shared, materials[0]), np.repeat(np.identity(4, 'float32')[None], 3, 0))
+    instanced.matrix_slot = 20
+    with_custom = make_model(custom, materials[0], 30)
+    models = culled + [unplaced, instanced, with_custom]
+
+    queue = GPUCullingQueue(DrawList(lambda: models), lambda: models)
+    queue.select(None, SimpleNamespace(layout_version=0, binding_point=0)).rebuild()
+
+    # (material slot, VAO id, render mode, first command, capacity), sorted by material, then VAO
+    assert queue.batches == [(0, 1, GL_TRIANGLES, 0, 2), (1, 1, GL_TRIANGLES, 2, 1), (1, 2, GL_TRIANGLES, 3, 1)]
+    assert queue.direct_items.tolist() == [4, 5, 6]
+    assert queue.item_count == 4
+    items = queue.items.get_buffer_data().view(ITEM_DTYPE)
+    assert items['base_instance'].tolist() == [10, 12, 13, 11]
+    assert items['batch'].tolist() == [0, 0, 1, 2]
+    assert items['batch_start'].tolist() == [0, 0, 2, 3]
+    assert (items['count'] == 36).all()
+    assert np.allclose(items['extent'], 1)
+    assert queue.commands.get_buffer_data().size == 4 * 5
+    assert queue.counters.get_buffer_data().size == 3
@@ -0,0 +1,118 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from engine.model.model import Model, Node, RenderCompound, Material, LodModel
+from engine.scene.scene import Scene
+from engine.scene.game_object import GameObject
+from engine.scene.components.camera import CameraComponent
+from engine.scene.components.render import RenderComponent
+
+BOUNDS = (np.full(3, -1, 'float32'), np.ones(3, 'float32'))
+# renderer without GL objects, models are already formatted
+RENDERER = SimpleNamespace(attribute_data=None, sampler_data=None, has_dependency=lambda name: False)
+
+
+@pytest.fixture
+def make_model(make_texture, make_mesh):
+    material = Material([(make_texture(1), 0)])
+    mesh = make_mesh(1)
+    return lambda: Model(root_node=Node(meshes=[RenderCompound(mesh, material, BOUNDS)])).finished()
+
+
+@pytest.fixture
+def scene(gl_calls, sound_context):
+    scene = Scene(sound_context=sound_context)
+    GameObject(scene.root_obj, pos=(0, 0, 10), components=[CameraComponent(fov=60, activate=True)])
+    scene.event_manager.poll_events()
+    return scene
+
+
+def test_set_model_of_lod_component(scene, make_model):
+    component = RenderComponent(model=LodModel([make_model(), make_model()]), renderer=RENDERER)
+    GameObject(scene.root_obj, components=[component])
+    scene.event_manager.poll_events()
+    assert component in scene._lod_components
+
+    component.set_model(make_model())
+    assert component.lod is None
+    assert component not in scene._lod_components
+    scene.update_lods()
+
+    component.set_model([make_model(), make_model()])
+    assert component.lod is not None
+    assert component in scene._lod_components
+    scene.update_lods()
+    assert component.model is component.lod.current
+
+
+def test_set_model_outside_of_scene(scene, make_model):
+    component = RenderComponent(model=make_model(), renderer=RENDERER)
+    obj = GameObject(scene.root_obj, components=[component])
+    scene.event_manager.poll_events()
+    obj.set_active(False)
+    scene.event_manager.poll_events()
+
+    component.set_model(LodModel([make_model(), make_model()]))
+    assert component not in scene._lod_components
+    obj.set_active(True)
+    scene.event_manager.poll_events()
+    assert component in scene._lod_components
+    scene.update_lods()
+
+
+def test_set_model_leaves_instancing(scene, make_model):
+    renderer = SimpleNamespace(attribute_data=None, sampler_data=None, has_dependency=lambda name: True)
+    shared = make_model()
+    components = [RenderComponent(model=shared, renderer=renderer) for _ in range(3)]
+    objects = [GameObject(scene.root_obj, pos=(i * 10, 0, 0), components=[component])
+               for i, component in enumerate(components)]
+    scene.event_manager.poll_events()
+    group = scene.get_render_group(components[0])
+    instanced, = group.get_current_models()
+    assert instanced.instance_count == 3
+
+    model = make_model()
+    components[1].set_model(model)
+    assert group._instancing_dirty
+    assert np.allclose(model.world_matrix, objects[1].world_matrix)
+    assert sorted(map(id, group.get_current_models())) == sorted((id(instanced), id(model)))
+    assert instanced.instance_owners == [components[0], components[2]]
+
+
+def translation(x):
+    matrix = np.identity(4, 'float32')
+    matrix[3, 0] = x
+    return matrix
+
+
+def test_moved_instance_bounds_shrink(scene, make_model):
+    renderer = SimpleNamespace(attribute_data=None, sampler_data=None, has_dependency=lambda name: True,
+                               first_pass=lambda queue: None)
+    shared = make_model()
+    components = [RenderComponent(model=shared, renderer=renderer) for _ in range(2)]
+    objects = [GameObject(scene.root_obj, pos=(i * 10, 0, 0), components=[component])
+               for i, component in enumerate(components)]
+    scene.event_manager.poll_events()
+    group = scene.get_render_group(components[0])
+    group.draw()
+    instanced, = group.get_current_models()
+    centers, extents = instanced.world_centers.copy(), instanced.world_extents.copy()
+    assert np.allclose(centers - extents, [[-1, -1, -1]]) and np.allclose(centers + extents, [[11, 1, 1]])
+
+    instanced.set_instance_matrix(1, translation(100))
+    assert np.allclose(instanced.world_centers + instanced.world_extents, [[101, 1, 1]])
+    instanced.set_instance_matrix(1, translation(10))
+    instanced.refit_bounds()
+    assert np.allclose(instanced.world_centers, centers) and np.allclose(instanced.world_extents, extents)
+
+    # the group refits moved instances once per frame
+    objects[1].pos = (100, 0, 0)
+    scene.resolve_transforms()
+    objects[1].pos = (10, 0, 0)
+    scene.resolve_transforms()
+    assert instanced.bounds_loose
+    group.draw()
+    assert not instanced.bounds_loose
+    assert np.allclose(instanced.world_centers, centers) and np.allclose(instanced.world_extents, extents)
@@ -0,0 +1,52 @@
+from engine.event.tick import TickEvent
+from engine.scene.scene import Scene
+from engine.scene.game_object import GameObject, DirectedGameObject
+from engine.scene.components.camera import CameraComponent
+from engine.scene.components.sound import SoundSourceComponent
+
+
+def make_scene(sound_context):
+    scene = Scene(sound_context=sound_context)
+    DirectedGameObject(scene.root_obj, components=[CameraComponent(fov=60, activate=True)])
+    scene.event_manager.poll_events()
+    return scene
+
+
+def tick(*scenes):
+    # objects entering or leaving the scene are processed first
+    for scene in scenes:
+        scene.event_manager.poll_events()
+    for scene in scenes:
+        scene.event_manager.add_event(TickEvent(0.016))
+        scene.event_manager.poll_events()
+
+
+def test_source_ticks_follow_scene(fake_sound_source, sound_context):
+    first, second = make_scene(sound_context), make_scene(sound_context)
+    component = SoundSourceComponent()
+    obj = GameObject(components=[component])  # created outside of any scene
+    tick(first)
+    assert component.source.update_count == 0
+
+    first.root_obj.add_child(obj)
+    tick(first)
+    assert component.event_manager is first.event_manager
+    assert component.source.update_count == 1
+
+    # the new scene subscribes the source before the old one processes its removal
+    second.root_obj.add_child(obj)
+    tick(second, first)
+    assert component.event_manager is second.event_manager
+    assert component.source.update_count == 2
+
+    obj.set_active(False)
+    tick(second)
+    assert component.event_manager is None
+    assert component.source.update_count == 2
+    obj.set_active(True)
+    tick(second)
+    assert component.source.update_count == 3
+
+    second.root_obj.remove_child(obj)
+    tick(second)
+    assert component.source.update_count == 3
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from glm import angleAxis, radians, vec3
+
+from engine.scene.scene import Scene
+from engine.scene.game_object import GameObject
+
+
+@pytest.fixture
+def scenes(sound_context):
+    # the same hierarchy with and without a TransformStore
+    return [Scene(sound_context=sound_context, transform_store=transform_store) for transform_store in (False, True)]
+
+
+def build(scene):
+    first = GameObject(scene.root_obj, pos=(1, 2, 3), rotation=angleAxis(radians(30), vec3(0, 1, 0)))
+    middle = GameObject(first, pos=(0, 1, 0), scale=(2, 2, 2))
+    leaf = GameObject(middle, pos=(1, 0, 0), rotation=angleAxis(radians(45), vec3(1, 0, 0)))
+    other = GameObject(scene.root_obj, pos=(-5, 0, 0))
+    scene.resolve_transforms()
+    return [first, middle, leaf, other]
+
+
+def assert_same(plain, stored):
+    for plain_obj, stored_obj in zip(plain, stored):
+        assert np.allclose(plain_obj.world_matrix, stored_obj.world_matrix, atol=1e-5)
+
+
+def test_nested_transforms(scenes):
+    plain, stored = [build(scene) for scene in scenes]
+    assert_same(plain, stored)
+    # translation of the leaf is composed from all parents
+    assert np.allclose(plain[2].abs_pos, vec3(1, 2, 3) + angleAxis(radians(30), vec3(0, 1, 0)) * vec3(2, 1, 0))
+
+    for scene, (first, middle, leaf, other) in zip(scenes, (plain, stored)):
+        first.move_by_vector(vec3(0, 0, 4))
+        first.rotate_by(radians(60), (0, 0, 1))
+        middle.scale = (1, 3, 0.5)
+        leaf.rotate_by(radians(-20), (0, 1, 0))
+        leaf.pos = (2, 0, 1)
+        other.scale = (0.5, 0.5, 0.5)
+        scene.resolve_transforms()
+    assert_same(plain, stored)
+    assert not np.allclose(plain[2].world_matrix, stored[3].world_matrix)
+
+
+def test_detach_and_readd(scenes):
+    plain, stored = [build(scene) for scene in scenes]
+    for scene, (first, middle, leaf, other) in zip(scenes, (plain, stored)):
+        # removing a subtree from the store moves the last rows into its place
+        first.remove_child(middle)
+        other.pos = (-5, 1, 0)
+        scene.resolve_transforms()
+        assert middle.transform_store is None and leaf.transform_store is None
+        assert np.allclose(middle.pos, (0, 1, 0)) and np.allclose(leaf.pos, (1, 0, 0))
+
+        other.add_child(middle)
+        middle.rotate_by(radians(90), (0, 0, 1))
+        scene.resolve_transforms()
+    assert_same(plain, stored)
+    stored_scene = scenes[1]
+    objects = stored_scene.transform_store.objects
+    assert all(objects[obj.store_index] is obj for obj in stored)
+    assert stored_scene.transform_store.parents[stored[1].store_index] == stored[3].store_index
+    assert np.allclose(stored[2].abs_pos, plain[2].abs_pos)
+
+
+def test_coalesced_transform_updates(scenes):
+    plain, stored = [build(scene) for scene in scenes]
+    for scene, (first, middle, leaf, other) in zip(scenes, (plain, stored)):
+        assert scene.coalesced_transform_updates == 0
+        first.pos = (0, 0, 0)
+        first.pos = (1, 1, 1)
+        first.rotate_by(radians(10), (0, 1, 0))
+        leaf.scale = (3, 3, 3)
+        scene.resolve_transforms()
+        # the second and the third change of the first object were merged
+        assert scene.coalesced_transform_updates == 2
+
+        leaf.pos = (0, 0, 1)
+        scene.resolve_transforms()
+        assert scene.coalesced_transform_updates == 2
+    assert_same(plain, stored)